@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 from django.utils.translation import gettext_lazy as _
 
@@ -50,6 +51,9 @@ INSTALLED_APPS = [
     'orders',
     'payment',
     'wishlist',
+    'taskqueue',
+    'imaging',
+    'sharedcache',
 ]
 
 MIDDLEWARE = [
@@ -59,6 +63,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.RequestCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -137,6 +142,9 @@ LANGUAGES = [
 
 LOCALE_PATHS = [ BASE_DIR / "locale" ]
 
+# True след `manage.py compilejsi18n` при deploy - JS каталогът се сервира от STATIC_ROOT
+JS_CATALOG_STATIC = os.getenv('JS_CATALOG_STATIC') == '1'
+
 
 TIME_ZONE = 'UTC'
 
@@ -160,6 +168,33 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ширини на генерираните WebP/JPEG версии на изображенията (imaging)
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_DERIVATIVE_WORKERS = None  # None = брой ядра
+# след толкова секунди без готов composite модалът спира да пита и показва снимката на outfit-а
+TRYON_RENDER_DEADLINE = 2 * 60
+# Качените изображения се пазят под sha256 на съдържанието (imaging.storage)
+MEDIA_CONTENT_ADDRESSED = True
+# Максимално разстояние между pHash-ове за близки дубликати (до 3 се търси по индекс)
+IMAGE_DUPLICATE_DISTANCE = 3
+# и най-голямо разстояние в RGB между клетките на цветовите подписи (0-441)
+IMAGE_DUPLICATE_COLOR_DISTANCE = 24
+
+# Кеш, споделен от всички gunicorn worker-и на машината (sharedcache)
+CACHES = {
+    'default': {
+        'BACKEND': 'sharedcache.backend.MmapCache',
+        'LOCATION': os.getenv('CACHE_PATH', os.path.join(tempfile.gettempdir(), 'aurin-cache')),
+        'OPTIONS': {'SIZE': 64 * 1024 * 1024, 'WAYS': 8},
+    }
+}
+# Кеш в паметта на всеки процес, изчистван по тагове през LISTEN/NOTIFY (sharedcache.bus)
+LOCAL_CACHE_MAX_ENTRIES = 2000
+CACHE_BUS_LISTEN = os.getenv('CACHE_BUS_LISTEN', '1') == '1'
+CACHE_BUS_RESYNC = 30  # секунди между сверяванията на версиите (при изпуснат NOTIFY)
+# Рендирани фрагменти ({% fragment %}) - отпадат и по-рано, при промяна на таговете им
+FRAGMENT_CACHE_TIMEOUT = 6 * 60 * 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -169,6 +204,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 SESSION_COOKIE_AGE = 86400 #30 дни се пазят
 SESSION_SAVE_EVERY_REQUEST = True
 
+# Броят в любими се пази в сесията и се сверява с базата през толкова секунди (wishlist.utils)
+WISHLIST_COUNT_RECONCILE = 10 * 60
+WISHLIST_PAGE_SIZE = 20
+
+ORDER_HISTORY_PAGE_SIZE = 20
+
 
 AUTH_USER_MODEL = 'users.CustomUser'
 
@@ -177,6 +218,9 @@ AUTH_USER_MODEL = 'users.CustomUser'
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
 
+# Bearer токен за масовото обновяване на наличности от склада (main.inventory)
+INVENTORY_SYNC_TOKEN = os.getenv('INVENTORY_SYNC_TOKEN')
+
 
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -188,3 +232,5 @@ EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = f"AURIN <{EMAIL_HOST_USER}>"
 EMAIL_SUBJECT_PREFIX = "[AURIN] "
 
+NEWSLETTER_SEND_RATE = 10  # писма в секунда
+
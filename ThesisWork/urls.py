@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.i18n import JavaScriptCatalog
+from main.views import javascript_catalog
 
 
 urlpatterns = [
@@ -12,8 +12,10 @@ urlpatterns = [
     path('orders/', include('orders.urls', namespace='orders')),
     path('payment/', include('payment.urls', namespace='payment')),
     path('wishlist/', include('wishlist.urls', namespace='wishlist')),
+    path('imaging/', include('imaging.urls', namespace='imaging')),
     path('', include('main.urls', namespace='main')),
-    path('jsi18n/', JavaScriptCatalog.as_view(), name='javascript-catalog'),
+    path('jsi18n/', javascript_catalog, name='javascript-catalog'),
+    path('jsi18n/<str:language>/<str:digest>.js', javascript_catalog, name='javascript-catalog-versioned'),
     path("i18n/", include("django.conf.urls.i18n")),
 ]
 
@@ -1,15 +1,12 @@
-from .models import Cart
+from main.context_processors import wants_global_context
+from .utils import cart_totals
 
 
 def cart_processor(request):
-    if not request.session.session_key:
-        request.session.create()
-
-    cart, created = Cart.objects.get_or_create(
-        session_key = request.session.session_key
-    )
-
+    if not wants_global_context(request, 'cart'):
+        return {}
+    # стойностите са функции - количката се чете само ако шаблонът ги покаже
     return {
-        'cart_total_items': cart.total_items,
-        'cart_sumtotal': cart.subtotal,
-    }
\ No newline at end of file
+        'cart_total_items': lambda: cart_totals(request)['items'],
+        'cart_sumtotal': lambda: cart_totals(request)['subtotal'],
+    }
@@ -7,17 +7,20 @@ class AddToCartForm(forms.Form):
     quantity = forms.IntegerField(min_value=1, initial=1)
 
 
-    def __init__(self, *args, product=None, **kwargs):
+    def __init__(self, *args, product=None, sizes=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.product = product
 
         if product:
-            sizes = product.product_sizes.filter(stock__gt=0)
-            if sizes.exists():
+            # sizes - наличните размери, ако вече са заредени (main.product_detail)
+            if sizes is None:
+                sizes = product.product_sizes.filter(stock__gt=0).select_related('size')
+            sizes = list(sizes)
+            if sizes:
                 self.fields['size_id'] = forms.ChoiceField(
                     choices=[(ps.id, ps.size.name) for ps in sizes],
                              required=True,
-                             initial=sizes.first().id
+                             initial=sizes[0].id
                 )
 
 
@@ -1,13 +1,10 @@
 from django.utils.deprecation import MiddlewareMixin
-from .models import Cart
+from django.utils.functional import SimpleLazyObject
+from .utils import current_cart
 
 
 class CartMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        if not request.session.session_key:
-            request.session.create()
-        
-        request.cart, created = Cart.objects.get_or_create(
-            session_key=request.session.session_key
-        )
+        # зарежда се при първото използване - HTMX partial-ите не я четат
+        request.cart = SimpleLazyObject(lambda: current_cart(request))
         return None 
\ No newline at end of file
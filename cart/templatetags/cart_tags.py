@@ -1,5 +1,5 @@
 from django import template
-from cart.models import Cart
+from cart.utils import cart_totals
 
 
 register = template.Library()
@@ -10,12 +10,8 @@ def get_cart_count(context):
     request = context['request']
     if not request.session.session_key:
         return 0
-    
-    try:
-        cart = Cart.objects.get(session_key=request.session.session_key)
-        return cart.total_items
-    except Cart.DoesNotExist:
-        return 0
+    # същата заявка като cart_processor - изпълнява се веднъж
+    return cart_totals(request)['items']
     
 
 @register.filter
@@ -0,0 +1,27 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+
+from main import request_cache
+from main.models import Product
+from .models import Cart, CartItem
+
+
+def current_cart(request):
+    """Количката на сесията - зарежда се веднъж за заявката (main.request_cache)."""
+    def load():
+        if not request.session.session_key:
+            request.session.create()
+        cart, created = Cart.objects.get_or_create(session_key=request.session.session_key)
+        return cart
+    return request_cache.memo('cart', load, depends=(Cart,))
+
+
+def cart_totals(request):
+    """Брой артикули и сума с една заявка - за бутона в хедъра и context processor-а."""
+    cart = current_cart(request)
+    return request_cache.memo('cart_totals', lambda: CartItem.objects.filter(cart=cart).aggregate(
+        items=Coalesce(Sum('quantity'), 0),
+        subtotal=Coalesce(Sum(F('quantity') * F('product__price'), output_field=DecimalField()), Decimal('0')),
+    ), depends=(Cart, CartItem, Product))
@@ -7,21 +7,15 @@ from django.db import transaction
 from main.models import Product, ProductSize
 from .models import Cart, CartItem
 from .forms import AddToCartForm
+from .utils import current_cart
+from main.context_processors import uses_global_context
 import json
 from django.utils.html import escape
 
 
 class CartMixin:
     def get_cart(self, request):
-        if hasattr(request, 'cart'):
-            return request.cart
-    
-        if not request.session.session_key:
-            request.session.create()
-
-        cart, created = Cart.objects.get_or_create(
-            session_key=request.session.session_key
-        )
+        cart = current_cart(request)
 
         request.session['cart_id'] = cart.id
         request.session.modified = True
@@ -199,6 +193,7 @@ class CartSummaryView(CartMixin, View):
         return TemplateResponse(request, 'cart/cart_summary.html', context)
     
 
+@uses_global_context()
 def cart_notification(request):
     message = request.GET.get('msg', 'Items added to bag')
     return render(request, 'cart/cart_notification.html', {
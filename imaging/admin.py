@@ -0,0 +1,28 @@
+from django.contrib import admin
+from .models import ImageManifest, ImageFingerprint, TilePyramid
+
+
+@admin.register(ImageManifest)
+class ImageManifestAdmin(admin.ModelAdmin):
+    list_display = ('source', 'width', 'height', 'created_at')
+    search_fields = ('source',)
+    readonly_fields = ('source', 'width', 'height', 'variants', 'created_at')
+
+
+@admin.register(ImageFingerprint)
+class ImageFingerprintAdmin(admin.ModelAdmin):
+    list_display = ('source', 'width', 'height', 'sha256', 'created_at')
+    search_fields = ('source', 'sha256')
+    readonly_fields = ('source', 'sha256', 'phash', 'width', 'height', 'similar_images', 'created_at')
+    exclude = ('band0', 'band1', 'band2', 'band3')
+
+    @admin.display(description='Similar images')
+    def similar_images(self, obj):
+        return ', '.join(fp.source for fp in obj.similar()) or '-'
+
+
+@admin.register(TilePyramid)
+class TilePyramidAdmin(admin.ModelAdmin):
+    list_display = ('source', 'key', 'width', 'height', 'created_at')
+    search_fields = ('source', 'key')
+    readonly_fields = ('source', 'key', 'width', 'height', 'created_at')
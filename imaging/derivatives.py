@@ -0,0 +1,238 @@
+import io
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+from .fingerprints import color_distance, color_signature, phash
+from .models import ImageManifest, ImageFingerprint
+from .storage import content_hash
+
+
+logger = logging.getLogger(__name__)
+
+# Всички полета с качени изображения, за които се правят версии
+IMAGE_FIELDS = [
+    ('main.Product', 'main_image'),
+    ('main.ProductImage', 'image'),
+    ('main.Outfit', 'image'),
+    ('main.OutfitImage', 'image'),
+]
+
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def derivative_name(source, width, fmt):
+    stem = os.path.splitext(source)[0]
+    return f"derivatives/{stem}/w{width}.{FORMATS[fmt][1]}"
+
+
+def open_image(source):
+    with default_storage.open(source, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # прозрачният фон става бял, JPEG няма алфа канал
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_derivatives(source):
+    """
+    Генерира всички версии на едно изображение и ги записва в storage-а.
+    Не пипа базата, за да може да работи в отделен процес.
+    """
+    image = open_image(source)
+    width, height = image.size
+
+    widths = [w for w in settings.IMAGE_DERIVATIVE_WIDTHS if w < width]
+    widths.append(min(width, max(settings.IMAGE_DERIVATIVE_WIDTHS)))
+
+    variants = {fmt: {} for fmt in FORMATS}
+    for w in sorted(set(widths)):
+        h = max(1, round(height * w / width))
+        resized = image.resize((w, h), Image.LANCZOS, reducing_gap=3.0) if w != width else image
+        for fmt, (pil_format, _, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            name = derivative_name(source, w, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[fmt][str(w)] = default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    return {'source': source, 'width': width, 'height': height, 'variants': variants}
+
+
+def _render_safely(source):
+    try:
+        return render_derivatives(source)
+    except Exception as e:
+        logger.warning(f"Could not build derivatives for {source}: {e}")
+        return None
+
+
+def fingerprint_image(source):
+    """sha256 на файла, pHash и цветовият подпис на изображението. Не използва базата."""
+    with default_storage.open(source, 'rb') as f:
+        sha256 = content_hash(f)
+    image = open_image(source)
+    width, height = image.size
+    return {'source': source, 'sha256': sha256, 'phash': phash(image), 'colors': color_signature(image),
+            'width': width, 'height': height}
+
+
+def _fingerprint_safely(source):
+    try:
+        return fingerprint_image(source)
+    except Exception as e:
+        logger.warning(f"Could not fingerprint {source}: {e}")
+        return None
+
+
+def process_map(func, items, workers=None, chunksize=4):
+    """Изпълнява func върху items - в пул от процеси, ако има смисъл."""
+    items = sorted(items)
+    workers = workers or settings.IMAGE_DERIVATIVE_WORKERS
+    if workers == 1 or len(items) == 1:
+        return [func(item) for item in items]
+    # дъщерните процеси не трябва да наследяват отворени връзки към базата
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items, chunksize=chunksize))
+
+
+def build_fingerprints(sources, workers=None):
+    """Изчислява липсващите отпечатъци и връща {source: ImageFingerprint}."""
+    sources = set(sources)
+    existing = {fp.source: fp for fp in ImageFingerprint.objects.filter(source__in=sources)}
+    missing = sources - set(existing)
+    if missing:
+        created = [
+            ImageFingerprint(**result).set_bands()
+            for result in process_map(_fingerprint_safely, missing, workers, chunksize=8) if result
+        ]
+        ImageFingerprint.objects.bulk_create(created, ignore_conflicts=True, batch_size=500)
+        existing.update((fp.source, fp) for fp in created)
+    return existing
+
+
+def same_aspect(a, b, tolerance=0.01):
+    return abs(a.width / a.height - b.width / b.height) <= tolerance * (b.width / b.height)
+
+
+def same_colors(a, b):
+    """
+    pHash е в сиво - цветови варианти на продукт, снимани в същата поза,
+    са "близки". Затова се иска същият файл или почти същите цветове
+    във всяка клетка на решетката (fingerprints.color_signature).
+    """
+    if a.sha256 == b.sha256:
+        return True
+    if not a.colors or not b.colors:
+        # отпечатък отпреди цветовете - само точно съвпадение
+        return False
+    return color_distance(a.colors, b.colors) <= settings.IMAGE_DUPLICATE_COLOR_DISTANCE
+
+
+def reuse_similar(sources, workers=None):
+    """
+    Изображенията, за които вече има версии на близък дубликат (със същите
+    пропорции и цвят), получават копие на неговия манифест вместо нов рендер.
+    Връща множеството от source-ите, за които не е нужно рендериране.
+    """
+    fingerprints = build_fingerprints(sources, workers)
+    matches = {
+        source: [m for m in fp.similar() if same_aspect(fp, m) and same_colors(fp, m)]
+        for source, fp in fingerprints.items() if source in sources
+    }
+    candidates = {m.source for found in matches.values() for m in found}
+    manifests = {m.source: m for m in ImageManifest.objects.filter(source__in=candidates)} if candidates else {}
+
+    reused = []
+    for source, found in matches.items():
+        manifest = next((manifests[m.source] for m in found if m.source in manifests), None)
+        if manifest is not None:
+            reused.append(ImageManifest(source=source, width=manifest.width,
+                                        height=manifest.height, variants=manifest.variants))
+    ImageManifest.objects.bulk_create(reused, ignore_conflicts=True, batch_size=500)
+    return {m.source for m in reused}
+
+
+def all_sources():
+    sources = set()
+    for label, field in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        sources.update(model.objects.exclude(**{field: ''}).values_list(field, flat=True))
+    sources.discard(None)
+    return sources
+
+
+def build_manifests(sources, workers=None, force=False):
+    """
+    Генерира версиите на подадените изображения в пул от процеси
+    и записва манифестите с една bulk заявка. Близките дубликати на вече
+    обработени изображения преизползват техните версии. Връща броя на обработените.
+    """
+    sources = set(sources)
+    if not force:
+        sources -= set(ImageManifest.objects.filter(source__in=sources).values_list('source', flat=True))
+    if not sources:
+        return 0
+
+    reused = set()
+    if not force:
+        reused = reuse_similar(sources, workers)
+        sources -= reused
+
+    results = process_map(_render_safely, sources, workers) if sources else []
+    manifests = [ImageManifest(**result) for result in results if result]
+    ImageManifest.objects.bulk_create(
+        manifests,
+        update_conflicts=True,
+        unique_fields=['source'],
+        update_fields=['width', 'height', 'variants'],
+        batch_size=500,
+    )
+    return len(manifests) + len(reused)
+
+
+def attach_manifests(objects, *fields):
+    """
+    Зарежда манифестите за всички обекти с една заявка, за да не прави
+    template tag-ът отделна заявка за всяка карта в каталога.
+    """
+    objects = list(objects)
+    names = {
+        getattr(obj, field).name
+        for obj in objects for field in fields
+        # обекти от различни модели - всеки има само някои от полетата
+        if getattr(obj, field, None)
+    }
+    manifests = {m.source: m for m in ImageManifest.objects.filter(source__in=names)} if names else {}
+    for obj in objects:
+        cache = obj.__dict__.setdefault('_image_manifests', {})
+        for field in fields:
+            file = getattr(obj, field, None)
+            cache[field] = manifests.get(file.name) if file else None
+    return objects
+
+
+def manifest_for(obj, field):
+    cache = obj.__dict__.setdefault('_image_manifests', {})
+    if field not in cache:
+        file = getattr(obj, field)
+        cache[field] = ImageManifest.objects.filter(source=file.name).first() if file else None
+    return cache[field]
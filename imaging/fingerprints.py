@@ -0,0 +1,56 @@
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+
+@lru_cache(maxsize=None)
+def dct_matrix(n):
+    # матрица на DCT-II, така че DCT по двете оси е D @ X @ D.T
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def phash(image):
+    """
+    Перцептивен хеш: 32x32 в сиво, DCT, горните ляви 8x8 ниски честоти
+    сравнени с медианата им. Преоразмеряване, рекомпресия и леки корекции
+    на цвета променят само няколко бита. Връща 64-битово цяло със знак
+    (BigIntegerField в Postgres е signed).
+    """
+    gray = image.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.float64)
+    d = dct_matrix(SAMPLE_SIZE)
+    low = (d @ pixels @ d.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # DC компонентът е просто средната яркост - не участва в медианата
+    bits = low > np.median(low[1:])
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+COLOR_GRID = 4
+
+
+def color_signature(image):
+    """
+    Средните цветове на решетка 4x4 като 16 стойности #rrggbb без '#'.
+    Два цветови варианта на продукт върху еднакъв фон се различават
+    в клетките с продукта, макар pHash (в сиво) да е почти същият.
+    """
+    grid = image.convert('RGB').resize((COLOR_GRID, COLOR_GRID), Image.BOX)
+    return ''.join(f'{r:02x}{g:02x}{b:02x}' for r, g, b in grid.getdata())
+
+
+def color_distance(a, b):
+    """Най-голямото разстояние в RGB между съответните клетки на два подписа."""
+    a, b = (np.frombuffer(bytes.fromhex(s), dtype=np.uint8).reshape(-1, 3).astype(np.int32) for s in (a, b))
+    return float(np.sqrt(((a - b) ** 2).sum(axis=1)).max())
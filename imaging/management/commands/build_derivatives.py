@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from imaging.derivatives import all_sources, build_manifests
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive WebP/JPEG variants for all uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Size of the process pool (default: IMAGE_DERIVATIVE_WORKERS).')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild images that already have a manifest.')
+
+    def handle(self, *args, **options):
+        sources = all_sources()
+        built = build_manifests(sources, workers=options['workers'], force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {built} of {len(sources)} image(s).'))
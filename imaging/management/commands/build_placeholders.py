@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from imaging.placeholders import build_placeholders
+
+
+class Command(BaseCommand):
+    help = 'Compute dimensions, dominant colour and blurred placeholders for uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Size of the process pool (default: IMAGE_DERIVATIVE_WORKERS).')
+        parser.add_argument('--force', action='store_true',
+                            help='Recompute images that already have a placeholder.')
+
+    def handle(self, *args, **options):
+        updated = build_placeholders(workers=options['workers'], force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} image(s).'))
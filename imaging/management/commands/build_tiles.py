@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from imaging.tasks import invalidate_sources
+from imaging.tiles import build_pyramids, tiled_sources
+
+
+class Command(BaseCommand):
+    help = 'Cut product gallery images into Deep Zoom (DZI) tile pyramids.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Size of the process pool (default: IMAGE_DERIVATIVE_WORKERS).')
+        parser.add_argument('--force', action='store_true',
+                            help='Re-tile images that already have a pyramid.')
+
+    def handle(self, *args, **options):
+        sources = tiled_sources()
+        built = build_pyramids(sources, workers=options['workers'], force=options['force'])
+        if built:
+            # кешираните страници сочат към старите ключове
+            invalidate_sources(sources)
+        self.stdout.write(self.style.SUCCESS(f'Tiled {built} of {len(sources)} image(s).'))
@@ -0,0 +1,146 @@
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from imaging.derivatives import IMAGE_FIELDS, build_fingerprints, derivative_name
+from imaging.models import ImageManifest, ImageFingerprint, TilePyramid
+from imaging.storage import content_addressed_storage, content_hash, content_name
+from imaging.tasks import invalidate_sources
+
+
+def rename_variants(manifest, source):
+    """
+    Копира версиите под името на новия оригинал. Старите пътища се пазят от
+    стария stem - щом старото име се освободи, ново качване със същото име би
+    презаписало версиите, към които сочи този манифест.
+    """
+    previous = set()
+    for fmt, widths in manifest.variants.items():
+        for width, name in widths.items():
+            target = derivative_name(source, int(width), fmt)
+            if name == target:
+                continue
+            if not default_storage.exists(target):
+                with default_storage.open(name, 'rb') as f:
+                    target = default_storage.save(target, f)
+            widths[width] = target
+            previous.add(name)
+    return previous
+
+
+def referenced_files(names):
+    """Имената от names, към които още сочи някое файлово поле или индекс."""
+    names, found = set(names), set()
+    for model in apps.get_models():
+        for field in model._meta.get_fields():
+            if isinstance(field, models.FileField):
+                found.update(model.objects.filter(**{f'{field.name}__in': names})
+                             .values_list(field.name, flat=True))
+    for index in (ImageManifest, ImageFingerprint, TilePyramid):
+        found.update(index.objects.filter(source__in=names).values_list('source', flat=True))
+    return found
+
+
+def referenced_variants(names):
+    names, found = set(names), set()
+    for variants in ImageManifest.objects.values_list('variants', flat=True).iterator():
+        for widths in variants.values():
+            found.update(name for name in widths.values() if name in names)
+    return found
+
+
+class Command(BaseCommand):
+    help = ('Move uploaded images into content-addressed storage, so identical files '
+            'are kept once, and list near-duplicate images.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help='Delete the old files once nothing references them.')
+        parser.add_argument('--report', action='store_true',
+                            help='Only list groups of near-duplicate images.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Size of the process pool used for fingerprinting.')
+
+    def handle(self, *args, **options):
+        if options['report']:
+            return self.report(options['workers'])
+
+        prefix = content_addressed_storage.prefix + '/'
+        references = defaultdict(list)
+        for label, field in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__startswith': prefix})
+            for name in names.values_list(field, flat=True).distinct():
+                references[name].append((model, field))
+
+        moved, duplicates = {}, 0
+        for old in sorted(references):
+            if not default_storage.exists(old):
+                self.stderr.write(f'Missing file: {old}')
+                continue
+            with default_storage.open(old, 'rb') as f:
+                new = content_name(content_hash(f), old, content_addressed_storage.prefix)
+                if content_addressed_storage.exists(new):
+                    duplicates += default_storage.size(old)
+                else:
+                    new = content_addressed_storage.save(old, f)
+            moved[old] = new
+
+        old_variants = set()
+        with transaction.atomic():
+            for old, new in moved.items():
+                for model, field in references[old]:
+                    # update() - без сигнали, файлът и версиите му са същите
+                    model.objects.filter(**{field: old}).update(**{field: new})
+                # версиите, отпечатъкът и плочките остават валидни за новото име
+                for index in (ImageManifest, ImageFingerprint, TilePyramid):
+                    if not index.objects.filter(source=new).exists():
+                        index.objects.filter(source=old).update(source=new)
+                        continue
+                    if index is ImageManifest:
+                        for variants in index.objects.filter(source=old).values_list('variants', flat=True):
+                            for widths in variants.values():
+                                old_variants.update(widths.values())
+                    index.objects.filter(source=old).delete()
+                for manifest in ImageManifest.objects.filter(source=new):
+                    old_variants |= rename_variants(manifest, new)
+                    manifest.save(update_fields=['variants'])
+            transaction.on_commit(lambda: invalidate_sources(set(moved.values())))
+
+        kept = 0
+        if options['delete_originals']:
+            # трие се само това, към което след пренасочването не сочи нищо -
+            # друг модел със същия файл или манифест, копиран от reuse_similar
+            still_used = referenced_files(moved) | referenced_variants(old_variants)
+            for name in sorted(set(moved) | old_variants):
+                if name in still_used:
+                    self.stderr.write(f'Kept, still referenced: {name}')
+                    kept += 1
+                else:
+                    default_storage.delete(name)
+
+        unique = len(set(moved.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {len(moved)} file(s) into {unique} content-addressed file(s); '
+            f'{duplicates / 1024 / 1024:.1f} MB were duplicates.'
+            + (f' {kept} old file(s) are still referenced and were kept.' if kept else '')
+        ))
+
+    def report(self, workers):
+        sources = set()
+        for label, field in IMAGE_FIELDS:
+            sources.update(apps.get_model(label).objects.exclude(**{field: ''}).values_list(field, flat=True))
+        fingerprints = build_fingerprints(sources, workers)
+
+        seen = set()
+        for source in sorted(fingerprints):
+            if source in seen:
+                continue
+            group = [fp.source for fp in fingerprints[source].similar() if fp.source not in seen]
+            if group:
+                seen.update(group + [source])
+                self.stdout.write(' ~ '.join([source] + group))
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(fingerprints)} image(s).'))
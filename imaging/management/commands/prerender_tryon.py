@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from imaging.tryon import outfit_jobs, render_jobs
+from main.models import Outfit, TryOnModel
+
+
+class Command(BaseCommand):
+    help = 'Pre-render virtual try-on composites for every outfit.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Size of the process pool (default: IMAGE_DERIVATIVE_WORKERS).')
+
+    def handle(self, *args, **options):
+        models = list(TryOnModel.objects.all())
+        jobs = []
+        for outfit in Outfit.objects.prefetch_related('items__product__category'):
+            jobs.extend(outfit_jobs(outfit, [m for m in models if m.gender == outfit.gender]))
+        rendered = render_jobs(jobs, workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} of {len(jobs)} composite(s).'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('phash', models.BigIntegerField()),
+                ('band0', models.PositiveIntegerField(db_index=True)),
+                ('band1', models.PositiveIntegerField(db_index=True)),
+                ('band2', models.PositiveIntegerField(db_index=True)),
+                ('band3', models.PositiveIntegerField(db_index=True)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
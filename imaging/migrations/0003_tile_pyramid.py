@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imaging', '0002_image_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TilePyramid',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, unique=True)),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('imaging', '0003_tile_pyramid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagefingerprint',
+            name='colors',
+            field=models.CharField(blank=True, max_length=96),
+        ),
+    ]
@@ -0,0 +1,120 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
+
+
+class ImageManifest(models.Model):
+    source = models.CharField(max_length=255, unique=True,
+                              help_text='Storage name of the original upload.')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    # {"webp": {"320": "derivatives/.../w320.webp", ...}, "jpeg": {...}}
+    variants = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+    def __str__(self):
+        return self.source
+
+
+    def srcset(self, fmt):
+        return ', '.join(
+            f"{self.url(name)} {width}w"
+            for width, name in sorted(self.variants.get(fmt, {}).items(), key=lambda v: int(v[0]))
+        )
+
+
+    def fallback(self, fmt='jpeg', max_width=960):
+        # най-голямата версия до max_width - за браузъри без srcset
+        variants = self.variants.get(fmt, {})
+        if not variants:
+            return None
+        widths = sorted(int(w) for w in variants)
+        fitting = [w for w in widths if w <= max_width] or widths[:1]
+        return self.url(variants[str(fitting[-1])])
+
+
+    @staticmethod
+    def url(name):
+        return default_storage.url(name)
+
+
+class ImageFingerprint(models.Model):
+    """
+    sha256 и перцептивен хеш (pHash, 64 бита) на качено изображение.
+    pHash-ът е разделен на 4 ленти по 16 бита с индекс на всяка - две
+    изображения на разстояние до 3 бита имат поне една еднаква лента,
+    така че близките дубликати се търсят с индекс, а не с пълно сканиране.
+    """
+    source = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    phash = models.BigIntegerField()
+    # средните цветове на решетка 4x4 - pHash не различава цветови варианти
+    colors = models.CharField(max_length=96, blank=True)
+    band0 = models.PositiveIntegerField(db_index=True)
+    band1 = models.PositiveIntegerField(db_index=True)
+    band2 = models.PositiveIntegerField(db_index=True)
+    band3 = models.PositiveIntegerField(db_index=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    BANDS = 4
+
+
+    def __str__(self):
+        return self.source
+
+
+    @staticmethod
+    def bands(phash):
+        unsigned = phash & 0xFFFFFFFFFFFFFFFF
+        return [(unsigned >> (16 * i)) & 0xFFFF for i in range(ImageFingerprint.BANDS)]
+
+
+    def set_bands(self):
+        # извиква се и преди bulk_create, който не минава през save()
+        self.band0, self.band1, self.band2, self.band3 = self.bands(self.phash)
+        return self
+
+
+    def save(self, *args, **kwargs):
+        self.set_bands()
+        super().save(*args, **kwargs)
+
+
+    def similar(self, max_distance=None):
+        return ImageFingerprint.find_similar(self.phash, max_distance, exclude=self.source)
+
+
+    @classmethod
+    def find_similar(cls, phash, max_distance=None, exclude=None):
+        """Изображенията на Хемингово разстояние до max_distance, най-близките първи."""
+        if max_distance is None:
+            max_distance = settings.IMAGE_DUPLICATE_DISTANCE
+        query = models.Q()
+        for i, band in enumerate(cls.bands(phash)):
+            query |= models.Q(**{f'band{i}': band})
+        candidates = cls.objects.filter(query)
+        if exclude:
+            candidates = candidates.exclude(source=exclude)
+        matches = [(hamming(phash, c.phash), c) for c in candidates]
+        return [c for distance, c in sorted(matches, key=lambda m: m[0]) if distance <= max_distance]
+
+
+def hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+class TilePyramid(models.Model):
+    """Нарязано на плочки изображение (Deep Zoom) за увеличение в галерията."""
+    source = models.CharField(max_length=255, unique=True)
+    key = models.CharField(max_length=40, unique=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+    def __str__(self):
+        return self.source
+
@@ -0,0 +1,114 @@
+import base64
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from PIL import Image
+
+from .derivatives import IMAGE_FIELDS, open_image
+
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SIZE = 16
+
+
+def placeholder_fields(field):
+    return [f'{field}_width', f'{field}_height', f'{field}_color', f'{field}_placeholder']
+
+
+def dominant_color(pixels):
+    """
+    Най-честият цвят след квантуване до 4 бита на канал (4096 кошчета).
+    Връща средния цвят на пикселите в най-голямото кошче като #rrggbb.
+    """
+    pixels = pixels.reshape(-1, 3).astype(np.int32)
+    bins = ((pixels[:, 0] >> 4) << 8) | ((pixels[:, 1] >> 4) << 4) | (pixels[:, 2] >> 4)
+    top = np.bincount(bins, minlength=4096).argmax()
+    r, g, b = pixels[bins == top].mean(axis=0).round().astype(int)
+    return f'#{r:02x}{g:02x}{b:02x}'
+
+
+def box_blur(pixels, radius=1):
+    # размазване с плъзгащ се прозорец чрез кумулативни суми по двете оси
+    size = 2 * radius + 1
+    padded = np.pad(pixels.astype(np.float32), ((radius, radius), (radius, radius), (0, 0)), mode='edge')
+    summed = padded.cumsum(axis=0).cumsum(axis=1)
+    summed = np.pad(summed, ((1, 0), (1, 0), (0, 0)))
+    window = (summed[size:, size:] - summed[:-size, size:]
+              - summed[size:, :-size] + summed[:-size, :-size])
+    return (window / (size * size)).round().clip(0, 255).astype(np.uint8)
+
+
+def analyze(source):
+    """Размери, доминиращ цвят и малък размазан placeholder като data URI."""
+    image = open_image(source)
+    width, height = image.size
+
+    sample = image.copy()
+    sample.thumbnail((64, 64), Image.BILINEAR, reducing_gap=2.0)
+    color = dominant_color(np.asarray(sample))
+
+    scale = PLACEHOLDER_SIZE / max(width, height)
+    tiny = sample.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.BILINEAR)
+    tiny = Image.fromarray(box_blur(np.asarray(tiny)))
+
+    buffer = io.BytesIO()
+    # WebP е около 3 пъти по-малък от JPEG при толкова малко изображение
+    tiny.save(buffer, 'WEBP', quality=60)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    return {'width': width, 'height': height, 'color': color, 'placeholder': placeholder}
+
+
+def _analyze_safely(source):
+    try:
+        return source, analyze(source)
+    except Exception as e:
+        logger.warning(f"Could not analyze {source}: {e}")
+        return source, None
+
+
+def apply_analysis(instance, field, result):
+    for name, value in zip(placeholder_fields(field),
+                           (result['width'], result['height'], result['color'], result['placeholder'])):
+        setattr(instance, name, value)
+
+
+def build_placeholders(workers=None, force=False, batch_size=500):
+    """
+    Попълва размерите и placeholder-ите на всички изображения, които ги нямат.
+    Файловете се анализират в пул от процеси, записът е с bulk_update.
+    """
+    workers = workers or settings.IMAGE_DERIVATIVE_WORKERS
+    total = 0
+    for label, field in IMAGE_FIELDS:
+        model = apps.get_model(label)
+        rows = model.objects.exclude(**{field: ''})
+        if not force:
+            rows = rows.filter(**{f'{field}_width__isnull': True})
+        rows = list(rows.only('pk', field))
+        if not rows:
+            continue
+
+        sources = sorted({getattr(row, field).name for row in rows})
+        if workers == 1 or len(sources) == 1:
+            results = dict(map(_analyze_safely, sources))
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = dict(pool.map(_analyze_safely, sources, chunksize=8))
+
+        updated = []
+        for row in rows:
+            result = results.get(getattr(row, field).name)
+            if result:
+                apply_analysis(row, field, result)
+                updated.append(row)
+        model.objects.bulk_update(updated, placeholder_fields(field), batch_size=batch_size)
+        total += len(updated)
+    return total
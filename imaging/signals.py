@@ -0,0 +1,72 @@
+from django.apps import apps
+from django.db.models.signals import pre_save, post_save
+
+from taskqueue.models import Task
+
+from .derivatives import IMAGE_FIELDS
+from .models import ImageManifest, TilePyramid
+from .placeholders import placeholder_fields
+from .tasks import generate_derivatives, compute_placeholders, prerender_outfit, generate_tiles
+from .tiles import TILED_FIELDS
+
+
+def _make_pre_save(field):
+    def handler(sender, instance, **kwargs):
+        # при смяна на файла старите размери и placeholder вече не важат
+        if not instance.pk:
+            return
+        old = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+        if old != getattr(instance, field).name:
+            for name in placeholder_fields(field):
+                setattr(instance, name, None if name.endswith(('_width', '_height')) else '')
+    return handler
+
+
+def _make_post_save(label, field):
+    def handler(sender, instance, **kwargs):
+        file = getattr(instance, field)
+        if not file:
+            return
+        if not ImageManifest.objects.filter(source=file.name).exists():
+            generate_derivatives.delay([file.name])
+        if getattr(instance, f'{field}_width') is None:
+            # файл, който не може да се анализира, не се заявява при всяка редакция -
+            # задачата за същия файл чака или вече е изчерпала опитите си
+            args = [label, instance.pk, field, file.name]
+            if not Task.objects.filter(name=compute_placeholders.name, args=args,
+                                       status__in=('queued', 'running', 'failed')).exists():
+                compute_placeholders.delay(*args)
+    return handler
+
+
+for label, field in IMAGE_FIELDS:
+    model = apps.get_model(label)
+    pre_save.connect(_make_pre_save(field), sender=model, weak=False,
+                     dispatch_uid=f'imaging_pre_save_{label}_{field}')
+    post_save.connect(_make_post_save(label, field), sender=model, weak=False,
+                      dispatch_uid=f'imaging_post_save_{label}_{field}')
+
+
+def _make_tiles_post_save(field):
+    def handler(sender, instance, **kwargs):
+        file = getattr(instance, field)
+        if file and not TilePyramid.objects.filter(source=file.name).exists():
+            generate_tiles.delay([file.name])
+    return handler
+
+
+for label, field in TILED_FIELDS:
+    post_save.connect(_make_tiles_post_save(field), sender=apps.get_model(label), weak=False,
+                      dispatch_uid=f'imaging_tiles_{label}_{field}')
+
+
+def _prerender_outfit(sender, instance, **kwargs):
+    outfit_id = instance.outfit_id if sender is OutfitItem else instance.id
+    prerender_outfit.delay(outfit_id)
+
+
+OutfitItem = apps.get_model('main.OutfitItem')
+post_save.connect(_prerender_outfit, sender=apps.get_model('main.Outfit'),
+                  dispatch_uid='imaging_prerender_outfit')
+post_save.connect(_prerender_outfit, sender=OutfitItem,
+                  dispatch_uid='imaging_prerender_outfit_item')
@@ -0,0 +1,48 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+
+
+def content_hash(content, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in iter(lambda: content.read(chunk_size), b''):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(digest, original_name, prefix='cas'):
+    ext = os.path.splitext(original_name)[1].lower()
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Записва качените файлове под sha256 на съдържанието им. Едно и също
+    изображение, качено няколко пъти (в продукт, визия, галерия), заема
+    място на диска веднъж и всички записи в базата сочат към един файл.
+    Затова файловете не бива да се трият при изтриване на един запис.
+    """
+
+    prefix = 'cas'
+
+    def _save(self, name, content):
+        name = content_name(content_hash(content), name, self.prefix)
+        if self.exists(name):
+            return name
+        # при паралелен запис на същия файл FileSystemStorage добавя суфикс -
+        # получава се копие, но нищо не се презаписва
+        return super()._save(name, content)
+
+
+def media_storage():
+    """Storage за полетата с изображения - подава се като callable на ImageField."""
+    if getattr(settings, 'MEDIA_CONTENT_ADDRESSED', True):
+        return content_addressed_storage
+    return default_storage
+
+
+content_addressed_storage = ContentAddressedStorage()
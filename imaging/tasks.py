@@ -0,0 +1,62 @@
+from django.apps import apps
+from main.invalidation import tags_for
+from main.models import Outfit
+from sharedcache.bus import publish
+from taskqueue.registry import task
+from .derivatives import IMAGE_FIELDS, build_manifests
+from .placeholders import analyze, build_placeholders, placeholder_fields
+from .tiles import build_pyramids
+from .tryon import outfit_jobs, render_jobs
+
+
+def invalidate_sources(sources):
+    # кешираните фрагменти с тези изображения са рендирани без версиите/плочките
+    tags = set()
+    for label, field in IMAGE_FIELDS:
+        for obj in apps.get_model(label).objects.filter(**{f'{field}__in': sources}):
+            tags.update(tags_for(obj))
+    publish(tags)
+
+
+@task(priority=-5)
+def generate_derivatives(sources):
+    # качването от admin-а е по едно изображение - без пул от процеси
+    build_manifests(sources, workers=1)
+    invalidate_sources(sources)
+
+
+@task(priority=-5)
+def compute_placeholders(label, pk, field, source=None):
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).only(field).first()
+    if instance is None or not getattr(instance, field):
+        return
+    if source is not None and getattr(instance, field).name != source:
+        # файлът е сменен след заявяването - новият има своя задача
+        return
+    result = analyze(getattr(instance, field).name)
+    # update(), за да не се задействат отново post_save сигналите
+    model.objects.filter(pk=pk).update(**dict(zip(
+        placeholder_fields(field),
+        (result['width'], result['height'], result['color'], result['placeholder']),
+    )))
+    publish(tags_for(instance))
+
+
+@task(priority=-6)
+def fill_placeholders():
+    # след масов импорт - всички изображения без placeholder наведнъж
+    build_placeholders(workers=1)
+
+
+@task(priority=-2)
+def prerender_outfit(outfit_id):
+    outfit = Outfit.objects.prefetch_related('items__product__category').filter(id=outfit_id).first()
+    if outfit is not None:
+        render_jobs(outfit_jobs(outfit), workers=1)
+
+
+@task(priority=-8)
+def generate_tiles(sources):
+    build_pyramids(sources, workers=1)
+    invalidate_sources(sources)
@@ -0,0 +1,70 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from imaging.derivatives import manifest_for
+from imaging.tiles import dzi_url, pyramid_for
+
+
+register = template.Library()
+
+
+def placeholder_attrs(obj, field, style=''):
+    """width/height и фон с placeholder - без разместване докато се зарежда."""
+    attrs = {}
+    width = getattr(obj, f'{field}_width', None)
+    height = getattr(obj, f'{field}_height', None)
+    if width and height:
+        attrs['width'], attrs['height'] = width, height
+
+    background = []
+    color = getattr(obj, f'{field}_color', '')
+    placeholder = getattr(obj, f'{field}_placeholder', '')
+    if color:
+        background.append(f'background-color: {color};')
+    if placeholder:
+        background.append(f'background-image: url({placeholder}); background-size: cover;')
+    style = ' '.join(background + ([style] if style else []))
+    if style:
+        attrs['style'] = style
+    return attrs
+
+
+@register.simple_tag
+def responsive_image(obj, field, alt='', sizes='100vw', css_class='', loading='lazy', style='', **extra):
+    """
+    <picture> с WebP и JPEG srcset - браузърът избира формата според
+    това, което поддържа (Accept), и размера според `sizes`.
+    Без манифест се връща оригиналът. Допълнителните аргументи
+    стават атрибути на <img>.
+    """
+    file = getattr(obj, field)
+    if not file:
+        return ''
+
+    attrs = {'alt': alt, 'class': css_class, 'loading': loading, 'decoding': 'async'}
+    attrs.update(placeholder_attrs(obj, field, style))
+    attrs.update(extra)
+
+    manifest = manifest_for(obj, field)
+    if manifest is None:
+        return format_html('<img src="{}"{}>', file.url, flatatt(attrs))
+
+    return format_html(
+        '<picture style="display: contents;">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}>'
+        '</picture>',
+        manifest.srcset('webp'), sizes,
+        manifest.fallback('jpeg'), manifest.srcset('jpeg'), sizes,
+        flatatt(attrs),
+    )
+
+
+@register.simple_tag
+def zoom_source(obj, field):
+    """Адрес на DZI описанието за увеличение или празен низ, ако още няма плочки."""
+    if not getattr(obj, field):
+        return ''
+    pyramid = pyramid_for(obj, field)
+    return dzi_url(pyramid) if pyramid else ''
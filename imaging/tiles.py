@@ -0,0 +1,154 @@
+import hashlib
+import io
+import logging
+import math
+import time
+from functools import partial
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+from .derivatives import open_image, process_map
+from .models import TilePyramid
+
+
+logger = logging.getLogger(__name__)
+
+# Изображенията от галерията на продукта, които могат да се увеличават
+TILED_FIELDS = [
+    ('main.Product', 'main_image'),
+    ('main.ProductImage', 'image'),
+]
+
+TILE_SIZE = 256
+TILE_OVERLAP = 1
+TILE_FORMAT = 'jpg'
+
+
+def pyramid_key(source, revision=None):
+    """
+    Плочките се сервират като immutable - повторно нарязване (--force) трябва
+    да е под нов ключ, иначе браузърите и прокситата пазят старите.
+    """
+    name = source if revision is None else f"{source}@{revision}"
+    return hashlib.sha256(name.encode()).hexdigest()[:40]
+
+
+def tile_name(key, level, col, row):
+    return f"tiles/{key[:2]}/{key}/{level}/{col}_{row}.{TILE_FORMAT}"
+
+
+def level_count(width, height):
+    # по DZI: последното ниво е в пълен размер, всяко предишно е наполовина до 1x1
+    return math.ceil(math.log2(max(width, height))) + 1
+
+
+def render_pyramid(source, revision=None):
+    """
+    Нарязва изображението на плочки 256x256 за всички нива (DZI).
+    Всяко ниво се смалява от предишното, не от оригинала. Не използва базата.
+    """
+    image = open_image(source)
+    width, height = image.size
+    key = pyramid_key(source, revision)
+    levels = level_count(width, height)
+
+    level_image = image
+    for level in range(levels - 1, -1, -1):
+        scale = 2 ** (levels - 1 - level)
+        size = (max(1, math.ceil(width / scale)), max(1, math.ceil(height / scale)))
+        if level_image.size != size:
+            level_image = level_image.resize(size, Image.LANCZOS)
+
+        for col in range(math.ceil(size[0] / TILE_SIZE)):
+            for row in range(math.ceil(size[1] / TILE_SIZE)):
+                left = col * TILE_SIZE - (TILE_OVERLAP if col else 0)
+                top = row * TILE_SIZE - (TILE_OVERLAP if row else 0)
+                right = min((col + 1) * TILE_SIZE + TILE_OVERLAP, size[0])
+                bottom = min((row + 1) * TILE_SIZE + TILE_OVERLAP, size[1])
+
+                buffer = io.BytesIO()
+                level_image.crop((left, top, right, bottom)).save(buffer, 'JPEG', quality=85)
+                name = tile_name(key, level, col, row)
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    return {'source': source, 'key': key, 'width': width, 'height': height}
+
+
+def _render_safely(source, revision=None):
+    try:
+        return render_pyramid(source, revision)
+    except Exception as e:
+        logger.warning(f"Could not tile {source}: {e}")
+        return None
+
+
+def tiled_sources():
+    sources = set()
+    for label, field in TILED_FIELDS:
+        sources.update(apps.get_model(label).objects.exclude(**{field: ''}).values_list(field, flat=True))
+    sources.discard(None)
+    return sources
+
+
+def build_pyramids(sources, workers=None, force=False):
+    """
+    Нарязва подадените изображения в пул от процеси. Връща броя на обработените.
+    При force пирамидите получават нови ключове - старите плочки остават за
+    вече отворените страници.
+    """
+    sources = set(sources)
+    if not force:
+        sources -= set(TilePyramid.objects.filter(source__in=sources).values_list('source', flat=True))
+    if not sources:
+        return 0
+
+    render = partial(_render_safely, revision=time.time_ns() if force else None)
+    pyramids = [TilePyramid(**result) for result in process_map(render, sources, workers, chunksize=1) if result]
+    TilePyramid.objects.bulk_create(
+        pyramids,
+        update_conflicts=True,
+        unique_fields=['source'],
+        update_fields=['key', 'width', 'height'],
+        batch_size=500,
+    )
+    return len(pyramids)
+
+
+def attach_pyramids(objects, *fields):
+    """Зарежда пирамидите за всички обекти с една заявка (като attach_manifests)."""
+    objects = list(objects)
+    names = {getattr(obj, field).name for obj in objects for field in fields if getattr(obj, field, None)}
+    pyramids = {p.source: p for p in TilePyramid.objects.filter(source__in=names)} if names else {}
+    for obj in objects:
+        cache = obj.__dict__.setdefault('_tile_pyramids', {})
+        for field in fields:
+            file = getattr(obj, field, None)
+            cache[field] = pyramids.get(file.name) if file else None
+    return objects
+
+
+def pyramid_for(obj, field):
+    cache = obj.__dict__.setdefault('_tile_pyramids', {})
+    if field not in cache:
+        file = getattr(obj, field)
+        cache[field] = TilePyramid.objects.filter(source=file.name).first() if file else None
+    return cache[field]
+
+
+def dzi_url(pyramid):
+    return reverse('imaging:dzi', kwargs={'key': pyramid.key})
+
+
+def descriptor(pyramid):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{TILE_SIZE}" '
+        f'Overlap="{TILE_OVERLAP}" Format="{TILE_FORMAT}">'
+        f'<Size Width="{pyramid.width}" Height="{pyramid.height}"/></Image>'
+    )
@@ -0,0 +1,165 @@
+import hashlib
+import io
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+from main.models import TryOnModel
+
+
+logger = logging.getLogger(__name__)
+
+# долните дрехи се рисуват първи, горните - върху тях
+SLOT_ORDER = ('lower', 'dress', 'upper')
+
+# докато ключът е в кеша, рендериране е заявено - и е крайният срок за polling-а
+PENDING_PREFIX = 'tryon-pending:'
+FAILED_PREFIX = 'tryon-failed:'
+FAILED_TTL = 10 * 60
+
+
+def composite_key(model_image, boxes, layers):
+    """
+    Хеш на (модел, зони, набор продукти) - имената на файловете се сменят при
+    ново качване, а редакция на slot_boxes в админа дава нов адрес.
+    """
+    payload = json.dumps([model_image, json.dumps(boxes, sort_keys=True), sorted(layers)],
+                         separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()[:40]
+
+
+def composite_name(key):
+    return f"tryon/{key[:2]}/{key}.jpg"
+
+
+def blend(base, cutout, box):
+    """Alpha blending на RGBA изрезка върху RGB масив в рамките на box (в пиксели)."""
+    x, y, w, h = box
+    cutout = cutout.copy()
+    cutout.thumbnail((max(1, w), max(1, h)), Image.LANCZOS)
+    layer = np.asarray(cutout, dtype=np.float32)
+
+    # центрираме хоризонтално, подравняваме горе
+    left = x + (w - cutout.width) // 2
+    top = y
+    x0, y0 = max(left, 0), max(top, 0)
+    x1 = min(left + cutout.width, base.shape[1])
+    y1 = min(top + cutout.height, base.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return base
+
+    layer = layer[y0 - top:y1 - top, x0 - left:x1 - left]
+    alpha = layer[..., 3:4] / 255.0
+    region = base[y0:y1, x0:x1]
+    base[y0:y1, x0:x1] = layer[..., :3] * alpha + region * (1.0 - alpha)
+    return base
+
+
+def render_composite(key, model_image, boxes, layers):
+    """
+    Рендерира един composite и го записва в storage-а. Не използва базата,
+    за да може да върви в отделен процес. `layers` е списък от (файл, слот).
+    """
+    name = composite_name(key)
+    if default_storage.exists(name):
+        return name
+
+    with default_storage.open(model_image, 'rb') as f:
+        model = ImageOps.exif_transpose(Image.open(f)).convert('RGB')
+    base = np.asarray(model, dtype=np.float32).copy()
+    height, width = base.shape[:2]
+
+    for cutout_name, slot in sorted(layers, key=lambda layer: SLOT_ORDER.index(layer[1])):
+        rx, ry, rw, rh = boxes[slot]
+        box = (round(rx * width), round(ry * height), round(rw * width), round(rh * height))
+        with default_storage.open(cutout_name, 'rb') as f:
+            cutout = Image.open(f).convert('RGBA')
+        base = blend(base, cutout, box)
+
+    buffer = io.BytesIO()
+    Image.fromarray(base.round().clip(0, 255).astype(np.uint8)).save(
+        buffer, 'JPEG', quality=85, optimize=True, progressive=True
+    )
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def _render_safely(job):
+    try:
+        return render_composite(*job)
+    except Exception as e:
+        logger.warning(f"Try-on composite {job[0]} failed: {e}")
+        return None
+
+
+def products_layers(products):
+    layers = []
+    for product in products:
+        slot = product.get_tryon_slot()
+        if product.tryon_image and slot in SLOT_ORDER:
+            layers.append((product.tryon_image.name, slot))
+    return layers
+
+
+def make_job(model, products):
+    layers = products_layers(products)
+    if not layers:
+        return None
+    key = composite_key(model.image.name, model.slot_boxes, layers)
+    return (key, model.image.name, model.slot_boxes, layers)
+
+
+def default_model(gender):
+    """Моделът за пробата на сайта - винаги един и същ, за да се ползва кешираният composite."""
+    return TryOnModel.objects.filter(gender=gender).order_by('created_at', 'id').first()
+
+
+def outfit_jobs(outfit, models=None):
+    # очаква prefetch_related('items__product__category')
+    products = [item.product for item in outfit.items.all()]
+    if models is None:
+        models = TryOnModel.objects.filter(gender=outfit.gender)
+    return [job for job in (make_job(model, products) for model in models) if job]
+
+
+def render_jobs(jobs, workers=None):
+    """Рендерира липсващите composites в пул от процеси."""
+    jobs = [job for job in jobs if not default_storage.exists(composite_name(job[0]))]
+    if not jobs:
+        return 0
+    workers = workers or settings.IMAGE_DERIVATIVE_WORKERS
+    if workers == 1 or len(jobs) == 1:
+        results = [_render_safely(job) for job in jobs]
+    else:
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render_safely, jobs))
+    failed = [job[0] for job, result in zip(jobs, results) if not result]
+    if failed:
+        # polling-ът на модала спира веднага, вместо да чака крайния срок
+        cache.set_many({FAILED_PREFIX + key: 1 for key in failed}, FAILED_TTL)
+        cache.delete_many([PENDING_PREFIX + key for key in failed])
+    return len(jobs) - len(failed)
+
+
+def composite_exists(key):
+    return default_storage.exists(composite_name(key))
+
+
+def mark_pending(key):
+    """True, ако за ключа още няма заявено рендериране (и сега се заявява)."""
+    if cache.get(FAILED_PREFIX + key):
+        return False
+    return cache.add(PENDING_PREFIX + key, 1, settings.TRYON_RENDER_DEADLINE)
+
+
+def render_failed(key):
+    """Рендерирането е пропаднало или не е приключило до крайния срок."""
+    return bool(cache.get(FAILED_PREFIX + key)) or not cache.has_key(PENDING_PREFIX + key)
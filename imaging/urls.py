@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'imaging'
+
+urlpatterns = [
+    path('tryon/<str:key>.jpg', views.tryon_image, name='tryon_image'),
+    path('tiles/<str:key>.dzi', views.dzi, name='dzi'),
+    path('tiles/<str:key>_files/<int:level>/<int:col>_<int:row>.jpg', views.tile, name='tile'),
+]
@@ -0,0 +1,50 @@
+import re
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from .models import TilePyramid
+from .tiles import descriptor, tile_name
+from .tryon import composite_name
+
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+@require_GET
+def tryon_image(request, key):
+    if not re.fullmatch(r'[0-9a-f]{40}', key):
+        raise Http404
+    name = composite_name(key)
+    if not default_storage.exists(name):
+        raise Http404
+
+    # адресът зависи от съдържанието - файлът никога не се променя
+    response = FileResponse(default_storage.open(name, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = IMMUTABLE
+    response['ETag'] = f'"{key}"'
+    return response
+
+
+@require_GET
+def dzi(request, key):
+    pyramid = get_object_or_404(TilePyramid, key=key)
+    response = HttpResponse(descriptor(pyramid), content_type='application/xml')
+    response['Cache-Control'] = IMMUTABLE
+    return response
+
+
+@require_GET
+def tile(request, key, level, col, row):
+    # пътят идва от ключа - без заявка към базата за всяка плочка
+    if not re.fullmatch(r'[0-9a-f]{40}', key):
+        raise Http404
+    name = tile_name(key, level, col, row)
+    if not default_storage.exists(name):
+        raise Http404
+
+    response = FileResponse(default_storage.open(name, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = IMMUTABLE
+    return response
@@ -4,8 +4,10 @@ from .translation import *  # noqa  <-- гарантира, че моделит
 
 from .models import (
     Category, Size, Product, ProductImage, ProductSize,
-    ProductReview, Outfit, OutfitItem, OutfitImage, NewsletterSubscriber
+    ProductReview, Outfit, OutfitItem, OutfitImage, NewsletterSubscriber,
+    NewsletterCampaign, TryOnModel
 )
+from .tasks import deliver_campaign, resume_campaign
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
@@ -51,9 +53,32 @@ class OutfitAdmin(TranslationAdmin):
 
 @admin.register(NewsletterSubscriber)
 class NewsletterSubscriberAdmin(admin.ModelAdmin):
-    list_display = ('email', 'discount_code', 'date_subscribed')
+    list_display = ('email', 'discount_code', 'language', 'date_subscribed')
     search_fields = ('email',)
-    list_filter = ('date_subscribed',)
+    list_filter = ('date_subscribed', 'language')
+
+@admin.register(NewsletterCampaign)
+class NewsletterCampaignAdmin(TranslationAdmin):
+    list_display = ('subject', 'status', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    readonly_fields = ('status', 'last_subscriber_id', 'sent_at')
+    actions = ['send_campaigns', 'resume_campaigns']
+
+    @admin.action(description='Send selected campaigns in the background')
+    def send_campaigns(self, request, queryset):
+        for campaign in queryset:
+            deliver_campaign.delay(campaign.id)
+        self.message_user(request, f'{queryset.count()} campaign(s) queued for sending.')
+
+    @admin.action(description='Resume stalled campaigns from where they stopped')
+    def resume_campaigns(self, request, queryset):
+        resumed = sum(resume_campaign(campaign.id) for campaign in queryset.filter(status='sending'))
+        self.message_user(request, f'{resumed} campaign(s) resumed.')
+
+@admin.register(TryOnModel)
+class TryOnModelAdmin(admin.ModelAdmin):
+    list_display = ['name', 'gender', 'created_at']
+    list_filter = ['gender']
 
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Size, SizeAdmin)
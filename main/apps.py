@@ -8,3 +8,4 @@ class MainConfig(AppConfig):
     def ready(self):
         # важно: регистрира преводите преди admin-а
         from . import translation  # noqa:
+        from . import invalidation  # noqa
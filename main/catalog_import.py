@@ -0,0 +1,271 @@
+import csv
+import json
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import translation
+from django.utils.text import slugify
+
+from imaging.placeholders import placeholder_fields
+from imaging.tasks import generate_derivatives, generate_tiles, fill_placeholders
+from sharedcache.bus import publish
+from .invalidation import product_tags
+from .models import Category, Product, ProductImage, ProductSize, Size
+
+
+TRANSLATED_FIELDS = ('name', 'color', 'description')
+LANGUAGES = settings.MODELTRANSLATION_LANGUAGES
+DEFAULT_LANGUAGE = settings.MODELTRANSLATION_DEFAULT_LANGUAGE
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path):
+    """
+    Чете CSV или JSONL ред по ред, без да зарежда целия файл в паметта.
+    Връща двойки (номер на ред, dict). Неразчетен ред идва с RowError
+    вместо dict - отчита се и се пропуска, без да спира импорта.
+    """
+    path = Path(path)
+    with path.open(newline='', encoding='utf-8-sig') as f:
+        if path.suffix.lower() in ('.jsonl', '.ndjson'):
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        yield number, RowError(f"Invalid JSON: {e}")
+        else:
+            # първият ред е заглавният
+            for number, row in enumerate(csv.DictReader(f), 2):
+                yield number, row
+
+
+def parse_sizes(value):
+    """{"S": 10, "M": 5} от JSONL или "S:10|M:5" от CSV."""
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = [part.split(':', 1) if ':' in part else (part, 0)
+                 for part in str(value).split('|') if part.strip()]
+    try:
+        sizes = {str(name).strip(): int(stock) for name, stock in items}
+    except (TypeError, ValueError):
+        raise RowError(f"Invalid sizes: {value!r}")
+    if any(stock < 0 for stock in sizes.values()):
+        raise RowError(f"Negative stock in sizes: {value!r}")
+    return sizes
+
+
+def parse_list(value):
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part.strip() for part in str(value).split('|') if part.strip()]
+
+
+def present(row, key):
+    value = row.get(key)
+    return value is not None and value != ''
+
+
+class CatalogImporter:
+    """
+    Масов импорт на продукти: редовете се обработват на порции, категориите
+    и размерите се намират в речници в паметта, а Product и ProductSize се
+    записват с bulk_create(update_conflicts=True) - по slug и (product, size).
+    Изображенията се копират от локална папка в пул от нишки.
+    """
+
+    def __init__(self, image_dir=None, threads=8, chunk_size=1000):
+        self.image_dir = Path(image_dir) if image_dir else None
+        self.threads = threads
+        self.chunk_size = chunk_size
+        self.categories = dict(Category.objects.values_list('slug', 'id'))
+        self.sizes = {name.lower(): pk for pk, name in Size.objects.values_list('id', 'name')}
+        self.images = {}
+        self.counts = Counter()
+        self.errors = []
+        self.sources = set()
+
+    def run(self, rows):
+        rows = iter(rows)
+        # базовите колони (name, color...) се попълват според активния език
+        with translation.override(DEFAULT_LANGUAGE):
+            while chunk := list(islice(rows, self.chunk_size)):
+                self.import_chunk(chunk)
+        if self.sources:
+            fill_placeholders.delay()
+        return self.counts
+
+    def clean(self, row):
+        if isinstance(row, RowError):
+            raise row
+        if not isinstance(row, dict):
+            raise RowError('Row is not an object.')
+        slug = (row.get('slug') or '').strip() or slugify(row.get(f'name_{DEFAULT_LANGUAGE}') or row.get('name') or '')
+        if not slug:
+            raise RowError('Missing slug or name.')
+
+        fields = {'slug': slug}
+        for field in TRANSLATED_FIELDS:
+            if present(row, field):
+                fields[f'{field}_{DEFAULT_LANGUAGE}'] = str(row[field]).strip()
+            for language in LANGUAGES:
+                if present(row, f'{field}_{language}'):
+                    fields[f'{field}_{language}'] = str(row[f'{field}_{language}']).strip()
+            if f'{field}_{DEFAULT_LANGUAGE}' in fields:
+                fields[field] = fields[f'{field}_{DEFAULT_LANGUAGE}']
+
+        if present(row, 'category'):
+            category = str(row['category']).strip()
+            if category not in self.categories:
+                raise RowError(f"Unknown category {category!r}.")
+            fields['category_id'] = self.categories[category]
+
+        if present(row, 'price'):
+            try:
+                fields['price'] = Decimal(str(row['price'])).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise RowError(f"Invalid price {row['price']!r}.")
+
+        item = {
+            'fields': fields,
+            'sizes': parse_sizes(row['sizes']) if present(row, 'sizes') else None,
+            'main_image': str(row['main_image']).strip() if present(row, 'main_image') else None,
+            'images': parse_list(row['images']) if present(row, 'images') else None,
+        }
+        if (item['main_image'] or item['images']) and self.image_dir is None:
+            raise RowError('Row references images but no image directory was given.')
+        return item
+
+    def size_id(self, name):
+        key = name.lower()
+        if key not in self.sizes:
+            self.sizes[key] = Size.objects.create(name=name).id
+            self.counts['sizes created'] += 1
+        return self.sizes[key]
+
+    def save_image(self, field_name, relative):
+        field = (Product if field_name == 'main_image' else ProductImage)._meta.get_field(field_name)
+        path = self.image_dir / relative
+        with path.open('rb') as f:
+            return field.storage.save(field.generate_filename(None, path.name), File(f, name=path.name),
+                                      max_length=field.max_length)
+
+    def load_images(self, items):
+        """Копира всички нови изображения от порцията паралелно."""
+        wanted = set()
+        for item in items:
+            if item['main_image']:
+                wanted.add(('main_image', item['main_image']))
+            wanted.update(('image', name) for name in item['images'] or [])
+        wanted -= set(self.images)
+        if not wanted:
+            return
+
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            futures = {key: pool.submit(self.save_image, *key) for key in wanted}
+        for key, future in futures.items():
+            try:
+                self.images[key] = future.result()
+            except OSError as e:
+                self.images[key] = None
+                self.errors.append((None, f"Image {key[1]}: {e}"))
+
+    @transaction.atomic
+    def import_chunk(self, chunk):
+        items = {}
+        for number, row in chunk:
+            try:
+                item = self.clean(row)
+            except RowError as e:
+                self.errors.append((number, str(e)))
+                self.counts['failed'] += 1
+                continue
+            # при повторен slug в порцията важи последният ред
+            items[item['fields']['slug']] = item
+
+        # съществуващите продукти се зареждат цели - INSERT ... ON CONFLICT
+        # проверява NOT NULL колоните и когато редът ще бъде обновен
+        existing = Product.objects.in_bulk(items, field_name='slug')
+        for slug, item in list(items.items()):
+            missing = [f for f in (f'name_{DEFAULT_LANGUAGE}', 'category_id', 'price') if f not in item['fields']]
+            if slug not in existing and missing:
+                self.errors.append((None, f"{slug}: new product needs {', '.join(missing)}."))
+                self.counts['failed'] += 1
+                del items[slug]
+        if not items:
+            return
+
+        self.load_images(items.values())
+        for slug, item in items.items():
+            if item['main_image'] and self.images.get(('main_image', item['main_image'])):
+                item['fields']['main_image'] = self.images[('main_image', item['main_image'])]
+                if slug in existing and existing[slug].main_image.name != item['fields']['main_image']:
+                    # размерите и placeholder-ът са на старата снимка - fill_placeholders
+                    # попълва само редове без ширина
+                    width, height, color, placeholder = placeholder_fields('main_image')
+                    item['fields'].update({width: None, height: None, color: '', placeholder: ''})
+
+        # редовете с еднакъв набор колони се записват заедно и се обновяват
+        # само подадените колони - липсващо поле не се презаписва с празно
+        groups = defaultdict(list)
+        for slug, item in items.items():
+            product = existing.get(slug) or Product()
+            for name, value in item['fields'].items():
+                setattr(product, name, value)
+            groups[frozenset(item['fields'])].append(product)
+        for columns, products in groups.items():
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['slug'],
+                update_fields=sorted(columns - {'slug'}) + ['updated_at'],
+            )
+        ids = dict(Product.objects.filter(slug__in=items).values_list('slug', 'id'))
+
+        sizes = [
+            ProductSize(product_id=ids[slug], size_id=self.size_id(name), stock=stock)
+            for slug, item in items.items() if item['sizes'] is not None
+            for name, stock in item['sizes'].items()
+        ]
+        ProductSize.objects.bulk_create(
+            sizes, update_conflicts=True, unique_fields=['product', 'size'], update_fields=['stock', 'updated_at'],
+        )
+
+        # галерията се подменя изцяло, ако редът подава колоната images
+        gallery = {slug: item['images'] for slug, item in items.items() if item['images'] is not None}
+        ProductImage.objects.filter(product_id__in=[ids[slug] for slug in gallery]).delete()
+        ProductImage.objects.bulk_create([
+            ProductImage(product_id=ids[slug], image=self.images[('image', name)])
+            for slug, names in gallery.items() for name in names
+            if self.images.get(('image', name))
+        ])
+
+        self.counts['created'] += len(items.keys() - existing)
+        self.counts['updated'] += len(items.keys() & existing)
+        self.counts['sizes'] += len(sizes)
+        # bulk_create не изпраща сигнали - кешовете се инвалидират тук
+        publish(['products', *product_tags(*ids.values())])
+        self.enqueue_processing(items)
+
+    def enqueue_processing(self, items):
+        # bulk_create не изпраща post_save - версиите и плочките се заявяват тук
+        sources = {item['fields']['main_image'] for item in items.values() if 'main_image' in item['fields']}
+        sources.update(
+            self.images[('image', name)] for item in items.values()
+            for name in item['images'] or [] if self.images.get(('image', name))
+        )
+        sources -= self.sources
+        if sources:
+            generate_derivatives.delay(sorted(sources))
+            generate_tiles.delay(sorted(sources))
+            self.sources |= sources
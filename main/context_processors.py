@@ -1,6 +1,46 @@
+from functools import wraps
+
+from sharedcache.bus import cached
+from . import request_cache
 from .models import Category
 
+
+def uses_global_context(*names):
+    """
+    Декоратор за view: кои от глобалните стойности ('cart', 'wishlist',
+    'categories') четат шаблоните му. Без декоратор - всички.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            declare_global_context(request, *names)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def declare_global_context(request, *names):
+    # за view-та, при които отговорът зависи от параметрите (HTMX partial или цяла страница)
+    request.global_context = frozenset(names)
+
+
+def wants_global_context(request, name):
+    declared = getattr(request, 'global_context', None)
+    return declared is None or name in declared
+
+
+def root_categories():
+    # дървото се кешира в паметта на worker-а и се изчиства при промяна (main.invalidation);
+    # в рамките на заявката view-тата и context processor-ът ползват един и същ списък
+    return request_cache.memo('categories', lambda: cached('categories:tree', lambda: list(
+        Category.objects.filter(parent__isnull=True).prefetch_related('subcategories')
+    ), tags=['categories']), depends=(Category,))
+
+
 def categories(request):
+    if not wants_global_context(request, 'categories'):
+        return {}
+    # шаблонът извиква функцията само ако използва categories
     return {
-        'categories': Category.objects.filter(parent__isnull=True).prefetch_related('subcategories')
+        'categories': root_categories
     }
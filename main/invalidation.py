@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_save
+
+from sharedcache.bus import publish
+from .models import (
+    Category, Outfit, OutfitImage, OutfitItem, Product, ProductImage, ProductReview, ProductSize, Size,
+)
+from .signals import stock_changed
+
+
+# Общите тагове ("products", "categories"...) изчистват всички списъци и
+# решетки - затова се изпращат само при промяна, която ги засяга, а не при
+# наличност, галерия или ревю (те са само в страницата на продукта).
+
+def product_tags(*product_ids):
+    return [f"product:{pk}" for pk in product_ids]
+
+
+def category_tags(*category_ids):
+    return [f"category:{pk}" for pk in category_ids]
+
+
+def outfit_tags(*outfit_ids):
+    return [f"outfit:{pk}" for pk in outfit_ids]
+
+
+def tags_for(instance, added_or_removed=False):
+    """
+    Таговете на кешираните данни, които зависят от обекта. added_or_removed -
+    обектът е създаден или изтрит, а не само променен.
+    """
+    if isinstance(instance, Product):
+        return ['products', *product_tags(instance.pk), *category_tags(instance.category_id)]
+    if isinstance(instance, ProductSize):
+        # филтърът по размер в каталога зависи от наличието на реда, не от бройката
+        return product_tags(instance.product_id) + (['products'] if added_or_removed else [])
+    if isinstance(instance, (ProductImage, ProductReview)):
+        return product_tags(instance.product_id)
+    if isinstance(instance, Category):
+        return ['categories', *category_tags(instance.pk, *([instance.parent_id] if instance.parent_id else []))]
+    if isinstance(instance, Size):
+        return ['sizes', 'products']
+    if isinstance(instance, Outfit):
+        return ['outfits', *outfit_tags(instance.pk)]
+    if isinstance(instance, (OutfitItem, OutfitImage)):
+        return ['outfits', *outfit_tags(instance.outfit_id)]
+    return []
+
+
+def _invalidate(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    # post_delete няма created - изтриването също променя списъците
+    publish(tags_for(instance, added_or_removed=kwargs.get('created', True)))
+
+
+for model in (Product, ProductSize, ProductImage, ProductReview, Category, Size, Outfit, OutfitItem, OutfitImage):
+    post_save.connect(_invalidate, sender=model, dispatch_uid=f'invalidate_save_{model.__name__}')
+    post_delete.connect(_invalidate, sender=model, dispatch_uid=f'invalidate_delete_{model.__name__}')
+
+
+def _invalidate_stock(sender, product_ids, **kwargs):
+    publish(product_tags(*product_ids))
+
+
+stock_changed.connect(_invalidate_stock, dispatch_uid='invalidate_stock_changed')
@@ -0,0 +1,148 @@
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Product, ProductSize
+from .signals import stock_changed
+
+
+MODES = ('absolute', 'delta')
+
+
+def parse_stock_lines(lines, fmt='csv'):
+    """
+    Редове (slug, size, стойност) от CSV с колони slug,size,stock (или delta)
+    или от JSONL с {"slug": ..., "size": ..., "stock"/"delta": ...}.
+    `lines` е итератор от текстови редове - файлът не се чете наведнъж.
+    """
+    if fmt == 'jsonl':
+        records = (json.loads(line) for line in lines if line.strip())
+    else:
+        records = csv.DictReader(lines)
+    for record in records:
+        value = record.get('stock', record.get('delta'))
+        yield (str(record.get('slug') or '').strip(), str(record.get('size') or '').strip(), value)
+
+
+def sku(slug, size):
+    return f"{slug}:{size}"
+
+
+class InventorySync:
+    """
+    Прилага наличности на порции: редовете се свързват с ProductSize с една
+    заявка на порция, а промените се записват с един UPDATE ... FROM (VALUES ...).
+    Връща резултат за всеки SKU (slug:размер).
+    """
+
+    def __init__(self, mode='absolute', chunk_size=2000):
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode {mode!r}.")
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.counts = Counter()
+        self.results = []
+
+    def run(self, rows):
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            self.apply_chunk(chunk)
+        return self.counts
+
+    def report(self, sku, status, stock=None):
+        self.counts[status] += 1
+        self.results.append((sku, status, stock))
+
+    def clean(self, chunk):
+        values, self.names = {}, {}
+        for slug, size, value in chunk:
+            if not slug or not size:
+                self.report(sku(slug, size), 'invalid')
+                continue
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                self.report(sku(slug, size), 'invalid')
+                continue
+            if self.mode == 'absolute' and value < 0:
+                self.report(sku(slug, size), 'invalid')
+                continue
+            key = (slug, size.lower())
+            self.names[key] = sku(slug, size)
+            # повторен SKU: при delta промените се събират, иначе важи последният
+            values[key] = values.get(key, 0) + value if self.mode == 'delta' else value
+        return values
+
+    @transaction.atomic
+    def apply_chunk(self, chunk):
+        values = self.clean(chunk)
+        if not values:
+            return
+
+        rows = {
+            (slug, size.lower()): (pk, product_id, size, stock)
+            for pk, product_id, slug, size, stock in ProductSize.objects
+            .filter(product__slug__in={slug for slug, _ in values})
+            .values_list('id', 'product_id', 'product__slug', 'size__name', 'stock')
+        }
+
+        changes, products = {}, {}
+        for key, value in values.items():
+            row = rows.get(key)
+            if row is None:
+                self.report(self.names[key], 'unknown')
+                continue
+            pk, product_id, size, stock = row
+            if (value == stock) if self.mode == 'absolute' else (value == 0):
+                self.report(sku(key[0], size), 'unchanged', stock)
+                continue
+            changes[pk] = value
+            products[pk] = (product_id, sku(key[0], size))
+
+        if not changes:
+            return
+        for pk, stock in self.write(changes).items():
+            self.report(products[pk][1], 'updated', stock)
+
+        product_ids = {product_id for product_id, _ in products.values()}
+        # updated_at участва в ключовете на кешовете - обновяваме го с една заявка
+        Product.objects.filter(id__in=product_ids).update(updated_at=timezone.now())
+        # след commit - иначе кешът може да се напълни отново със старите стойности
+        transaction.on_commit(lambda: stock_changed.send(sender=ProductSize, product_ids=product_ids))
+
+    def write(self, changes):
+        """Записва {ProductSize.id: стойност} и връща новите наличности."""
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return self.write_bulk_update(changes)
+
+        table = connection.ops.quote_name(ProductSize._meta.db_table)
+        if self.mode == 'absolute':
+            expression = 'v.value'
+        else:
+            # наличността не пада под 0 (PositiveIntegerField)
+            expression = 'CASE WHEN t.stock + v.value < 0 THEN 0 ELSE t.stock + v.value END'
+        placeholders = ', '.join(['(%s, %s)'] * len(changes))
+        sql = (
+            f'WITH v (ps_id, value) AS (VALUES {placeholders}) '
+            f'UPDATE {table} AS t SET stock = {expression}, updated_at = %s FROM v '
+            f'WHERE t.id = v.ps_id RETURNING id, stock'
+        )
+        params = [item for pair in changes.items() for item in pair] + [timezone.now()]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return dict(cursor.fetchall())
+
+    def write_bulk_update(self, changes):
+        now = timezone.now()
+        objects = [ProductSize(id=pk, updated_at=now) for pk in changes]
+        for obj in objects:
+            obj.stock = (Value(changes[obj.id]) if self.mode == 'absolute'
+                         else Greatest(F('stock') + changes[obj.id], 0))
+        ProductSize.objects.bulk_update(objects, ['stock', 'updated_at'], batch_size=500)
+        return dict(ProductSize.objects.filter(id__in=changes).values_list('id', 'stock'))
@@ -0,0 +1,69 @@
+import hashlib
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import translation
+from django.views.i18n import JavaScriptCatalog
+
+
+DOMAIN = 'djangojs'
+
+_rendered = {}
+_lock = threading.Lock()
+
+
+def locale_dirs():
+    # същите директории, които обхожда DjangoTranslation без localedirs
+    dirs = [Path(django.__file__).parent / 'conf' / 'locale']
+    dirs += [Path(app.path) / 'locale' for app in apps.get_app_configs()]
+    dirs += [Path(path) for path in settings.LOCALE_PATHS]
+    return dirs
+
+
+@lru_cache(maxsize=None)
+def catalog_version():
+    """
+    Хеш на всички компилирани djangojs.mo файлове. Сменя се само при нов
+    deploy (процесите се рестартират), затова се смята веднъж на процес.
+    """
+    digest = hashlib.sha256()
+    for directory in locale_dirs():
+        for mo in sorted(directory.glob(f'*/LC_MESSAGES/{DOMAIN}.mo')):
+            digest.update(str(mo.relative_to(directory)).encode())
+            digest.update(mo.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def render_catalog(language):
+    """
+    JavaScript каталогът за езика - рендерира се при първото поискване и се
+    пази в паметта за (език, версия на каталога). Връща (съдържание, хеш).
+    """
+    key = (language, catalog_version())
+    if key not in _rendered:
+        with _lock:
+            if key not in _rendered:
+                with translation.override(language):
+                    content = JavaScriptCatalog(domain=DOMAIN).get(None).content
+                _rendered[key] = (content, hashlib.sha256(content).hexdigest()[:12])
+    return _rendered[key]
+
+
+def static_name(language, digest):
+    return f'jsi18n/{language}/{digest}.js'
+
+
+def catalog_url(language=None):
+    language = language or translation.get_language() or settings.LANGUAGE_CODE
+    if language not in dict(settings.LANGUAGES):
+        language = settings.LANGUAGE_CODE
+    _, digest = render_catalog(language)
+    if settings.JS_CATALOG_STATIC:
+        return static(static_name(language, digest))
+    return reverse('javascript-catalog-versioned', kwargs={'language': language, 'digest': digest})
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.jsi18n import render_catalog, static_name
+
+
+class Command(BaseCommand):
+    help = ('Pre-render the JavaScript translation catalog for every language into '
+            'STATIC_ROOT/jsi18n/, so it can be served as a static file (JS_CATALOG_STATIC).')
+
+    def handle(self, *args, **options):
+        if not settings.STATIC_ROOT:
+            raise CommandError('STATIC_ROOT is not set.')
+        for language, _ in settings.LANGUAGES:
+            content, digest = render_catalog(language)
+            path = Path(settings.STATIC_ROOT) / static_name(language, digest)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+            self.stdout.write(f'{language}: {path}')
+        self.stdout.write(self.style.SUCCESS('JavaScript catalogs written.'))
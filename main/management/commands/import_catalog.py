@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.catalog_import import CatalogImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Import or update products, sizes, stock, translations and images from a CSV or '
+            'JSONL file. Products are matched by slug.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or JSONL (one product per line).')
+        parser.add_argument('--images', dest='image_dir',
+                            help='Directory that main_image/images paths are relative to.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Threads used to copy images into media storage.')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows written per transaction.')
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(
+            image_dir=options['image_dir'],
+            threads=options['threads'],
+            chunk_size=options['chunk_size'],
+        )
+        try:
+            counts = importer.run(read_rows(options['path']))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, message in importer.errors:
+            self.stderr.write(f'line {line}: {message}' if line else message)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']}, updated {counts['updated']} product(s); "
+            f"{counts['sizes']} size row(s); {counts['failed']} row(s) skipped."
+        ))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import NewsletterCampaign
+from main.newsletter import send_campaign, smtp_connection
+
+
+class Command(BaseCommand):
+    help = 'Send a newsletter campaign to all subscribers, resuming where it stopped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', type=int)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--rate', type=float, default=settings.NEWSLETTER_SEND_RATE,
+                            help='Maximum messages per second (0 = unlimited).')
+        parser.add_argument('--retry-failed', action='store_true',
+                            help='Start over from the first subscriber and retry failed deliveries.')
+        parser.add_argument('--smtp-host', help='Send through this SMTP server instead of EMAIL_BACKEND.')
+        parser.add_argument('--smtp-port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        try:
+            campaign = NewsletterCampaign.objects.get(id=options['campaign_id'])
+        except NewsletterCampaign.DoesNotExist:
+            raise CommandError(f"Campaign {options['campaign_id']} does not exist.")
+
+        connection = None
+        if options['smtp_host']:
+            connection = smtp_connection(options['smtp_host'], options['smtp_port'])
+
+        counts = send_campaign(
+            campaign,
+            connection=connection,
+            chunk_size=options['chunk_size'],
+            rate=options['rate'],
+            retry_failed=options['retry_failed'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Campaign {campaign.id}: sent={counts['sent']} failed={counts['failed']} "
+            f"skipped={counts['skipped']}"
+        ))
@@ -0,0 +1,41 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.inventory import MODES, InventorySync, parse_stock_lines
+
+
+class Command(BaseCommand):
+    help = ('Apply a stock file (CSV with slug,size,stock|delta columns or JSONL) to '
+            'ProductSize in bulk and report the result for every SKU.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--mode', choices=MODES, default='absolute',
+                            help='absolute: set stock to the given value; delta: add it.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows written per UPDATE statement.')
+        parser.add_argument('--report', help='Write per-SKU results to this CSV file.')
+
+    def handle(self, *args, **options):
+        fmt = 'jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv'
+        sync = InventorySync(mode=options['mode'], chunk_size=options['chunk_size'])
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                counts = sync.run(parse_stock_lines(f, fmt))
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(str(e))
+
+        if options['report']:
+            with open(options['report'], 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['sku', 'status', 'stock'])
+                writer.writerows(sync.results)
+        else:
+            for sku, status, _ in sync.results:
+                if status in ('unknown', 'invalid'):
+                    self.stderr.write(f'{sku}: {status}')
+
+        self.stdout.write(self.style.SUCCESS(', '.join(
+            f'{status}={counts[status]}' for status in ('updated', 'unchanged', 'unknown', 'invalid')
+        )))
@@ -0,0 +1,15 @@
+from . import request_cache
+
+
+class RequestCacheMiddleware:
+    """Отваря request_cache за заявката и го затваря след отговора."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request_cache.begin()
+        try:
+            return self.get_response(request)
+        finally:
+            request_cache.end(token)
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_category_name_bg_category_name_en_outfit_title_bg_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200)),
+                ('subject_en', models.CharField(max_length=200, null=True)),
+                ('subject_bg', models.CharField(max_length=200, null=True)),
+                ('body', models.TextField()),
+                ('body_en', models.TextField(null=True)),
+                ('body_bg', models.TextField(null=True)),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('sending', 'Sending'), ('sent', 'Sent')], default='draft', max_length=10)),
+                ('last_subscriber_id', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='newslettersubscriber',
+            name='language',
+            field=models.CharField(choices=[('en', 'English'), ('bg', 'Bulgarian')], default='en', max_length=5),
+        ),
+        migrations.CreateModel(
+            name='CampaignDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='main.newslettersubscriber')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='main.newslettercampaign')),
+            ],
+            options={
+                'unique_together': {('campaign', 'subscriber')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:03
+
+import main.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0017_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TryOnModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('gender', models.CharField(choices=[('male', 'Male'), ('female', 'Female')], max_length=10)),
+                ('image', models.ImageField(upload_to='tryon_models/')),
+                ('slot_boxes', models.JSONField(default=main.models.default_slot_boxes, help_text='Relative [x, y, width, height] per slot.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='tryon_slot',
+            field=models.CharField(blank=True, choices=[('upper', 'Upper (tops)'), ('lower', 'Lower (bottoms)'), ('dress', 'One-piece (dress)')], max_length=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='tryon_image',
+            field=models.ImageField(blank=True, help_text='Cutout PNG (transparent background) for Virtual Try-On', null=True, upload_to='products/tryon/'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='tryon_slot',
+            field=models.CharField(blank=True, choices=[('upper', 'Upper (tops)'), ('lower', 'Lower (bottoms)'), ('dress', 'One-piece (dress)')], help_text='Override category slot for Try-On if needed.', max_length=10, null=True),
+        ),
+    ]
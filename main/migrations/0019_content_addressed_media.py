@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:06
+
+import imaging.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_tryon'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outfit',
+            name='image',
+            field=models.ImageField(storage=imaging.storage.media_storage, upload_to='outfits/'),
+        ),
+        migrations.AlterField(
+            model_name='outfitimage',
+            name='image',
+            field=models.ImageField(storage=imaging.storage.media_storage, upload_to='outfits/extra/'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='main_image',
+            field=models.ImageField(storage=imaging.storage.media_storage, upload_to='products/main/'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.ImageField(storage=imaging.storage.media_storage, upload_to='products/extra/'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_sizes(apps, schema_editor):
+    """
+    Преди уникалното ограничение (product, size) - дублираните редове от
+    admin inline-а се сливат в най-стария, наличностите се събират, а
+    поръчките, количките и любимите се пренасочват към него.
+    """
+    ProductSize = apps.get_model('main', 'ProductSize')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    CartItem = apps.get_model('cart', 'CartItem')
+    WishlistItem = apps.get_model('wishlist', 'WishlistItem')
+
+    duplicates = (ProductSize.objects.values('product_id', 'size_id')
+                  .annotate(rows=Count('id'), keep=Min('id'), total=Sum('stock'))
+                  .filter(rows__gt=1))
+    for dup in duplicates:
+        keep = dup['keep']
+        extra = list(ProductSize.objects
+                     .filter(product_id=dup['product_id'], size_id=dup['size_id'])
+                     .exclude(id=keep).values_list('id', flat=True))
+
+        OrderItem.objects.filter(size_id__in=extra).update(size_id=keep)
+
+        for item in CartItem.objects.filter(product_size_id__in=extra):
+            existing = CartItem.objects.filter(cart_id=item.cart_id, product_id=item.product_id,
+                                               product_size_id=keep).first()
+            if existing:
+                existing.quantity += item.quantity
+                existing.save(update_fields=['quantity'])
+                item.delete()
+            else:
+                item.product_size_id = keep
+                item.save(update_fields=['product_size'])
+
+        for item in WishlistItem.objects.filter(product_size_id__in=extra):
+            if WishlistItem.objects.filter(user_id=item.user_id, product_id=item.product_id,
+                                           product_size_id=keep).exists():
+                item.delete()
+            else:
+                item.product_size_id = keep
+                item.save(update_fields=['product_size'])
+
+        ProductSize.objects.filter(id__in=extra).delete()
+        ProductSize.objects.filter(id=keep).update(stock=dup['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_content_addressed_media'),
+        ('orders', '0008_migrate_newsletter_codes'),
+        ('cart', '0001_initial'),
+        ('wishlist', '0002_wishlistitem_added_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_sizes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_merge_duplicate_sizes'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='productsize',
+            constraint=models.UniqueConstraint(fields=('product', 'size'), name='productsize_product_size_uniq'),
+        ),
+    ]
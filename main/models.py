@@ -1,14 +1,23 @@
 from django.db import models
 from django.utils.text import slugify
 from django.conf import settings
+from imaging.storage import media_storage
 
 
 
 
+TRYON_SLOT_CHOICES = [
+    ('upper', 'Upper (tops)'),
+    ('lower', 'Lower (bottoms)'),
+    ('dress', 'One-piece (dress)'),
+]
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.CharField(max_length=100, unique=True)
     parent = models.ForeignKey('self', null=True, blank=True, related_name='subcategories', on_delete=models.CASCADE)
+    tryon_slot = models.CharField(max_length=10, choices=TRYON_SLOT_CHOICES, blank=True, null=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -36,6 +45,15 @@ class ProductSize(models.Model):
                                 related_name='product_sizes')
     size = models.ForeignKey(Size, on_delete=models.CASCADE)
     stock = models.PositiveIntegerField(default=0)
+    # по него wishlist.notifier намира променените наличности
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+    class Meta:
+        # нужно за upsert при масов импорт (import_catalog)
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'size'], name='productsize_product_size_uniq'),
+        ]
 
 
     def __str__(self):
@@ -50,9 +68,18 @@ class Product(models.Model):
     color = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True)
-    main_image = models.ImageField(upload_to='products/main/')
+    main_image = models.ImageField(upload_to='products/main/', storage=media_storage)
+    # попълват се от imaging.placeholders след качване
+    main_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    main_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    main_image_color = models.CharField(max_length=7, blank=True, editable=False)
+    main_image_placeholder = models.TextField(blank=True, editable=False)
+    tryon_image = models.ImageField(upload_to='products/tryon/', blank=True, null=True,
+                                    help_text='Cutout PNG (transparent background) for Virtual Try-On')
+    tryon_slot = models.CharField(max_length=10, choices=TRYON_SLOT_CHOICES, blank=True, null=True,
+                                  help_text='Override category slot for Try-On if needed.')
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 
     def save(self,*args, **kwargs):
@@ -63,12 +90,20 @@ class Product(models.Model):
 
     def __str__(self):
         return self.name
+
+
+    def get_tryon_slot(self):
+        return self.tryon_slot or self.category.tryon_slot
     
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, 
                                 related_name='images')
-    image = models.ImageField(upload_to='products/extra/')
+    image = models.ImageField(upload_to='products/extra/', storage=media_storage)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
 
 
 class ProductReview(models.Model):
@@ -91,7 +126,11 @@ class Outfit(models.Model):
 
     title = models.CharField(max_length=100)
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES)
-    image = models.ImageField(upload_to='outfits/')
+    image = models.ImageField(upload_to='outfits/', storage=media_storage)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -100,7 +139,11 @@ class Outfit(models.Model):
 
 class OutfitImage(models.Model):
     outfit = models.ForeignKey(Outfit, related_name='images', on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='outfits/extra/')
+    image = models.ImageField(upload_to='outfits/extra/', storage=media_storage)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    image_placeholder = models.TextField(blank=True, editable=False)
 
     def __str__(self):
         return f"Image for {self.outfit.title}"
@@ -115,11 +158,73 @@ class OutfitItem(models.Model):
         return f"{self.outfit.title} - {self.product.name}"
     
 
+def default_slot_boxes():
+    # относителни координати [x, y, ширина, височина] върху снимката на модела
+    return {
+        'upper': [0.25, 0.17, 0.50, 0.33],
+        'lower': [0.27, 0.45, 0.46, 0.45],
+        'dress': [0.25, 0.17, 0.50, 0.65],
+    }
+
+
+class TryOnModel(models.Model):
+    name = models.CharField(max_length=100)
+    gender = models.CharField(max_length=10, choices=Outfit.GENDER_CHOICES)
+    image = models.ImageField(upload_to='tryon_models/')
+    slot_boxes = models.JSONField(default=default_slot_boxes,
+                                  help_text='Relative [x, y, width, height] per slot.')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 class NewsletterSubscriber(models.Model):
     email = models.EmailField(unique=True)
     date_subscribed = models.DateTimeField(auto_now_add=True)
     discount_code = models.CharField(max_length=20, blank=True, null=True)
+    language = models.CharField(max_length=5, choices=settings.LANGUAGES,
+                                default=settings.LANGUAGE_CODE)
 
     def __str__(self):
         return self.email
 
+
+class NewsletterCampaign(models.Model):
+    STATUS_CHOICES = [
+        ('draft', 'Draft'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+    ]
+
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
+    # keyset курсор - последният обработен абонат, за продължаване след прекъсване
+    last_subscriber_id = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.subject
+
+
+class CampaignDelivery(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    campaign = models.ForeignKey(NewsletterCampaign, related_name='deliveries', on_delete=models.CASCADE)
+    subscriber = models.ForeignKey(NewsletterSubscriber, related_name='deliveries', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('campaign', 'subscriber')
+
+    def __str__(self):
+        return f"{self.campaign} → {self.subscriber} ({self.status})"
+
@@ -0,0 +1,148 @@
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+
+from .models import NewsletterSubscriber, CampaignDelivery
+
+
+logger = logging.getLogger(__name__)
+
+
+def render_campaign(campaign, language):
+    """Рендерира темата и съдържанието веднъж за даден език."""
+    with translation.override(language):
+        context = {'campaign': campaign}
+        subject = f"{settings.EMAIL_SUBJECT_PREFIX}{campaign.subject}"
+        text = render_to_string('main/emails/newsletter_campaign.txt', context)
+        html = render_to_string('main/emails/newsletter_campaign.html', context)
+    return subject, text, html
+
+
+class Throttle:
+    def __init__(self, rate, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate else 0
+        self.sleep = sleep
+        self._next = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self._next:
+            self.sleep(self._next - now)
+        self._next = max(now, self._next) + self.interval
+
+
+def start_campaign(campaign, retry_failed=False):
+    if retry_failed:
+        # минава отново през всички, изпратените се прескачат
+        campaign.last_subscriber_id = 0
+    campaign.status = 'sending'
+    campaign.save(update_fields=['status', 'last_subscriber_id'])
+
+
+def finish_campaign(campaign):
+    campaign.status = 'sent'
+    campaign.sent_at = timezone.now()
+    campaign.save(update_fields=['status', 'sent_at'])
+
+
+def send_chunk(campaign, connection, chunk_size=500, throttle=None, rendered=None, counts=None):
+    """
+    Изпраща на следващите `chunk_size` абонати след курсора. Всяка доставка
+    се записва веднага след писмото, така че прекъсване по средата на
+    порцията не праща повторно. Връща броя обработени абонати (0 = край).
+    """
+    throttle = throttle or Throttle(None)
+    rendered = {} if rendered is None else rendered
+    counts = Counter() if counts is None else counts
+
+    subscribers = list(
+        NewsletterSubscriber.objects
+        .filter(id__gt=campaign.last_subscriber_id)
+        .order_by('id')
+        .only('id', 'email', 'language')[:chunk_size]
+    )
+    if not subscribers:
+        return 0
+
+    CampaignDelivery.objects.bulk_create(
+        [CampaignDelivery(campaign=campaign, subscriber=s) for s in subscribers],
+        ignore_conflicts=True,
+    )
+    deliveries = {
+        d.subscriber_id: d
+        for d in campaign.deliveries
+        .filter(subscriber__in=subscribers)
+        .exclude(status='sent')
+    }
+
+    for subscriber in subscribers:
+        delivery = deliveries.get(subscriber.id)
+        if delivery is None:
+            counts['skipped'] += 1
+            continue
+
+        if subscriber.language not in rendered:
+            rendered[subscriber.language] = render_campaign(campaign, subscriber.language)
+        subject, text, html = rendered[subscriber.language]
+
+        message = EmailMultiAlternatives(
+            subject, text, settings.DEFAULT_FROM_EMAIL, [subscriber.email],
+            connection=connection,
+        )
+        message.attach_alternative(html, 'text/html')
+
+        throttle.wait()
+        try:
+            connection.send_messages([message])
+        except Exception as e:
+            logger.warning(f"Campaign {campaign.id}: sending to {subscriber.email} failed: {e}")
+            delivery.status, delivery.error = 'failed', str(e)
+            delivery.save(update_fields=['status', 'error', 'sent_at'])
+            counts['failed'] += 1
+            # SMTP връзката може да е прекъснала - отваряме нова
+            connection.close()
+            connection.open()
+        else:
+            delivery.status, delivery.sent_at, delivery.error = 'sent', timezone.now(), ''
+            delivery.save(update_fields=['status', 'error', 'sent_at'])
+            counts['sent'] += 1
+
+    campaign.last_subscriber_id = subscribers[-1].id
+    campaign.save(update_fields=['last_subscriber_id'])
+    return len(subscribers)
+
+
+def send_campaign(campaign, connection=None, chunk_size=500, rate=None, retry_failed=False):
+    """
+    Изпраща кампанията до всички абонати. Абонатите се четат на порции
+    по id (keyset), писмата минават през една SMTP връзка, а всяка доставка
+    се записва, така че прекъснато изпращане продължава от курсора.
+    """
+    start_campaign(campaign, retry_failed)
+    rendered = {}
+    throttle = Throttle(rate)
+    counts = Counter()
+    connection = connection or get_connection()
+
+    with connection:
+        while send_chunk(campaign, connection, chunk_size, throttle, rendered, counts):
+            pass
+
+    finish_campaign(campaign)
+    return counts
+
+
+def smtp_connection(host, port, username='', password='', use_tls=False):
+    # напр. локален SMTP sink: python -m aiosmtpd -n -l localhost:1025
+    return get_connection(
+        'django.core.mail.backends.smtp.EmailBackend',
+        host=host, port=port, username=username, password=password,
+        use_tls=use_tls, fail_silently=False,
+    )
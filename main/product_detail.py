@@ -0,0 +1,59 @@
+from django.db.models import Prefetch
+
+from imaging.derivatives import attach_manifests
+from imaging.tiles import attach_pyramids
+from .models import Product, ProductImage, ProductReview, ProductSize
+
+
+RELATED_COUNT = 4
+
+
+def load_product_detail(slug):
+    """
+    Всичко за страницата на продукта с фиксиран брой заявки, независимо от
+    броя снимки, размери и ревюта:
+
+    1. продуктът с категорията;
+    2-4. галерията, размерите (с Size) и ревютата - prefetch;
+    5. свързаните продукти;
+    6-7. манифестите и плочките на всички снимки наведнъж.
+
+    Обектите не зависят от езика (преводите се четат при рендиране), затова
+    резултатът може да се кешира целият. Хвърля Product.DoesNotExist.
+    """
+    product = (
+        Product.objects
+        .select_related('category')
+        .prefetch_related(
+            Prefetch('images', queryset=ProductImage.objects.order_by('id')),
+            Prefetch('product_sizes', queryset=ProductSize.objects.select_related('size').order_by('size_id')),
+            Prefetch('reviews', queryset=ProductReview.objects.order_by('-created_at')),
+        )
+        .get(slug=slug)
+    )
+    gallery = list(product.images.all())
+    sizes = list(product.product_sizes.all())
+    reviews = list(product.reviews.all())
+    related = list(
+        Product.objects.filter(category_id=product.category_id).exclude(id=product.id)
+        .order_by('-created_at')[:RELATED_COUNT]
+    )
+
+    images = [product, *gallery, *related]
+    attach_manifests(images, 'main_image', 'image')
+    attach_pyramids([product, *gallery], 'main_image', 'image')
+
+    ratings = [review.rating for review in reviews]
+    return {
+        'product': product,
+        'gallery_images': gallery,
+        'sizes': sizes,
+        # общият източник за формите за количка и любими
+        'available_sizes': [ps for ps in sizes if ps.stock > 0],
+        'reviews': reviews,
+        'review_summary': {
+            'count': len(ratings),
+            'average': round(sum(ratings) / len(ratings), 1) if ratings else None,
+        },
+        'related_products': related,
+    }
@@ -0,0 +1,72 @@
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save
+
+
+_current = ContextVar('request_cache', default=None)
+
+
+class RequestCache:
+    """
+    Запомнени заявки за една заявка към сайта. Споделя се от middleware,
+    context processor-ите, template tag-овете и view-тата.
+    """
+
+    def __init__(self):
+        self.queries = {}     # име -> (стойност, зависими модели)
+
+    def invalidate(self, model):
+        label = model._meta.label_lower
+        for name, (_, depends) in list(self.queries.items()):
+            if label in depends:
+                del self.queries[name]
+
+
+def begin():
+    return _current.set(RequestCache())
+
+
+def end(token):
+    _current.reset(token)
+
+
+def memo(name, func, depends=()):
+    """
+    Резултатът от func() под име, веднъж за заявката. `depends` са моделите,
+    чийто запис или изтриване в същата заявка изчиства резултата.
+    Извън заявка (shell, задачи) просто вика func().
+
+    Изчистването е по post_save/post_delete - bulk_create, bulk_update,
+    update() и delete() на QuerySet не ги изпращат, затова след тях
+    зависимите резултати се изчистват ръчно с forget(name).
+    """
+    cache = _current.get()
+    if cache is None:
+        return func()
+    if name not in cache.queries:
+        cache.queries[name] = (func(), {model._meta.label_lower for model in depends})
+    return cache.queries[name][0]
+
+
+def lazy(name, func, depends=()):
+    """
+    Функция вместо стойност - шаблонът я извиква едва когато прочете
+    променливата, а memo пази резултата за останалите прочитания.
+    """
+    return lambda: memo(name, func, depends)
+
+
+def forget(name):
+    cache = _current.get()
+    if cache is not None:
+        cache.queries.pop(name, None)
+
+
+def _invalidate(sender, instance, **kwargs):
+    cache = _current.get()
+    if cache is not None:
+        cache.invalidate(sender)
+
+
+post_save.connect(_invalidate, dispatch_uid='request_cache_save')
+post_delete.connect(_invalidate, dispatch_uid='request_cache_delete')
@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Изпраща се веднъж за порция при масова промяна на наличности
+# (main.inventory), с product_ids - за изчистване на зависимите кешове.
+stock_changed = Signal()
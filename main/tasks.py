@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.mail import get_connection, send_mail
+from django.db import transaction
+from taskqueue.models import Task
+from taskqueue.registry import task
+from .models import NewsletterCampaign
+from .newsletter import Throttle, finish_campaign, send_chunk, start_campaign
+
+
+@task(priority=5)
+def send_newsletter_code(email, code):
+    send_mail(
+        'Вашият код за 10% отстъпка',
+        f'Благодарим ви, че се абонирахте! Ето вашият код: {code}',
+        settings.DEFAULT_FROM_EMAIL,
+        [email],
+        fail_silently=False,
+    )
+
+
+@task(priority=0, max_attempts=3)
+def deliver_campaign(campaign_id, retry_failed=False):
+    # условен UPDATE - повторно натискане не пуска втора верига от задачи
+    allowed = ('draft', 'sent') if retry_failed else ('draft',)
+    if not NewsletterCampaign.objects.filter(id=campaign_id, status__in=allowed).update(status='sending'):
+        return
+    start_campaign(NewsletterCampaign.objects.get(id=campaign_id), retry_failed)
+    deliver_campaign_chunk.delay(campaign_id)
+
+
+@task(priority=0, max_attempts=3)
+def deliver_campaign_chunk(campaign_id, chunk_size=500):
+    """
+    Една порция абонати на задача (при 10 писма/с - под минута), след което
+    се заявява следващата. Дълга кампания не надвишава времето, след което
+    taskqueue смята задачата за спряла.
+    """
+    campaign = NewsletterCampaign.objects.get(id=campaign_id)
+    if campaign.status != 'sending':
+        return
+    with get_connection() as connection:
+        sent = send_chunk(campaign, connection, chunk_size, Throttle(settings.NEWSLETTER_SEND_RATE))
+    if sent:
+        deliver_campaign_chunk.delay(campaign_id, chunk_size=chunk_size)
+    else:
+        finish_campaign(campaign)
+
+
+@transaction.atomic
+def resume_campaign(campaign_id):
+    """
+    Продължава от курсора кампания, останала в 'sending', след като веригата
+    от порции е изчерпала опитите си. Връща False, ако кампанията не чака
+    или веригата още работи.
+    """
+    if not NewsletterCampaign.objects.select_for_update().filter(id=campaign_id, status='sending').exists():
+        return False
+    if Task.objects.filter(name=deliver_campaign_chunk.name, status__in=('queued', 'running'),
+                           args__0=campaign_id).exists():
+        return False
+    deliver_campaign_chunk.delay(campaign_id)
+    return True
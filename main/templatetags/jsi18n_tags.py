@@ -0,0 +1,12 @@
+from django import template
+
+from main.jsi18n import catalog_url
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def js_catalog_url():
+    """Адрес на JS каталога за текущия език, с хеш на съдържанието в пътя."""
+    return catalog_url()
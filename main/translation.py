@@ -1,5 +1,5 @@
 from modeltranslation.translator import translator, TranslationOptions
-from .models import Category, Size, Product, ProductReview, Outfit
+from .models import Category, Size, Product, ProductReview, Outfit, NewsletterCampaign
 
 class CategoryTR(TranslationOptions):
     fields = ('name',)
@@ -16,8 +16,12 @@ class ProductReviewTR(TranslationOptions):
 class OutfitTR(TranslationOptions):
     fields = ('title',)
 
+class NewsletterCampaignTR(TranslationOptions):
+    fields = ('subject', 'body',)
+
 translator.register(Category, CategoryTR)
 translator.register(Size, SizeTR)
 translator.register(Product, ProductTR)
 translator.register(ProductReview, ProductReviewTR)
 translator.register(Outfit, OutfitTR)
+translator.register(NewsletterCampaign, NewsletterCampaignTR)
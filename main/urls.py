@@ -11,6 +11,8 @@ urlpatterns = [
     path('product/<slug:slug>/', views.ProductDetailView.as_view(), name='product_detail'),
     path('submit-review/<int:product_id>/', views.submit_review, name='submit_review'),
     path('get-look/<int:outfit_id>/', get_outfit_modal, name='get_the_look_modal'),
+    path('get-look/<int:outfit_id>/try-on/', views.tryon_outfit, name='tryon_outfit'),
     path('add-outfit-to-cart/', add_outfit_to_cart, name='add_outfit_to_cart'),
     path('subscribe-newsletter/', views.subscribe_newsletter, name='subscribe_newsletter'),
+    path('inventory/sync/', views.inventory_sync, name='inventory_sync'),
 ]
@@ -1,19 +1,36 @@
-from django.shortcuts import get_object_or_404, render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.views.generic import TemplateView, DetailView
-from django.http import HttpResponse, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse
 from django.template.response import TemplateResponse
 from .models import Category, Product, Size, ProductReview, Outfit, ProductSize, NewsletterSubscriber
 from django.db.models import Q
 from wishlist.forms import AddToWishlistForm
-from orders.models import OrderItem
+from orders.models import OrderItem, DiscountCode
 from .forms import ProductReviewForm, NewsletterForm
+from imaging.derivatives import attach_manifests
+from imaging.tryon import default_model, make_job, composite_exists, mark_pending, render_failed
+from imaging.tasks import prerender_outfit
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_GET, require_POST
 from cart.models import Cart, CartItem
+import codecs
+import csv
+import hashlib
+import hmac
 import json
-from django.core.mail import send_mail
+from urllib.parse import urlencode
 from django.conf import settings
+from django.db import transaction
+from .tasks import send_newsletter_code
+from .inventory import MODES, InventorySync, parse_stock_lines
+from .jsi18n import catalog_url, render_catalog
+from .invalidation import category_tags, product_tags
+from .product_detail import load_product_detail
+from .context_processors import declare_global_context, root_categories
+from . import request_cache
+from sharedcache.flight import get_or_compute
+from django.utils.translation import get_language
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -23,12 +40,14 @@ class IndexView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.filter(parent__isnull=True).prefetch_related('subcategories')
+        context['categories'] = root_categories()
         context['current_category'] = None
 
         # Само outfit-и
-        context['male_outfits'] = Outfit.objects.filter(gender='male').order_by('-created_at')[:3]
-        context['female_outfits'] = Outfit.objects.filter(gender='female').order_by('-created_at')[:3]
+        context['male_outfits'] = attach_manifests(
+            Outfit.objects.filter(gender='male').order_by('-created_at')[:3], 'image')
+        context['female_outfits'] = attach_manifests(
+            Outfit.objects.filter(gender='female').order_by('-created_at')[:3], 'image')
 
         return context
 
@@ -54,7 +73,7 @@ class CatalogView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         category_slug = kwargs.get('category_slug')
-        categories = Category.objects.filter(parent__isnull=True).prefetch_related('subcategories')
+        categories = root_categories()
         products = Product.objects.all().order_by('-created_at')
         current_category = None
 
@@ -79,9 +98,24 @@ class CatalogView(TemplateView):
 
         filter_params['q'] = query or ''
 
+        # при изтекъл кеш списъкът се изчислява от една заявка (sharedcache.flight);
+        # кешират се само id-тата - целите обекти не се побират при голям каталог
+        key = 'catalog:{}:{}:{}'.format(
+            get_language(), category_slug or '', hashlib.sha1(urlencode(sorted(filter_params.items())).encode()).hexdigest()
+        )
+        product_ids = get_or_compute(key, lambda: list(products.values_list('id', flat=True)),
+                                     tags=['products', 'categories'])
+
+        def load_products():
+            by_id = Product.objects.in_bulk(product_ids)
+            return attach_manifests([by_id[pk] for pk in product_ids if pk in by_id], 'main_image')
+
         context.update({
             'categories': categories,
-            'products': products,
+            'product_ids': product_ids,
+            # зарежда се само ако решетката не е в кеша на фрагментите
+            'products': request_cache.lazy('catalog_products', load_products, depends=(Product,)),
+            'grid_key': key,
             'current_category': category_slug,
             'filter_params': filter_params,
             'sizes': Size.objects.all(),
@@ -96,15 +130,23 @@ class CatalogView(TemplateView):
         return context
 
     def get(self, request, *args, **kwargs):
+        if request.headers.get('HX-Request'):
+            # полето за търсене и бутонът не показват продукти, нито хедъра
+            if request.GET.get('show_search') == 'true':
+                declare_global_context(request)
+                return TemplateResponse(request, 'main/search_input.html',
+                                        {'search_query': request.GET.get('q') or ''})
+            elif request.GET.get('reset_search') == 'true':
+                declare_global_context(request)
+                return TemplateResponse(request, 'main/search_button.html', {})
+
         context = self.get_context_data(**kwargs)
 
         if request.headers.get('HX-Request'):
-            if context.get('show_search'):
-                return TemplateResponse(request, 'main/search_input.html', context)
-            elif context.get('reset_search'):
-                return TemplateResponse(request, 'main/search_button.html', {})
-            template = 'main/filter_modal.html' if request.GET.get('show_filters') == 'true' else 'main/partials/catalog_content.html'
-            return TemplateResponse(request, template, context)
+            if request.GET.get('show_filters') == 'true':
+                declare_global_context(request)
+                return TemplateResponse(request, 'main/filter_modal.html', context)
+            return TemplateResponse(request, 'main/partials/catalog_content.html', context)
 
         # При F5 зареждаме base.html и посочваме кой partial да вкараме в main-content
         context["initial_content_template"] = "main/partials/catalog_content.html"
@@ -118,20 +160,35 @@ class ProductDetailView(DetailView):
     slug_field = 'slug'
     slug_url_kwarg = 'slug'
 
+    def load(self):
+        try:
+            return load_product_detail(self.kwargs[self.slug_url_kwarg])
+        except Product.DoesNotExist:
+            raise Http404
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
-        context['categories'] = Category.objects.filter(parent__isnull=True).prefetch_related('subcategories')
-        context['related_products'] = Product.objects.filter(
-            category=product.category
-        ).exclude(id=product.id)[:4]
+        product = self.object
+        context.update(self.data)
+        context['categories'] = root_categories()
         context['current_category'] = product.category.slug
-        context['wishlist_form'] = AddToWishlistForm(product=product, user=self.request.user)
-        context['reviews'] = product.reviews.all().order_by('-created_at')
+        # формата използва заредените размери - без отделни заявки
+        context['wishlist_form'] = AddToWishlistForm(product=product, user=self.request.user,
+                                                     sizes=self.data['available_sizes'])
         return context
 
+    def tags(self):
+        # свързаните продукти са от същата категория - промяна в нея също инвалидира.
+        # Таговете се четат преди load(), за да не се запише остаряла стойност
+        # с версия на промяна, направена по време на зареждането.
+        row = Product.objects.filter(slug=self.kwargs[self.slug_url_kwarg]).values_list('id', 'category_id').first()
+        if row is None:
+            return []
+        return product_tags(row[0]) + category_tags(row[1])
+
     def get(self, request, *args, **kwargs):
-        self.object = self.get_object()
+        self.data = get_or_compute(f"product-detail:{kwargs['slug']}", self.load, tags=self.tags)
+        self.object = self.data['product']
         context = self.get_context_data(**kwargs)
 
         hx_request = request.headers.get('HX-Request')
@@ -173,10 +230,10 @@ def submit_review(request, product_id):
 def get_outfit_modal(request, outfit_id):
     outfit = get_object_or_404(Outfit, id=outfit_id)
     items = outfit.items.select_related('product')
+    products = attach_manifests([item.product for item in items], 'main_image')
 
     product_data = []
-    for item in items:
-        product = item.product
+    for product in products:
         sizes = ProductSize.objects.filter(product=product).select_related('size')
         product_data.append({
             'product': product,
@@ -189,6 +246,37 @@ def get_outfit_modal(request, outfit_id):
     })
 
 
+@require_GET
+def tryon_outfit(request, outfit_id):
+    outfit = get_object_or_404(Outfit, id=outfit_id)
+    model = default_model(outfit.gender)
+    job = make_job(model, [item.product for item in outfit.items.select_related('product__category')]) if model else None
+    if job is None:
+        return HttpResponse('')
+
+    key = job[0]
+    polling = request.GET.get('poll')
+    ready = composite_exists(key)
+    failed = False
+    if not ready:
+        if not polling:
+            # първо отваряне - рендерирането е във фонов режим, веднъж за ключа
+            if mark_pending(key):
+                prerender_outfit.delay(outfit.id)
+        failed = render_failed(key)
+
+    response = render(request, 'main/partials/tryon_preview.html', {
+        'outfit': outfit,
+        'ready': ready,
+        'failed': failed,
+        'key': key,
+    })
+    if (ready or failed) and polling:
+        # 286 спира HTMX polling-а
+        response.status_code = 286
+    return response
+
+
 @require_POST
 def add_outfit_to_cart(request):
     added_count = 0  # ✅ започваме с 0
@@ -248,21 +336,18 @@ def subscribe_newsletter(request):
                 'errors': {'email': ['This email is not registered as a user.']}
             }, status=400)
 
-        discount_code = "WELCOME10"
-
-        subscriber, created = NewsletterSubscriber.objects.get_or_create(email=email)
+        subscriber, created = NewsletterSubscriber.objects.get_or_create(
+            email=email,
+            defaults={'language': request.LANGUAGE_CODE}
+        )
 
         if created:
-            subscriber.discount_code = discount_code
+            # всеки абонат получава собствен еднократен код
+            discount = DiscountCode.generate(prefix='W10-', percent=10, max_uses=1)
+            subscriber.discount_code = discount.code
             subscriber.save()
 
-            send_mail(
-                'Вашият код за 10% отстъпка',
-                f'Благодарим ви, че се абонирахте! Ето вашият код: {discount_code}',
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
+            send_newsletter_code.delay(email, discount.code)
 
             return JsonResponse({'success': True, 'new': True})
 
@@ -272,4 +357,56 @@ def subscribe_newsletter(request):
 
 
 
-        
\ No newline at end of file
+        
+
+@csrf_exempt
+@require_POST
+def inventory_sync(request):
+    """
+    Наличности от склада: тялото е CSV (slug,size,stock|delta) или JSONL и
+    се чете поредово. ?mode=absolute|delta. Автентикация с
+    Authorization: Bearer <INVENTORY_SYNC_TOKEN>.
+    """
+    token = settings.INVENTORY_SYNC_TOKEN
+    if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+
+    mode = request.GET.get('mode', 'absolute')
+    if mode not in MODES:
+        return JsonResponse({'error': f'Unknown mode {mode!r}.'}, status=400)
+    fmt = 'jsonl' if 'json' in request.content_type else 'csv'
+
+    sync = InventorySync(mode=mode)
+    try:
+        # целият файл или нищо - при грешен ред се отменят и записаните порции
+        with transaction.atomic():
+            # request се чете като поток - без ограничението за размер на request.body
+            counts = sync.run(parse_stock_lines(codecs.iterdecode(request, 'utf-8-sig'), fmt))
+    except (ValueError, csv.Error) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'mode': mode,
+        'counts': dict(counts),
+        'results': [{'sku': sku, 'status': status, 'stock': stock} for sku, status, stock in sync.results],
+    })
+
+
+@require_GET
+def javascript_catalog(request, language=None, digest=None):
+    """
+    JS каталогът с преводите, рендериран веднъж за (език, версия).
+    Адресът съдържа хеш на съдържанието, затова се кешира завинаги;
+    стар хеш или адрес без хеш пренасочва към актуалния.
+    """
+    if language is None:
+        return redirect(catalog_url())
+    if language not in dict(settings.LANGUAGES):
+        raise Http404
+    content, current = render_catalog(language)
+    if digest != current:
+        return redirect(catalog_url(language))
+
+    response = HttpResponse(content, content_type='text/javascript; charset="utf-8"')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
-from .models import Order, OrderItem
+from .models import CustomerStats, Order, OrderItem, DiscountCode
+from .stats import order_status_changed, rebuild
 
 
 class OrderItemInline(admin.TabularInline):
@@ -61,3 +62,45 @@ class OrderAdmin(admin.ModelAdmin):
                                             'company', 'address1', 'address2', 'city',
                                             'country', 'province', 'postal_code', 'phone')
         return self.readonly_fields
+
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # changeform_view е в транзакция - статистиката се записва заедно с поръчката
+        old_status = form.initial.get('status') if change else None
+        if old_status != obj.status:
+            order_status_changed([(obj, old_status)])
+
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        # изтрита платена поръчка не бива да остане в статистиката
+        if obj.user_id:
+            rebuild([obj.user_id])
+
+
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.exclude(user=None).values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild(user_ids)
+
+
+@admin.register(CustomerStats)
+class CustomerStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'order_count', 'total_spent', 'first_order_at', 'last_order_at')
+    list_select_related = ('user',)
+    search_fields = ('user__email',)
+    ordering = ('-total_spent',)
+    readonly_fields = ('user', 'order_count', 'total_spent', 'first_order_at', 'last_order_at', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(DiscountCode)
+class DiscountCodeAdmin(admin.ModelAdmin):
+    list_display = ('code', 'percent', 'uses_count', 'max_uses',
+                    'expires_at', 'is_active', 'created_at')
+    list_filter = ('is_active', 'percent')
+    search_fields = ('code',)
+    readonly_fields = ('uses_count', 'created_at')
@@ -0,0 +1,54 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from sharedcache.bus import bus, local_cache, publish
+from .models import DiscountCode
+
+
+# Кодове, които не съществуват, се помнят в кеша на процеса - опитите за
+# налучкване не стигат до базата повторно. Нов, преименуван или отново
+# активиран код изчиства списъка във всички worker-и през шината
+# (sharedcache.bus) - използването на код (UPDATE) не го изчиства.
+BAD_CODE_TAG = 'discount-codes'
+BAD_CODE_TTL = 300
+
+
+@receiver(pre_save, sender=DiscountCode)
+def _remember_code(sender, instance, **kwargs):
+    instance._previous = (
+        DiscountCode.objects.filter(pk=instance.pk).values_list('code', 'is_active').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=DiscountCode)
+def _forget_bad_codes(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None or (previous != (instance.code, instance.is_active) and instance.is_active):
+        publish([BAD_CODE_TAG])
+
+
+def lookup_code(code):
+    """Връща използваем DiscountCode или None, без да брои използване."""
+    code = DiscountCode.normalize(code)
+    if not code or len(code) > DiscountCode._meta.get_field('code').max_length:
+        return None
+    bus.ensure()
+    key = f'bad-code:{code}'
+    if local_cache.get(key):
+        return None
+
+    generation = local_cache.generation
+    discount = DiscountCode.objects.filter(code=code).first()
+    if discount is None:
+        # ако междувременно е създаден код, отговорът може да е остарял
+        local_cache.set(key, True, [BAD_CODE_TAG], BAD_CODE_TTL, generation=generation)
+        return None
+    return discount if discount.is_usable() else None
+
+
+def discount_amount(subtotal, percent):
+    amount = Decimal(subtotal) * Decimal(percent) / Decimal('100')
+    return amount.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
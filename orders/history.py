@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import OuterRef, Prefetch, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.shortcuts import get_object_or_404
+
+from main.models import Product
+from .models import Order, OrderItem
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(order):
+    """(created_at, id) на последната показана поръчка като "микросекунди-id"."""
+    return f"{(order.created_at - EPOCH) // timedelta(microseconds=1)}-{order.id}"
+
+
+def decode_cursor(value):
+    try:
+        micros, pk = (int(part) for part in value.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return EPOCH + timedelta(microseconds=micros), pk
+
+
+def order_page(user, cursor=None, size=None):
+    """
+    Страница от поръчките на потребителя (най-новите първи) и курсорът за
+    следващата или None. Keyset по (created_at, id) върху индекса
+    order_user_created_idx - без OFFSET, колкото и поръчки да има.
+    Броят артикули и продуктът за снимката идват от анотации, а снимките
+    на цялата страница - с една заявка.
+    """
+    size = size or settings.ORDER_HISTORY_PAGE_SIZE
+    orders = Order.objects.filter(user=user)
+    position = decode_cursor(cursor) if cursor else None
+    if cursor and position is None:
+        raise ValueError(f"Invalid order history cursor {cursor!r}")
+    if position:
+        created_at, pk = position
+        orders = orders.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    first_item = OrderItem.objects.filter(order=OuterRef('pk')).order_by('id')
+    orders = list(
+        orders
+        .annotate(
+            item_count=Coalesce(Sum('items__quantity'), 0),
+            thumbnail_id=Subquery(first_item.values('product_id')[:1]),
+        )
+        .order_by('-created_at', '-id')[:size + 1]
+    )
+    orders, more = orders[:size], len(orders) > size
+
+    thumbnails = Product.objects.only('id', 'name', 'main_image').in_bulk(
+        {order.thumbnail_id for order in orders if order.thumbnail_id}
+    )
+    for order in orders:
+        order.thumbnail = thumbnails.get(order.thumbnail_id)
+    return orders, encode_cursor(orders[-1]) if more else None
+
+
+def load_order_detail(user, order_id):
+    """Поръчката с артикулите, продуктите и размерите им - две заявки."""
+    return get_object_or_404(
+        Order.objects.prefetch_related(
+            Prefetch('items', queryset=OrderItem.objects.select_related('product', 'size__size').order_by('id'))
+        ),
+        id=order_id, user=user,
+    )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from orders.stats import rebuild, rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Recompute CustomerStats from paid orders, for all users or the given user ids.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['user_ids']:
+            count = rebuild(options['user_ids'])
+        else:
+            count = rebuild_all(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} users."))
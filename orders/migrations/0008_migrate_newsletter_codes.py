@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def copy_newsletter_codes(apps, schema_editor):
+    # Досегашните кодове (напр. WELCOME10) са общи за всички абонати,
+    # затова се пренасят без лимит на използванията
+    NewsletterSubscriber = apps.get_model('main', 'NewsletterSubscriber')
+    DiscountCode = apps.get_model('orders', 'DiscountCode')
+
+    codes = {
+        (code or '').strip().upper()
+        for code in NewsletterSubscriber.objects.values_list('discount_code', flat=True)
+    }
+    codes.discard('')
+    DiscountCode.objects.bulk_create(
+        [DiscountCode(code=code, percent=10) for code in codes],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_category_name_bg_category_name_en_outfit_title_bg_and_more'),
+        ('orders', '0007_discountcode'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_newsletter_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_user_created_idx'),
+        ('users', '0002_alter_customuser_phone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='customer_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('first_order_at', models.DateTimeField(blank=True, null=True)),
+                ('last_order_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'customer stats',
+            },
+        ),
+    ]
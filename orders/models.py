@@ -1,8 +1,99 @@
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
 from django.conf import settings
+from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.crypto import get_random_string
 from main.models import Product, ProductSize
 
 
+class DiscountCode(models.Model):
+    CODE_CHARS = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+
+    code = models.CharField(max_length=32, unique=True)
+    percent = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(100)]
+    )
+    max_uses = models.PositiveIntegerField(null=True, blank=True,
+                                           help_text='Leave empty for unlimited uses.')
+    uses_count = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+    def __str__(self):
+        return self.code
+
+
+    @staticmethod
+    def normalize(code):
+        return (code or '').strip().upper()
+
+
+    @classmethod
+    def generate(cls, prefix='', length=8, **kwargs):
+        # Уникален код, напр. за всеки нов абонат на бюлетина
+        while True:
+            code = f"{prefix}{get_random_string(length, cls.CODE_CHARS)}"
+            if not cls.objects.filter(code=code).exists():
+                return cls.objects.create(code=code, **kwargs)
+
+
+    @classmethod
+    def usable(cls):
+        now = timezone.now()
+        return cls.objects.filter(
+            Q(max_uses__isnull=True) | Q(uses_count__lt=F('max_uses')),
+            Q(expires_at__isnull=True) | Q(expires_at__gt=now),
+            is_active=True,
+        )
+
+
+    @classmethod
+    def redeem(cls, code):
+        """
+        Атомарно отбелязва едно използване на кода. Условният UPDATE гарантира,
+        че лимитът не се надвишава при паралелни поръчки. Връща кода или None.
+        """
+        code = cls.normalize(code)
+        if not code:
+            return None
+        updated = cls.usable().filter(code=code).update(uses_count=F('uses_count') + 1)
+        if not updated:
+            return None
+        return cls.objects.get(code=code)
+
+
+    @classmethod
+    def release(cls, pk, count=1):
+        # Връща използване, напр. при отказано или изтекло плащане
+        cls.objects.filter(pk=pk).update(uses_count=Greatest(F('uses_count') - count, 0))
+
+
+    @classmethod
+    def reclaim(cls, pk):
+        # Отново отбелязва освободено използване - плащането все пак е минало
+        # с отстъпката, затова се брои и над лимита
+        cls.objects.filter(pk=pk).update(uses_count=F('uses_count') + 1)
+
+
+    def is_usable(self):
+        if not self.is_active:
+            return False
+        if self.max_uses is not None and self.uses_count >= self.max_uses:
+            return False
+        if self.expires_at is not None and self.expires_at <= timezone.now():
+            return False
+        return True
+
+
+    def save(self, *args, **kwargs):
+        self.code = self.normalize(self.code)
+        super().save(*args, **kwargs)
+
+
 class Order(models.Model):
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -36,6 +127,16 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     discount = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    discount_code = models.ForeignKey(DiscountCode, on_delete=models.SET_NULL,
+                                      null=True, blank=True, related_name='orders')
+
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # историята на поръчките - keyset по (created_at, id) за потребителя
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+        ]
 
 
     def get_total(self):
@@ -59,4 +160,25 @@ class OrderItem(models.Model):
     
 
     def get_total_price(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return self.price * self.quantity
+
+class CustomerStats(models.Model):
+    """
+    Натрупани данни за поръчките на потребителя - поддържат се от
+    orders.stats при всяка смяна на статуса и се четат с една заявка.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                primary_key=True, related_name='customer_stats')
+    order_count = models.PositiveIntegerField(default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    first_order_at = models.DateTimeField(null=True, blank=True)
+    last_order_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    class Meta:
+        verbose_name_plural = 'customer stats'
+
+
+    def __str__(self):
+        return f"{self.user} ({self.order_count} orders)"
@@ -0,0 +1,119 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .models import CustomerStats, Order
+
+
+# платените поръчки - само те влизат в статистиката; total_price вече е
+# сумата след отстъпката (CheckoutView), т.е. платената от клиента
+COUNTED_STATUSES = ('processing', 'shipped', 'delivered')
+
+
+def order_status_changed(changes):
+    """
+    Обновява CustomerStats за смени на статуса [(поръчка, стар статус), ...].
+    Вика се в транзакцията на промяната. Влизащите в статистиката поръчки
+    се добавят с един upsert; при излизане (напр. отказ след плащане)
+    потребителят се преизчислява - последната дата не може да се "извади".
+    """
+    added = defaultdict(list)
+    removed = set()
+    for order, old_status in changes:
+        was, counted = old_status in COUNTED_STATUSES, order.status in COUNTED_STATUSES
+        if counted and not was:
+            added[order.user_id].append(order)
+        elif was and not counted:
+            removed.add(order.user_id)
+
+    added = {user_id: orders for user_id, orders in added.items() if user_id not in removed}
+    if added:
+        increment(added)
+    if removed:
+        rebuild(removed)
+
+
+def increment(orders_by_user):
+    rows = [
+        (user_id, len(orders), sum((o.total_price for o in orders), Decimal('0')),
+         min(o.created_at for o in orders), max(o.created_at for o in orders))
+        for user_id, orders in orders_by_user.items()
+    ]
+    now = timezone.now()
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for user_id, count, spent, first, last in rows:
+            stats, created = CustomerStats.objects.select_for_update().get_or_create(user_id=user_id)
+            stats.order_count += count
+            stats.total_spent += spent
+            stats.first_order_at = min(filter(None, (stats.first_order_at, first)))
+            stats.last_order_at = max(filter(None, (stats.last_order_at, last)))
+            stats.save()
+        return
+
+    table = connection.ops.quote_name(CustomerStats._meta.db_table)
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+    sql = (
+        f'INSERT INTO {table} (user_id, order_count, total_spent, first_order_at, last_order_at, updated_at) '
+        f'VALUES {placeholders} ON CONFLICT (user_id) DO UPDATE SET '
+        f'order_count = {table}.order_count + excluded.order_count, '
+        f'total_spent = {table}.total_spent + excluded.total_spent, '
+        f'first_order_at = CASE WHEN {table}.first_order_at IS NULL OR excluded.first_order_at < {table}.first_order_at '
+        f'THEN excluded.first_order_at ELSE {table}.first_order_at END, '
+        f'last_order_at = CASE WHEN {table}.last_order_at IS NULL OR excluded.last_order_at > {table}.last_order_at '
+        f'THEN excluded.last_order_at ELSE {table}.last_order_at END, '
+        f'updated_at = excluded.updated_at'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in (*row, now)])
+
+
+def rebuild(user_ids):
+    """Преизчислява статистиката на дадените потребители от поръчките им."""
+    user_ids = list(user_ids)
+    totals = {
+        row['user_id']: row for row in
+        Order.objects
+        .filter(user_id__in=user_ids, status__in=COUNTED_STATUSES)
+        .values('user_id')
+        .annotate(
+            order_count=Count('id'),
+            total_spent=Sum('total_price'),
+            first_order_at=Min('created_at'),
+            last_order_at=Max('created_at'),
+        )
+        .order_by()
+    }
+    fields = ['order_count', 'total_spent', 'first_order_at', 'last_order_at', 'updated_at']
+    now = timezone.now()
+    stats = []
+    for user_id in user_ids:
+        row = totals.get(user_id, {})
+        stats.append(CustomerStats(
+            user_id=user_id,
+            order_count=row.get('order_count', 0),
+            total_spent=row.get('total_spent') or Decimal('0'),
+            first_order_at=row.get('first_order_at'),
+            last_order_at=row.get('last_order_at'),
+            updated_at=now,
+        ))
+    CustomerStats.objects.bulk_create(stats, update_conflicts=True, unique_fields=['user'], update_fields=fields)
+    return len(stats)
+
+
+def rebuild_all(chunk_size=1000):
+    """Преизчислява всички потребители на порции по id (keyset)."""
+    users = get_user_model().objects.order_by('pk')
+    last_pk, total = 0, 0
+    while user_ids := list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:chunk_size]):
+        total += rebuild(user_ids)
+        last_pk = user_ids[-1]
+    return total
+
+
+def stats_for(user):
+    """Статистиката на потребителя или празна, ако още няма поръчки."""
+    return CustomerStats.objects.filter(user=user).first() or CustomerStats(user=user)
@@ -6,13 +6,14 @@ from django.http import HttpResponse, JsonResponse
 from django.template.response import TemplateResponse
 from django.views.generic import View
 from .forms import OrderForm
-from .models import Order, OrderItem
+from .models import Order, OrderItem, DiscountCode
+from .discounts import lookup_code, discount_amount
 from cart.views import CartMixin
 from cart.models import Cart
-from main.models import ProductSize, NewsletterSubscriber
+from main.models import ProductSize
 from django.shortcuts import get_object_or_404
 from payment.views import create_stripe_checkout_session
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 import logging
 from django.views.decorators.csrf import csrf_exempt
 import json
@@ -77,15 +78,9 @@ class CheckoutView(CartMixin, View):
         # Изчисляване на subtotal и отстъпка
         subtotal = cart.subtotal
         discount_code = request.POST.get('discount_code', '').strip()
-        discount_percent = 0
+        discount = lookup_code(discount_code) if discount_code else None
 
-        if discount_code:
-            code_raw = discount_code
-            exists = NewsletterSubscriber.objects.filter(discount_code__iexact=code_raw).exists()
-            if exists:
-                discount_percent = 10
-
-        discount_value = subtotal * (Decimal(discount_percent) / Decimal('100'))
+        discount_value = discount_amount(subtotal, discount.percent) if discount else Decimal('0.00')
         total_price = subtotal - discount_value
 
         form_data = request.POST.copy()
@@ -93,6 +88,20 @@ class CheckoutView(CartMixin, View):
             form_data['email'] = request.user.email
         form = OrderForm(form_data, user=request.user)
 
+        if form.is_valid() and discount and not DiscountCode.redeem(discount.code):
+            # кодът е изчерпан междувременно (паралелна поръчка)
+            logger.warning(f"Discount code {discount.code} could not be redeemed")
+            context = {
+                'form': form,
+                'cart': cart,
+                'cart_items': cart.items.select_related('product', 'product_size__size').order_by('-added_at'),
+                'total_price': subtotal,
+                'error_message': 'This discount code is no longer valid.',
+            }
+            if request.headers.get('HX-Request'):
+                return TemplateResponse(request, 'orders/checkout_content.html', context)
+            return render(request, 'orders/checkout.html', context)
+
         if form.is_valid():
             order = Order.objects.create(
                 user=request.user,
@@ -111,6 +120,7 @@ class CheckoutView(CartMixin, View):
                 total_price=total_price,
                 payment_provider=payment_provider,
                 discount=discount_value,
+                discount_code=discount,
             )
 
             for item in cart.items.select_related('product', 'product_size'):
@@ -138,6 +148,8 @@ class CheckoutView(CartMixin, View):
                 
             except Exception as e:
                 logger.error(f"Error creating payment: {str(e)}", exc_info=True)
+                if discount:
+                    DiscountCode.release(discount.pk)
                 order.delete()
                 context = {
                     'form': form,
@@ -178,20 +190,20 @@ def validate_discount_code(request):
         cleaned = ''.join(ch for ch in raw_subtotal if (ch.isdigit() or ch in '.,-'))
         cleaned = cleaned.replace(',', '.')
         try:
-            subtotal = float(cleaned)
-        except ValueError:
-            subtotal = 0.0
-
-        # case-insensitive валидиране на кода
-        valid = (
-            NewsletterSubscriber.objects.filter(discount_code__iexact=code_raw).exists()
-        )
+            subtotal = Decimal(cleaned)
+        except InvalidOperation:
+            subtotal = Decimal('0')
 
-        if not valid:
+        discount = lookup_code(code_raw)
+        if not discount:
             return JsonResponse({'valid': False})
 
-        discount_value = round(subtotal * 0.10, 2)
-        return JsonResponse({'valid': True, 'discount_value': discount_value})
+        discount_value = discount_amount(subtotal, discount.percent)
+        return JsonResponse({
+            'valid': True,
+            'discount_percent': discount.percent,
+            'discount_value': float(discount_value),
+        })
 
     except Exception as e:
         return JsonResponse({'valid': False, 'error': str(e)})
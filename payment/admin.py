@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import PaymentStatus
 
-# Register your models here.
+
+@admin.register(PaymentStatus)
+class PaymentStatusAdmin(admin.ModelAdmin):
+    list_display = ('order', 'provider', 'status', 'session_id', 'updated_at')
+    list_filter = ('status', 'provider')
+    search_fields = ('session_id', 'payment_intent_id', 'order__email')
+    readonly_fields = ('created_at', 'updated_at')
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from payment.providers import StripeProvider
+from payment.reconcile import reconcile_pending_orders
+
+
+class Command(BaseCommand):
+    help = 'Reconcile pending orders against the payment provider.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=30,
+                            help='Only orders pending for more than this many minutes.')
+        parser.add_argument('--page-size', type=int, default=100,
+                            help='Checkout sessions fetched per list call.')
+
+    def handle(self, *args, **options):
+        provider = StripeProvider(page_size=options['page_size'])
+        counts = reconcile_pending_orders(
+            provider, older_than=timedelta(minutes=options['older_than'])
+        )
+        if not counts:
+            self.stdout.write('No pending orders to update.')
+            return
+        for status, count in sorted(counts.items()):
+            self.stdout.write(self.style.SUCCESS(f'{count} order(s) -> {status}'))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0005_remove_order_order_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('stripe', 'Stripe')], default='stripe', max_length=20)),
+                ('session_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('payment_intent_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('failed', 'Failed'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='pending', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payment_status', to='orders.order')),
+            ],
+            options={
+                'verbose_name_plural': 'payment statuses',
+            },
+        ),
+    ]
@@ -1,3 +1,86 @@
-from django.db import models
+from django.db import models, transaction
+from orders.models import Order, DiscountCode
+from orders.stats import order_status_changed
 
-# Create your models here.
+
+class PaymentStatus(models.Model):
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('paid', 'Paid'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+        ('expired', 'Expired'),
+    )
+    FINAL_STATUSES = ('paid', 'failed', 'cancelled', 'expired')
+
+    # Статус на поръчката, към който води всяко крайно плащане
+    ORDER_STATUS_MAP = {
+        'paid': 'processing',
+        'failed': 'cancelled',
+        'cancelled': 'cancelled',
+        'expired': 'cancelled',
+    }
+
+    order = models.OneToOneField(Order, on_delete=models.CASCADE,
+                                 related_name='payment_status')
+    provider = models.CharField(max_length=20, choices=Order.PAYMENT_PROVIDER_CHOICES,
+                                default='stripe')
+    session_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    payment_intent_id = models.CharField(max_length=255, blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+    class Meta:
+        verbose_name_plural = 'payment statuses'
+
+
+    def __str__(self):
+        return f"Payment for order {self.order_id} ({self.status})"
+
+
+    @property
+    def is_pending(self):
+        return self.status == 'pending'
+
+
+    @classmethod
+    @transaction.atomic
+    def record(cls, order, status, session_id=None, payment_intent_id=None):
+        """
+        Записва състоянието на плащането и синхронизира статуса на поръчката.
+        Използва се от webhook-а, от reconciliation и при създаване на сесия.
+        """
+        payment, created = cls.objects.select_for_update().get_or_create(
+            order=order,
+            defaults={'provider': order.payment_provider or 'stripe'}
+        )
+
+        # Крайно състояние не се презаписва от по-късни/дублирани събития,
+        # освен ако плащането реално е минало
+        if payment.status in cls.FINAL_STATUSES and status not in (payment.status, 'paid'):
+            return payment
+
+        payment.status = status
+        if session_id:
+            payment.session_id = session_id
+        if payment_intent_id:
+            payment.payment_intent_id = payment_intent_id
+        payment.save()
+
+        order_status = cls.ORDER_STATUS_MAP.get(status)
+        updatable = ('pending', 'cancelled') if status == 'paid' else ('pending',)
+        if order_status and order.status in updatable:
+            if order.discount_code_id and order.status != 'cancelled' and order_status == 'cancelled':
+                DiscountCode.release(order.discount_code_id)
+            elif order.discount_code_id and order.status == 'cancelled' and order_status != 'cancelled':
+                # кодът е освободен при отказа - иначе еднократен код се използва два пъти
+                DiscountCode.reclaim(order.discount_code_id)
+            old_status, order.status = order.status, order_status
+            if payment_intent_id:
+                order.stripe_payment_intent_id = payment_intent_id
+            order.save(update_fields=['status', 'stripe_payment_intent_id', 'updated_at'])
+            order_status_changed([(order, old_status)])
+
+        return payment
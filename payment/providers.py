@@ -0,0 +1,81 @@
+import stripe
+from django.conf import settings
+
+
+def session_payment_status(status, payment_status):
+    """Превежда състоянието на Checkout Session към PaymentStatus.status."""
+    if payment_status in ('paid', 'no_payment_required'):
+        return 'paid'
+    if status == 'expired':
+        return 'expired'
+    return 'pending'
+
+
+class StripeProvider:
+    """Чете Checkout Sessions от Stripe с пагинирани list заявки."""
+
+    def __init__(self, page_size=100):
+        self.page_size = page_size
+
+    @staticmethod
+    def as_dict(session):
+        return {
+            'id': session.id,
+            'order_id': (session.metadata or {}).get('order_id'),
+            'status': session.status,
+            'payment_status': session.payment_status,
+            'payment_intent': session.payment_intent,
+            'created': session.created,
+        }
+
+    def iter_checkout_sessions(self, created_gte):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        sessions = stripe.checkout.Session.list(
+            created={'gte': int(created_gte.timestamp())},
+            limit=self.page_size,
+        )
+        for session in sessions.auto_paging_iter():
+            yield self.as_dict(session)
+
+    def get_checkout_session(self, session_id):
+        """Една сесия по id или None, ако Stripe не я намира."""
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        try:
+            return self.as_dict(stripe.checkout.Session.retrieve(session_id))
+        except stripe.error.InvalidRequestError:
+            return None
+
+
+class FakeProvider:
+    """
+    Локален доставчик за тестове и разработка. Пази сесиите в паметта
+    и брои list заявките, както биха се пагинирали при Stripe.
+    """
+
+    def __init__(self, sessions=None, page_size=100):
+        self.sessions = list(sessions or [])
+        self.page_size = page_size
+        self.list_calls = 0
+        self.retrieve_calls = 0
+
+    def add_session(self, order_id, status='open', payment_status='unpaid',
+                    session_id=None, payment_intent=None, created=0):
+        self.sessions.append({
+            'id': session_id or f'cs_fake_{len(self.sessions) + 1}',
+            'order_id': str(order_id),
+            'status': status,
+            'payment_status': payment_status,
+            'payment_intent': payment_intent,
+            'created': created,
+        })
+
+    def iter_checkout_sessions(self, created_gte):
+        since = int(created_gte.timestamp())
+        matching = [s for s in self.sessions if s['created'] >= since]
+        for start in range(0, max(len(matching), 1), self.page_size):
+            self.list_calls += 1
+            yield from matching[start:start + self.page_size]
+
+    def get_checkout_session(self, session_id):
+        self.retrieve_calls += 1
+        return next((s for s in self.sessions if s['id'] == session_id), None)
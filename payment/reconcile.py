@@ -0,0 +1,138 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from orders.models import Order, DiscountCode
+from orders.stats import order_status_changed
+from .models import PaymentStatus
+from .providers import session_payment_status
+
+
+# Stripe Checkout Session изтича най-много 24 часа след създаването си
+SESSION_LIFETIME = timedelta(hours=24)
+# list заявките никога не гледат по-назад от това - по-старите сесии
+# отдавна са в крайно състояние
+LIST_WINDOW = SESSION_LIFETIME + timedelta(hours=1)
+
+
+def reconcile_pending_orders(provider, older_than=timedelta(minutes=30), now=None):
+    """
+    Сверява чакащите поръчки по-стари от `older_than` със състоянието при
+    доставчика. Поръчките се намират през индекса (status, created_at),
+    сесиите се теглят с пагинирани list заявки за най-много LIST_WINDOW
+    назад, а промените се записват на едро. Връща брояч по нов статус.
+
+    Поръчка без сесия в прозореца се проверява поотделно по записания
+    PaymentStatus.session_id. Ако и така няма сесия, а поръчката е по-стара
+    от живота на сесия, тя вече не може да бъде платена и се отказва.
+    """
+    now = now or timezone.now()
+    cutoff = now - older_than
+
+    orders = {
+        order.id: order
+        for order in Order.objects
+        .filter(status='pending', created_at__lt=cutoff, payment_provider='stripe')
+        # user и total_price са нужни на orders.stats - иначе по заявка на поръчка
+        .only('id', 'user', 'status', 'total_price', 'created_at', 'stripe_payment_intent_id', 'discount_code')
+    }
+    if not orders:
+        return Counter()
+
+    oldest = min(order.created_at for order in orders.values())
+
+    # Последната известна сесия за всяка чакаща поръчка
+    sessions = {}
+    for session in provider.iter_checkout_sessions(created_gte=max(oldest, now - LIST_WINDOW)):
+        try:
+            order_id = int(session['order_id'])
+        except (TypeError, ValueError):
+            continue
+        if order_id not in orders:
+            continue
+        current = sessions.get(order_id)
+        if current is None or session['created'] >= current['created']:
+            sessions[order_id] = session
+
+    # поръчки без сесия в прозореца - сесията им се взима по id
+    stragglers = orders.keys() - sessions.keys()
+    if stragglers:
+        stored = PaymentStatus.objects.filter(
+            order_id__in=stragglers, session_id__isnull=False
+        ).values_list('order_id', 'session_id')
+        for order_id, session_id in stored:
+            session = provider.get_checkout_session(session_id)
+            if session is not None:
+                sessions[order_id] = session
+        for order_id in stragglers - sessions.keys():
+            if orders[order_id].created_at < now - LIST_WINDOW:
+                sessions[order_id] = {'id': None, 'status': 'expired', 'payment_status': 'unpaid',
+                                      'payment_intent': None, 'created': None}
+
+    changes = {}
+    for order_id, session in sessions.items():
+        status = session_payment_status(session['status'], session['payment_status'])
+        if status != 'pending':
+            changes[order_id] = (status, session)
+
+    if not changes:
+        return Counter()
+
+    with transaction.atomic():
+        # Webhook-ът може да е обработил част от поръчките междувременно
+        still_pending = set(
+            Order.objects.select_for_update()
+            .filter(id__in=changes.keys(), status='pending')
+            .values_list('id', flat=True)
+        )
+        changes = {k: v for k, v in changes.items() if k in still_pending}
+
+        payments = {
+            payment.order_id: payment
+            for payment in PaymentStatus.objects
+            .select_for_update()
+            .filter(order_id__in=changes.keys())
+        }
+
+        updated_orders, updated_payments, new_payments = [], [], []
+        released_codes = Counter()
+        for order_id, (status, session) in changes.items():
+            order = orders[order_id]
+            order.status = PaymentStatus.ORDER_STATUS_MAP[status]
+            if order.status == 'cancelled' and order.discount_code_id:
+                released_codes[order.discount_code_id] += 1
+            order.updated_at = now
+            if session['payment_intent']:
+                order.stripe_payment_intent_id = session['payment_intent']
+            updated_orders.append(order)
+
+            payment = payments.get(order_id)
+            if payment is None:
+                new_payments.append(PaymentStatus(
+                    order_id=order_id,
+                    status=status,
+                    session_id=session['id'],
+                    payment_intent_id=session['payment_intent'],
+                ))
+            elif payment.status not in PaymentStatus.FINAL_STATUSES or status == 'paid':
+                payment.status = status
+                payment.session_id = session['id'] or payment.session_id
+                payment.payment_intent_id = session['payment_intent'] or payment.payment_intent_id
+                payment.updated_at = now
+                updated_payments.append(payment)
+
+        Order.objects.bulk_update(
+            updated_orders, ['status', 'stripe_payment_intent_id', 'updated_at'], batch_size=500
+        )
+        PaymentStatus.objects.bulk_update(
+            updated_payments, ['status', 'session_id', 'payment_intent_id', 'updated_at'], batch_size=500
+        )
+        PaymentStatus.objects.bulk_create(new_payments, batch_size=500, ignore_conflicts=True)
+        for code_id, count in released_codes.items():
+            DiscountCode.release(code_id, count)
+        # всички бяха 'pending' - проверено със select_for_update по-горе
+        order_status_changed([(order, 'pending') for order in updated_orders])
+
+    return Counter(status for status, _ in changes.values())
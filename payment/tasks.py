@@ -0,0 +1,28 @@
+from orders.models import Order
+from taskqueue.registry import task
+from .models import PaymentStatus
+from .providers import session_payment_status
+
+
+# Статус на плащането според типа на събитието
+STRIPE_EVENT_STATUS = {
+    'checkout.session.completed': None,
+    'checkout.session.async_payment_succeeded': 'paid',
+    'checkout.session.async_payment_failed': 'failed',
+    'checkout.session.expired': 'expired',
+}
+
+
+@task(priority=20)
+def process_stripe_event(event):
+    session = event['data']['object']
+    order_id = (session.get('metadata') or {}).get('order_id')
+    status = STRIPE_EVENT_STATUS[event['type']]
+    if status is None:
+        # при асинхронни методи плащането идва по-късно
+        status = session_payment_status(session.get('status'), session.get('payment_status'))
+
+    order = Order.objects.get(id=order_id)
+    PaymentStatus.record(order, status,
+                         session_id=session.get('id'),
+                         payment_intent_id=session.get('payment_intent'))
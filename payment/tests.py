@@ -1,3 +1,128 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import DiscountCode, Order
+from users.models import CustomUser
+from .models import PaymentStatus
+from .providers import FakeProvider
+from .reconcile import reconcile_pending_orders
+
+
+class ReconcilePendingOrdersTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = CustomUser.objects.create(email='buyer@example.com', phone='0888000000')
+        self.provider = FakeProvider(page_size=2)
+
+    def order(self, age, **kwargs):
+        order = Order.objects.create(user=self.user, first_name='A', last_name='B', email=self.user.email,
+                                     total_price=10, payment_provider='stripe', **kwargs)
+        Order.objects.filter(id=order.id).update(created_at=self.now - age)
+        return order
+
+    def session(self, order, age, **kwargs):
+        self.provider.add_session(order.id, created=int((self.now - age).timestamp()), **kwargs)
+
+    def reconcile(self):
+        return reconcile_pending_orders(self.provider, now=self.now)
+
+    def test_updates_orders_from_listed_sessions(self):
+        paid = self.order(timedelta(hours=2))
+        expired = self.order(timedelta(hours=2))
+        still_open = self.order(timedelta(hours=2))
+        self.session(paid, timedelta(hours=2), status='complete', payment_status='paid', payment_intent='pi_1')
+        self.session(expired, timedelta(hours=2), status='expired')
+        self.session(still_open, timedelta(hours=2), status='open')
+
+        self.assertEqual(self.reconcile(), {'paid': 1, 'expired': 1})
+        # три сесии по две на страница
+        self.assertEqual(self.provider.list_calls, 2)
+        self.assertEqual(self.provider.retrieve_calls, 0)
+
+        paid.refresh_from_db()
+        self.assertEqual(paid.status, 'processing')
+        self.assertEqual(paid.stripe_payment_intent_id, 'pi_1')
+        self.assertEqual(PaymentStatus.objects.get(order=paid).status, 'paid')
+        self.assertEqual(Order.objects.get(id=expired.id).status, 'cancelled')
+        self.assertEqual(Order.objects.get(id=still_open.id).status, 'pending')
+
+    def test_skips_recent_orders(self):
+        recent = self.order(timedelta(minutes=5))
+        self.session(recent, timedelta(minutes=5), status='expired')
+        self.assertEqual(self.reconcile(), {})
+        self.assertEqual(self.provider.list_calls, 0)
+
+    def test_latest_session_wins(self):
+        order = self.order(timedelta(hours=3))
+        self.session(order, timedelta(hours=3), status='expired')
+        self.session(order, timedelta(hours=2), status='complete', payment_status='paid')
+        self.assertEqual(self.reconcile(), {'paid': 1})
+
+    def test_sessions_outside_the_window_are_retrieved_by_id(self):
+        order = self.order(timedelta(days=3))
+        PaymentStatus.objects.create(order=order, session_id='cs_old')
+        self.session(order, timedelta(days=3), status='complete', payment_status='paid', session_id='cs_old')
+
+        self.assertEqual(self.reconcile(), {'paid': 1})
+        self.assertEqual(self.provider.retrieve_calls, 1)
+        self.assertEqual(PaymentStatus.objects.get(order=order).session_id, 'cs_old')
+
+    def test_old_order_without_session_expires(self):
+        order = self.order(timedelta(days=10))
+        young = self.order(timedelta(hours=1))
+
+        self.assertEqual(self.reconcile(), {'expired': 1})
+        self.assertEqual(Order.objects.get(id=order.id).status, 'cancelled')
+        self.assertEqual(PaymentStatus.objects.get(order=order).status, 'expired')
+        self.assertEqual(Order.objects.get(id=young.id).status, 'pending')
+
+    def test_cancelled_order_releases_discount_code(self):
+        code = DiscountCode.objects.create(code='ONCE', percent=10, max_uses=1, uses_count=1)
+        order = self.order(timedelta(hours=2), discount_code=code)
+        self.session(order, timedelta(hours=2), status='expired')
+
+        self.reconcile()
+        code.refresh_from_db()
+        self.assertEqual(code.uses_count, 0)
+
+    def test_leaves_orders_already_handled_by_webhook(self):
+        order = self.order(timedelta(hours=2))
+        self.session(order, timedelta(hours=2), status='expired')
+        PaymentStatus.record(order, 'paid')
+
+        self.assertEqual(self.reconcile(), {})
+        self.assertEqual(Order.objects.get(id=order.id).status, 'processing')
+
+
+class PaymentStatusRecordTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='buyer@example.com', phone='0888000000')
+        self.code = DiscountCode.objects.create(code='ONCE', percent=10, max_uses=1, uses_count=1)
+        self.order = Order.objects.create(user=self.user, first_name='A', last_name='B', email=self.user.email,
+                                          total_price=10, payment_provider='stripe', discount_code=self.code)
+
+    def uses(self):
+        self.code.refresh_from_db()
+        return self.code.uses_count
+
+    def test_cancel_releases_code(self):
+        PaymentStatus.record(self.order, 'expired')
+        self.assertEqual(self.order.status, 'cancelled')
+        self.assertEqual(self.uses(), 0)
+
+    def test_paid_after_cancel_redeems_code_again(self):
+        PaymentStatus.record(self.order, 'expired')
+        PaymentStatus.record(self.order, 'paid')
+        self.assertEqual(self.order.status, 'processing')
+        self.assertEqual(self.uses(), 1)
+        self.assertFalse(DiscountCode.redeem('ONCE'))
 
-# Create your tests here.
+    def test_duplicate_events_do_not_change_uses(self):
+        PaymentStatus.record(self.order, 'paid')
+        PaymentStatus.record(self.order, 'paid')
+        PaymentStatus.record(self.order, 'expired')
+        self.assertEqual(self.uses(), 1)
@@ -6,5 +6,6 @@ app_name = 'payment'
 urlpatterns = [
     path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
     path('stripe/success/', views.stripe_success, name='stripe_success'),
+    path('stripe/status/<str:session_id>/', views.stripe_status, name='stripe_status'),
     path('stripe/cancel/', views.stripe_cancel, name='stripe_cancel'),
 ]
\ No newline at end of file
@@ -8,7 +8,8 @@ from django.template.response import TemplateResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from orders.models import Order
-from cart.views import CartMixin
+from .models import PaymentStatus
+from .tasks import process_stripe_event, STRIPE_EVENT_STATUS
 from decimal import Decimal
 import json
 import hashlib
@@ -52,6 +53,10 @@ def create_stripe_checkout_session(order, request):
     order.payment_provider = 'stripe'
     order.save()
 
+    PaymentStatus.record(order, 'pending',
+                         session_id=checkout_session.id,
+                         payment_intent_id=checkout_session.payment_intent)
+
     return checkout_session
 
 
@@ -74,47 +79,51 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return HttpResponse(status=400)
     
-    if event ['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        order_id = session['metadata'].get('order_id')
-        try:
-            order = Order.objects.get(id=order_id)
-            order.status = 'processing'
-            order.stripe_payment_intent_id = session.get('payment_intent')
-            order.save()
-        except Order.DoesNotExist:
-            return HttpResponse(status=400)
-        
+    # Обработката е във фонова задача - Stripe получава 200 веднага
+    if event['type'] in STRIPE_EVENT_STATUS:
+        process_stripe_event.delay(json.loads(payload))
+
     return HttpResponse(status=200)
 
+
 def stripe_success(request):
     session_id = request.GET.get('session_id')
     if session_id:
-        try:
-            session = stripe.checkout.Session.retrieve(session_id)
-            order_id = session.metadata.get('order_id')
-            order = get_object_or_404(Order, id=order_id)
-
-            cart = CartMixin().get_cart(request)
-            cart.clear()
-
-            context = {'order': order}
-            if request.headers.get('HX-Request'):
-                return TemplateResponse(request, 'payment/stripe_success_content.html', context)
-            return render(request, 'payment/stripe_success.html', context)
-        except Exception as e:
-            raise
+        # Четем локалното състояние - без заявка към Stripe
+        payment = get_object_or_404(
+            PaymentStatus.objects.select_related('order'),
+            session_id=session_id
+        )
+        context = {'order': payment.order, 'payment': payment}
+        if request.headers.get('HX-Request'):
+            return TemplateResponse(request, 'payment/stripe_success_content.html', context)
+        return render(request, 'payment/stripe_success.html', context)
     return redirect('main:index')
 
 
+def stripe_status(request, session_id):
+    payment = get_object_or_404(
+        PaymentStatus.objects.select_related('order'),
+        session_id=session_id
+    )
+    response = TemplateResponse(request, 'payment/partials/payment_status.html', {
+        'order': payment.order,
+        'payment': payment,
+    })
+    if not payment.is_pending:
+        # 286 спира HTMX polling-а
+        response.status_code = 286
+    return response
+
+
 def stripe_cancel(request):
     order_id = request.GET.get('order_id')
     if order_id:
         order = get_object_or_404(Order, id=order_id)
-        order.status = 'cancelled'
-        order.save()
-        context = {'order': order}
+        payment = PaymentStatus.record(order, 'cancelled')
+        order.refresh_from_db()
+        context = {'order': order, 'payment': payment}
         if request.headers.get('HX-Request'):
             return TemplateResponse(request, 'payment/stripe_cancel_content.html', context)
         return render(request, 'payment/stripe_cancel.html', context)
-    return redirect('orders:checkout')
\ No newline at end of file
+    return redirect('orders:checkout')
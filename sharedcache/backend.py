@@ -0,0 +1,116 @@
+import logging
+import os
+import pickle
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .store import MmapStore
+
+
+logger = logging.getLogger(__name__)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path, size, ways):
+    # по един map на процес - Django създава отделен backend за всяка нишка
+    key = (path, os.getpid())
+    if key not in _stores:
+        with _stores_lock:
+            if key not in _stores:
+                _stores[key] = MmapStore(path, size=size, ways=ways)
+    return _stores[key]
+
+
+class MmapCache(BaseCache):
+    """
+    Кеш, споделен от всички worker процеси на машината, в memory-mapped файл.
+
+        CACHES = {'default': {
+            'BACKEND': 'sharedcache.backend.MmapCache',
+            'LOCATION': '/dev/shm/aurin-cache',
+            'OPTIONS': {'SIZE': 64 * 1024 * 1024, 'WAYS': 8},
+        }}
+
+    Стойностите над 256 KB не се кешират - set() тогава връща False.
+    Промяна на SIZE/WAYS изчиства файла - всички процеси трябва да се
+    рестартират заедно.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._store = get_store(location, options.get('SIZE', 64 * 1024 * 1024), options.get('WAYS', 8))
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        if expires and expires <= time.time():
+            return False
+        return self._store.set(key.encode(), pickle.dumps(value, self.pickle_protocol), expires,
+                               only_if_missing=True)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = self._store.get(key.encode())
+        if pickled is None:
+            return default
+        try:
+            return pickle.loads(pickled)
+        except Exception:
+            # повреден запис (напр. от файл на стара версия) - пропуск, а не грешка при всяка заявка
+            logger.warning(f"Dropping unreadable cache entry {key}")
+            self._store.delete(key.encode())
+            return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        if expires and expires <= time.time():
+            # timeout=0 - стойността изтича веднага
+            self._store.delete(key.encode())
+            return False
+        if not self._store.set(key.encode(), pickle.dumps(value, self.pickle_protocol), expires):
+            # твърде голяма стойност - старата не бива да остане
+            self._store.delete(key.encode())
+            return False
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self._expires(timeout)
+        return self._store.update(key.encode(), lambda value, _: (value, expires)) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        def add_delta(pickled, expires):
+            return pickle.dumps(pickle.loads(pickled) + delta, self.pickle_protocol), expires
+
+        pickled = self._store.update(key.encode(), add_delta)
+        if pickled is None:
+            raise ValueError("Key '%s' not found" % key)
+        return pickle.loads(pickled)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._store.get(key.encode()) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._store.delete(key.encode())
+
+    def clear(self):
+        self._store.clear()
+
+    def stats(self):
+        return self._store.stats()
@@ -0,0 +1,273 @@
+import logging
+import os
+import select
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .local import LocalCache
+from .models import TagVersion
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'aurin_invalidate'
+# NOTIFY приема до 8000 байта - по-дългите списъци се разделят
+PAYLOAD_LIMIT = 7900
+# колко назад да се гледа при сверяване - транзакция може да запише
+# updated_at по-рано, отколкото е видима за останалите
+RESYNC_OVERLAP = timedelta(minutes=5)
+
+# версиите на таговете в споделения кеш - по тях записите там разбират,
+# че са остарели (sharedcache.flight)
+VERSION_PREFIX = 'tagv:'
+# до кога версиите в споделения кеш са сверени с базата - файлът на кеша
+# надживява рестарта, а нов worker продължава сверяването оттам
+SYNCED_KEY = 'tagv-synced-at'
+
+MISSING = object()
+
+local_cache = LocalCache(settings.LOCAL_CACHE_MAX_ENTRIES)
+# общите тагове, чакащи commit на транзакцията в нишката
+_pending = threading.local()
+
+
+def payloads(versions):
+    """Съобщения "таг@версия таг@версия ..." до PAYLOAD_LIMIT байта."""
+    payload = ''
+    for tag, version in sorted(versions.items()):
+        item = f"{tag}@{version}"
+        if payload and len(payload) + len(item) + 1 > PAYLOAD_LIMIT:
+            yield payload
+            payload = ''
+        payload = f"{payload} {item}" if payload else item
+    if payload:
+        yield payload
+
+
+def parse_payload(payload):
+    versions = {}
+    for item in payload.split():
+        tag, _, version = item.rpartition('@')
+        if tag and version.isdigit():
+            versions[tag] = int(version)
+    return versions
+
+
+def bump_versions(tags):
+    """Увеличава версиите на таговете с една заявка и връща новите."""
+    now = timezone.now()
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for tag in tags:
+            if not TagVersion.objects.filter(tag=tag).update(version=F('version') + 1, updated_at=now):
+                TagVersion.objects.get_or_create(tag=tag, defaults={'updated_at': now})
+        return dict(TagVersion.objects.filter(tag__in=tags).values_list('tag', 'version'))
+
+    table = connection.ops.quote_name(TagVersion._meta.db_table)
+    placeholders = ', '.join(['(%s, 1, %s)'] * len(tags))
+    sql = (
+        f'INSERT INTO {table} (tag, version, updated_at) VALUES {placeholders} '
+        f'ON CONFLICT (tag) DO UPDATE SET version = {table}.version + 1, updated_at = excluded.updated_at '
+        f'RETURNING tag, version'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for tag in tags for value in (tag, now)])
+        return dict(cursor.fetchall())
+
+
+def is_aggregate(tag):
+    """Общ таг за цял модел ("products") - за разлика от "product:12"."""
+    return ':' not in tag
+
+
+def _notify(versions):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for payload in payloads(versions):
+                cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+def _publish_aggregates():
+    tags, _pending.tags = getattr(_pending, 'tags', set()), set()
+    if not tags:
+        # вече изпратени от по-ранен callback на същия commit
+        return
+    with transaction.atomic():
+        versions = bump_versions(sorted(tags))
+        _notify(versions)
+    bus.receive(versions)
+
+
+def publish(tags):
+    """
+    Инвалидира таговете във всички процеси. Версиите се увеличават в текущата
+    транзакция, а NOTIFY се доставя от Postgres едва при commit - другите
+    worker-и не изчистват кеша, преди промяната да е видима.
+
+    Общите тагове (is_aggregate) се увеличават след commit в отделна кратка
+    транзакция и веднъж за всички publish() в нея - иначе редът им в
+    TagVersion е заключен до края на всяка заявка, която променя продукт, и
+    паралелните записи се изчакват един друг.
+    """
+    tags = sorted(set(tags))
+    aggregates = [tag for tag in tags if is_aggregate(tag)]
+    tags = [tag for tag in tags if not is_aggregate(tag)]
+    if tags:
+        versions = bump_versions(tags)
+        _notify(versions)
+        # собственият процес не чака слушателя
+        transaction.on_commit(lambda: bus.receive(versions))
+    if aggregates:
+        _pending.tags = getattr(_pending, 'tags', set()) | set(aggregates)
+        # при rollback callback-ът отпада, а таговете се изпращат със следващия
+        # commit - излишна, но безвредна инвалидация
+        transaction.on_commit(_publish_aggregates, robust=True)
+
+
+class Listener(threading.Thread):
+    """
+    Отделна връзка към Postgres с LISTEN, която изчиства локалния кеш при
+    всяко съобщение. При прекъсване се свързва отново и форсира сверяване
+    на версиите - съобщенията междувременно са изгубени.
+    """
+
+    def __init__(self, bus):
+        super().__init__(name='cache-invalidation', daemon=True)
+        self.bus = bus
+
+    def run(self):
+        delay = 1
+        while True:
+            try:
+                self.listen()
+                delay = 1
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener disconnected: {e}")
+            self.bus.next_sync = 0
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def listen(self):
+        db = connections.create_connection('default')
+        try:
+            db.ensure_connection()
+            raw = db.connection
+            with raw.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            self.bus.next_sync = 0
+            while True:
+                if callable(raw.notifies):
+                    # psycopg 3
+                    for notify in raw.notifies(timeout=60):
+                        self.bus.receive(parse_payload(notify.payload))
+                elif select.select([raw], [], [], 60) != ([], [], []):
+                    raw.poll()
+                    while raw.notifies:
+                        self.bus.receive(parse_payload(raw.notifies.pop(0).payload))
+                else:
+                    # проверка, че връзката е жива
+                    with raw.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+        finally:
+            db.close()
+
+
+class Bus:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.listener = None
+        self.versions = {}
+        self.synced_at = None
+        self.next_sync = 0
+
+    def ensure(self):
+        # gunicorn създава worker-ите с fork - слушателят се пуска във всеки
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    local_cache.clear()
+                    self.versions = {}
+                    # сверява се веднага - промените, докато процесите на
+                    # машината не са работили, не са стигнали до кеша
+                    self.synced_at = None
+                    self.next_sync = 0
+                    if connection.vendor == 'postgresql' and settings.CACHE_BUS_LISTEN:
+                        self.listener = Listener(self)
+                        self.listener.start()
+        if time.monotonic() >= self.next_sync:
+            self.resync()
+
+    def receive(self, versions):
+        with self.lock:
+            for tag, version in versions.items():
+                self.versions[tag] = max(version, self.versions.get(tag, 0))
+        local_cache.evict_tags(versions)
+        # всички worker-и на машината записват същите номера - без значение кой е първи
+        cache.set_many({VERSION_PREFIX + tag: version for tag, version in versions.items()}, None)
+
+    def resync(self):
+        """Резервен път: изчиства таговете с версии, по-нови от получените."""
+        with self.lock:
+            if time.monotonic() < self.next_sync:
+                return
+            self.next_sync = time.monotonic() + settings.CACHE_BUS_RESYNC
+            since, self.synced_at = self.synced_at or cache.get(SYNCED_KEY), timezone.now()
+        rows = TagVersion.objects.all()
+        if since is not None:
+            # без отметка (празен или нов кеш) се сверяват всички тагове
+            rows = rows.filter(updated_at__gte=since - RESYNC_OVERLAP)
+        changed = {
+            tag: version for tag, version in rows.values_list('tag', 'version')
+            if version > self.versions.get(tag, 0)
+        }
+        if changed:
+            self.receive(changed)
+        cache.set(SYNCED_KEY, self.synced_at, None)
+
+
+bus = Bus()
+
+
+def tag_versions(tags):
+    """
+    Текущите версии на таговете според споделения кеш (0 = непроменян).
+    Изхвърлените от кеша се четат от TagVersion - иначе запис с по-стара
+    версия би станал отново валиден.
+    """
+    bus.ensure()
+    found = {
+        key[len(VERSION_PREFIX):]: version
+        for key, version in cache.get_many([VERSION_PREFIX + tag for tag in tags]).items()
+    }
+    missing = [tag for tag in tags if tag not in found]
+    if missing:
+        stored = dict(TagVersion.objects.filter(tag__in=missing).values_list('tag', 'version'))
+        for tag in missing:
+            found[tag] = stored.get(tag, 0)
+            # add, а не set - не презаписва по-нова версия, дошла междувременно
+            cache.add(VERSION_PREFIX + tag, found[tag], None)
+    return tuple(found[tag] for tag in tags)
+
+
+def cached(key, func, tags=(), timeout=None):
+    """
+    Стойност от кеша в паметта на процеса или func(), записана под таговете.
+    Записът се изчиства от publish() с някой от таговете във всеки worker.
+    """
+    bus.ensure()
+    value = local_cache.get(key, MISSING)
+    if value is MISSING:
+        generation = local_cache.generation
+        value = func()
+        # ако междувременно е имало инвалидация, стойността може да е стара
+        local_cache.set(key, value, tags, timeout, generation=generation)
+    return value
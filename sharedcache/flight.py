@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import translation
+
+from .bus import tag_versions
+
+
+logger = logging.getLogger(__name__)
+
+LOCK_PREFIX = 'flight:'
+# колко най-много чака заявка, докато друга изчислява липсващ ключ
+WAIT = 3.0
+POLL_INTERVAL = 0.05
+# ако фоновото обновяване умре, след толкова секунди друга заявка опитва отново
+REFRESH_LOCK = 60
+
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class Flight:
+    """Едно изчисление на ключ, което чакат останалите нишки в процеса."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _valid(key):
+    """Записът от кеша, ако никой от таговете му не е променян след него."""
+    entry = cache.get(key)
+    if entry is not None and tag_versions(entry[2]) == entry[3]:
+        return entry
+    return None
+
+
+def _store(key, value, tags, soft_ttl, hard_ttl, versions):
+    fresh_until = time.time() + soft_ttl if soft_ttl is not None else float('inf')
+    # MmapCache връща False за стойности над размера на клетката - другите
+    # backend-и връщат None
+    if cache.set(key, (value, fresh_until, tags, versions), hard_ttl) is False:
+        logger.warning(f"Cache entry {key} is too large to store")
+
+
+def _compute(key, func, tags, soft_ttl, hard_ttl):
+    # таговете и версиите им се четат преди заявките - промяна по време на
+    # изчислението прави записа остарял, вместо да се загуби
+    tags = list(tags()) if callable(tags) else list(tags)
+    versions = tag_versions(tags)
+    value = func()
+    _store(key, value, tags, soft_ttl, hard_ttl, versions)
+    return value
+
+
+def _refresh(key, func, tags, soft_ttl, hard_ttl, language):
+    try:
+        with translation.override(language):
+            _compute(key, func, tags, soft_ttl, hard_ttl)
+    except Exception:
+        logger.exception(f"Background refresh of {key} failed")
+    finally:
+        cache.delete(LOCK_PREFIX + key)
+        # нишката има собствена връзка към базата
+        close_old_connections()
+
+
+def _lead(key, func, tags, soft_ttl, hard_ttl):
+    """Изчислява ключа веднъж за процеса - другите нишки чакат резултата."""
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+
+    if not leader:
+        if flight.done.wait(WAIT) and flight.error is None:
+            return flight.value
+        return _compute(key, func, tags, soft_ttl, hard_ttl)
+
+    try:
+        # между процесите: един изчислява, останалите чакат записа в кеша
+        locked = cache.add(LOCK_PREFIX + key, 1, WAIT * 2)
+        if not locked:
+            deadline = time.monotonic() + WAIT
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL)
+                entry = _valid(key)
+                if entry is not None:
+                    flight.value = entry[0]
+                    return flight.value
+                # водещият е приключил, без записът да се появи (грешка или
+                # твърде голяма стойност) - няма какво повече да се чака
+                if not cache.has_key(LOCK_PREFIX + key):
+                    break
+        try:
+            flight.value = _compute(key, func, tags, soft_ttl, hard_ttl)
+        finally:
+            if locked:
+                cache.delete(LOCK_PREFIX + key)
+        return flight.value
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        flight.done.set()
+        with _flights_lock:
+            _flights.pop(key, None)
+
+
+def get_or_compute(key, func, soft_ttl=60, hard_ttl=600, tags=()):
+    """
+    Кешира func() в споделения кеш със single-flight и stale-while-revalidate:
+
+    - след soft_ttl стойността се връща остаряла, а една заявка я обновява
+      във фонова нишка;
+    - след hard_ttl или при промяна на някой от таговете (main.invalidation)
+      я няма - изчислява я само една заявка, останалите я изчакват.
+
+    `tags` може да е функция без аргументи - за тагове, които изискват
+    заявка (напр. product:<id> при търсене по slug). Извиква се само при
+    изчисление и винаги преди func(). При soft_ttl=None
+    няма фоново обновяване - за стойности, които не може да се изчислят
+    извън заявката (напр. HTML фрагменти).
+    """
+    entry = _valid(key)
+    if entry is not None:
+        value, fresh_until = entry[:2]
+        if time.time() >= fresh_until and cache.add(LOCK_PREFIX + key, 1, REFRESH_LOCK):
+            _refresher.submit(_refresh, key, func, tags, soft_ttl, hard_ttl, translation.get_language())
+        return value
+    return _lead(key, func, tags, soft_ttl, hard_ttl)
@@ -0,0 +1,45 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Model
+from django.utils.translation import get_language
+
+from .flight import get_or_compute
+
+
+PREFIX = 'fragment:'
+
+
+def object_tags(obj):
+    """Таг "модел:pk" - същият, който publish() изпраща при промяна (main.invalidation)."""
+    return [f"{obj._meta.model_name}:{obj.pk}"]
+
+
+def vary_value(value):
+    if isinstance(value, Model):
+        return f"{value._meta.label_lower}:{value.pk}"
+    return str(value)
+
+
+def fragment_key(name, vary_on=()):
+    digest = hashlib.md5(':'.join(vary_value(v) for v in vary_on).encode()).hexdigest()
+    return f"{PREFIX}{name}:{get_language()}:{digest}"
+
+
+def fragment_tags(vary_on=(), tags=()):
+    """Изричните тагове плюс таговете на всички модели, от които зависи фрагментът."""
+    result = list(tags)
+    for value in vary_on:
+        if isinstance(value, Model):
+            result.extend(object_tags(value))
+    return sorted(set(result))
+
+
+def render_fragment(name, render, vary_on=(), tags=(), timeout=None):
+    """
+    Рендиран HTML фрагмент от споделения кеш или render(). Ключът зависи от
+    езика и vary_on, а записът отпада при промяна на някой от таговете.
+    """
+    timeout = settings.FRAGMENT_CACHE_TIMEOUT if timeout is None else timeout
+    return get_or_compute(fragment_key(name, vary_on), render, soft_ttl=None, hard_ttl=timeout,
+                          tags=fragment_tags(vary_on, tags))
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class LocalCache:
+    """
+    Кеш в паметта на процеса с тагове и LRU изхвърляне. Записите се
+    изчистват по таг - от шината за инвалидация (sharedcache.bus).
+    """
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # ключ -> (стойност, тагове, изтичане)
+        self._tags = defaultdict(set)
+        self._lock = threading.RLock()
+        # расте при всяка инвалидация - set(generation=...) не записва
+        # стойност, изчислена преди нея
+        self.generation = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, _, expires = entry
+            if expires and expires <= time.monotonic():
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, tags=(), timeout=None, generation=None):
+        expires = time.monotonic() + timeout if timeout else 0
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+            self._remove(key)
+            self._data[key] = (value, frozenset(tags), expires)
+            for tag in tags:
+                self._tags[tag].add(key)
+            while len(self._data) > self.max_entries:
+                self._remove(next(iter(self._data)))
+            return True
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def evict_tags(self, tags):
+        """Изтрива всички записи с някой от таговете. Връща броя им."""
+        with self._lock:
+            self.generation += 1
+            keys = set().union(*(self._tags.get(tag, ()) for tag in tags))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,26 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counters and occupancy of the shared memory-mapped cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+        parser.add_argument('--clear', action='store_true', help='Remove all entries.')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'stats'):
+            raise CommandError(f"Cache '{options['alias']}' is not a shared mmap cache.")
+        if options['clear']:
+            cache.clear()
+
+        stats = cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / lookups * 100 if lookups else 0
+        self.stdout.write(f"hits={stats['hits']} misses={stats['misses']} ({ratio:.1f}% hit rate) "
+                          f"sets={stats['sets']} evictions={stats['evictions']}")
+        for size_class in stats['classes']:
+            self.stdout.write(f"  <= {size_class['cell_size'] // 1024:>4} KB: "
+                              f"{size_class['used']}/{size_class['cells']} cells used")
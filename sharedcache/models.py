@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class TagVersion(models.Model):
+    """
+    Брояч на промените по таг (напр. "product:12"). Всяка инвалидация го
+    увеличава - процесите, изпуснали NOTIFY, сравняват версиите периодично.
+    """
+    tag = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(db_index=True)
+
+
+    def __str__(self):
+        return f"{self.tag} v{self.version}"
@@ -0,0 +1,326 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import Counter
+
+
+MAGIC = b'AURMMAP1'
+HEADER_SIZE = 4096
+# magic, общ размер, ways, брой класове и размерите на клетките им
+LAYOUT_FORMAT = '8sQII8I'
+STATS_OFFSET = 256
+STAT_NAMES = ('hits', 'misses', 'sets', 'evictions')
+STATS_FORMAT = f'{len(STAT_NAMES)}Q'
+
+CELL_SIZES = (1024, 4096, 16 * 1024, 64 * 1024, 256 * 1024)
+KEY_LENGTH = struct.Struct('H')
+# за всеки way: tag, последен достъп, изтичане (0 = никога), дължина на данните
+META_FIELDS = 4
+
+
+def key_tag(key):
+    # стабилен между процесите (за разлика от hash()), 0 означава празна клетка
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little') | 1
+
+
+class SizeClass:
+    """
+    Клас клетки с еднакъв размер, подредени в множества (sets) по `ways`
+    клетки - ключът попада в едно множество, а в него се изхвърля най-отдавна
+    използваната клетка (LRU в рамките на множеството).
+    """
+
+    def __init__(self, index, offset, cell_size, sets, ways):
+        self.index = index
+        self.offset = offset
+        self.cell_size = cell_size
+        self.sets = sets
+        self.ways = ways
+        self.meta = struct.Struct(f'{ways}Q{ways}d{ways}d{ways}Q')
+        self.set_size = self.meta.size + ways * cell_size
+
+    @property
+    def size(self):
+        return self.sets * self.set_size
+
+    def set_offset(self, tag):
+        return self.offset + ((tag >> 1) % self.sets) * self.set_size
+
+    def cell_offset(self, set_offset, way):
+        return set_offset + self.meta.size + way * self.cell_size
+
+    def field_offset(self, set_offset, field, way):
+        return set_offset + (field * self.ways + way) * 8
+
+
+def layout(size, ways):
+    """Разпределя файла по равно между класовете. Зависи само от size и ways."""
+    budget = (size - HEADER_SIZE) // len(CELL_SIZES)
+    classes, offset = [], HEADER_SIZE
+    for index, cell_size in enumerate(CELL_SIZES):
+        probe = SizeClass(index, offset, cell_size, 1, ways)
+        sets = max(1, budget // probe.set_size)
+        size_class = SizeClass(index, offset, cell_size, sets, ways)
+        classes.append(size_class)
+        offset += size_class.size
+    return classes, offset
+
+
+class MmapStore:
+    """
+    Хеш таблица в memory-mapped файл, споделена от всички процеси на машината.
+    Записът заключва множествата на ключа във всички класове (винаги в един и
+    същ ред - без deadlock) с fcntl заключване на байтов диапазон; четенето
+    заключва само едно множество и то споделено. Статистиките се натрупват
+    локално и се добавят към заглавието на файла на порции.
+    """
+
+    FLUSH_EVERY = 64
+
+    def __init__(self, path, size=64 * 1024 * 1024, ways=8):
+        self.path = path
+        self.ways = ways
+        self.classes, self.size = layout(size, ways)
+        self.layout = struct.pack(LAYOUT_FORMAT, MAGIC, self.size, ways, len(CELL_SIZES),
+                                  *CELL_SIZES, *[0] * (8 - len(CELL_SIZES)))
+        self._lock = threading.RLock()
+        self._stats = Counter()
+        self._pending = 0
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            current = os.pread(self.fd, len(self.layout), 0)
+            if current != self.layout or os.fstat(self.fd).st_size != self.size:
+                # нов файл или променени настройки - започваме на чисто
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, self.size)
+                os.pwrite(self.fd, self.layout, 0)
+            self.mm = mmap.mmap(self.fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    # --- заключване ---
+
+    def _lock_range(self, mode, offset, length):
+        fcntl.lockf(self.fd, mode, length, offset, os.SEEK_SET)
+
+    def _lock_sets(self, tag):
+        offsets = [c.set_offset(tag) for c in self.classes]
+        for size_class, offset in zip(self.classes, offsets):
+            self._lock_range(fcntl.LOCK_EX, offset, size_class.set_size)
+        return offsets
+
+    def _unlock_sets(self, offsets):
+        for size_class, offset in zip(self.classes, offsets):
+            self._lock_range(fcntl.LOCK_UN, offset, size_class.set_size)
+
+    # --- клетки ---
+
+    def _meta(self, size_class, set_offset):
+        values = size_class.meta.unpack_from(self.mm, set_offset)
+        w = size_class.ways
+        return values[:w], values[w:2 * w], values[2 * w:3 * w], values[3 * w:]
+
+    def _set_field(self, size_class, set_offset, field, way, fmt, value):
+        struct.pack_into(fmt, self.mm, size_class.field_offset(set_offset, field, way), value)
+
+    def _read_cell(self, size_class, set_offset, way, length, key):
+        offset = size_class.cell_offset(set_offset, way)
+        (key_length,) = KEY_LENGTH.unpack_from(self.mm, offset)
+        start = offset + KEY_LENGTH.size
+        if self.mm[start:start + key_length] != key:
+            return None
+        return self.mm[start + key_length:offset + length]
+
+    def _find(self, size_class, set_offset, tag, key, now):
+        """Индексът на живата клетка за ключа в множеството или None."""
+        tags, _, expires, lengths = self._meta(size_class, set_offset)
+        for way, cell_tag in enumerate(tags):
+            if cell_tag == tag and (not expires[way] or expires[way] > now):
+                if self._read_cell(size_class, set_offset, way, lengths[way], key) is not None:
+                    return way
+        return None
+
+    def _clear(self, size_class, set_offset, way):
+        self._set_field(size_class, set_offset, 0, way, 'Q', 0)
+
+    # --- операции ---
+
+    def get(self, key, now=None):
+        now = now or time.time()
+        tag = key_tag(key)
+        with self._lock:
+            for size_class in self.classes:
+                set_offset = size_class.set_offset(tag)
+                # таговете се проверяват без заключване - заключваме само при съвпадение
+                if tag not in size_class.meta.unpack_from(self.mm, set_offset)[:size_class.ways]:
+                    continue
+                self._lock_range(fcntl.LOCK_SH, set_offset, size_class.set_size)
+                try:
+                    way = self._find(size_class, set_offset, tag, key, now)
+                    if way is not None:
+                        _, _, _, lengths = self._meta(size_class, set_offset)
+                        value = self._read_cell(size_class, set_offset, way, lengths[way], key)
+                        self._set_field(size_class, set_offset, 1, way, 'd', now)
+                        self._count('hits')
+                        return value
+                finally:
+                    self._lock_range(fcntl.LOCK_UN, set_offset, size_class.set_size)
+            self._count('misses')
+            return None
+
+    def set(self, key, value, expires=0.0, only_if_missing=False, now=None):
+        """Записва стойността. Връща False, ако е твърде голяма или (при add) вече има такава."""
+        now = now or time.time()
+        tag = key_tag(key)
+        needed = KEY_LENGTH.size + len(key) + len(value)
+        target = next((c for c in self.classes if c.cell_size >= needed), None)
+
+        with self._lock:
+            offsets = self._lock_sets(tag)
+            try:
+                found = [(c, o, self._find(c, o, tag, key, now)) for c, o in zip(self.classes, offsets)]
+                if only_if_missing and any(way is not None for _, _, way in found):
+                    return False
+                # ключът може да е бил в друг клас при предишна стойност с друг размер
+                for size_class, set_offset, way in found:
+                    if way is not None and size_class is not target:
+                        self._clear(size_class, set_offset, way)
+                if target is None:
+                    return False
+
+                set_offset = offsets[target.index]
+                way = found[target.index][2]
+                if way is None:
+                    way = self._victim(target, set_offset, now)
+                self._write(target, set_offset, way, tag, key, value, expires, now)
+                self._count('sets')
+                return True
+            finally:
+                self._unlock_sets(offsets)
+
+    def _victim(self, size_class, set_offset, now):
+        tags, access, expires, _ = self._meta(size_class, set_offset)
+        for way, cell_tag in enumerate(tags):
+            if not cell_tag or (expires[way] and expires[way] <= now):
+                return way
+        self._count('evictions')
+        return min(range(size_class.ways), key=access.__getitem__)
+
+    def _write(self, size_class, set_offset, way, tag, key, value, expires, now):
+        # процес, убит по време на записа, освобождава fcntl заключването -
+        # клетката остава скрита, докато не е записана цялата
+        self._clear(size_class, set_offset, way)
+        offset = size_class.cell_offset(set_offset, way)
+        KEY_LENGTH.pack_into(self.mm, offset, len(key))
+        start = offset + KEY_LENGTH.size
+        self.mm[start:start + len(key)] = key
+        self.mm[start + len(key):start + len(key) + len(value)] = value
+        self._set_field(size_class, set_offset, 1, way, 'd', now)
+        self._set_field(size_class, set_offset, 2, way, 'd', expires or 0.0)
+        self._set_field(size_class, set_offset, 3, way, 'Q', KEY_LENGTH.size + len(key) + len(value))
+        # тагът се записва последен - дотогава клетката не се вижда при търсене
+        self._set_field(size_class, set_offset, 0, way, 'Q', tag)
+
+    def update(self, key, func, now=None):
+        """
+        Атомарно чете, променя и записва стойност (за incr/touch). `func`
+        получава (стойност, изтичане) и връща нови такива или None за отказ.
+        """
+        now = now or time.time()
+        tag = key_tag(key)
+        with self._lock:
+            offsets = self._lock_sets(tag)
+            try:
+                for size_class, set_offset in zip(self.classes, offsets):
+                    way = self._find(size_class, set_offset, tag, key, now)
+                    if way is None:
+                        continue
+                    _, _, expires, lengths = self._meta(size_class, set_offset)
+                    result = func(self._read_cell(size_class, set_offset, way, lengths[way], key), expires[way])
+                    if result is None:
+                        return None
+                    value, new_expires = result
+                    if KEY_LENGTH.size + len(key) + len(value) > size_class.cell_size:
+                        return None
+                    self._write(size_class, set_offset, way, tag, key, value, new_expires, now)
+                    return value
+                return None
+            finally:
+                self._unlock_sets(offsets)
+
+    def delete(self, key, now=None):
+        now = now or time.time()
+        tag = key_tag(key)
+        with self._lock:
+            offsets = self._lock_sets(tag)
+            try:
+                deleted = False
+                for size_class, set_offset in zip(self.classes, offsets):
+                    way = self._find(size_class, set_offset, tag, key, now)
+                    if way is not None:
+                        self._clear(size_class, set_offset, way)
+                        deleted = True
+                return deleted
+            finally:
+                self._unlock_sets(offsets)
+
+    def clear(self):
+        with self._lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                for size_class in self.classes:
+                    empty = bytes(size_class.ways * 8)
+                    for index in range(size_class.sets):
+                        start = size_class.offset + index * size_class.set_size
+                        self.mm[start:start + len(empty)] = empty
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    # --- статистика ---
+
+    def _count(self, name):
+        self._stats[name] += 1
+        self._pending += 1
+        if self._pending >= self.FLUSH_EVERY:
+            self.flush_stats()
+
+    def flush_stats(self):
+        with self._lock:
+            if not self._pending:
+                return
+            size = struct.calcsize(STATS_FORMAT)
+            self._lock_range(fcntl.LOCK_EX, STATS_OFFSET, size)
+            try:
+                totals = struct.unpack_from(STATS_FORMAT, self.mm, STATS_OFFSET)
+                struct.pack_into(STATS_FORMAT, self.mm, STATS_OFFSET,
+                                 *(total + self._stats[name] for total, name in zip(totals, STAT_NAMES)))
+            finally:
+                self._lock_range(fcntl.LOCK_UN, STATS_OFFSET, size)
+            self._stats.clear()
+            self._pending = 0
+
+    def stats(self):
+        """Общите броячи за всички процеси и заетостта по класове."""
+        self.flush_stats()
+        totals = dict(zip(STAT_NAMES, struct.unpack_from(STATS_FORMAT, self.mm, STATS_OFFSET)))
+        now = time.time()
+        classes = []
+        for size_class in self.classes:
+            used = 0
+            for index in range(size_class.sets):
+                tags, _, expires, _ = self._meta(size_class, size_class.offset + index * size_class.set_size)
+                used += sum(1 for way, tag in enumerate(tags) if tag and (not expires[way] or expires[way] > now))
+            classes.append({'cell_size': size_class.cell_size, 'cells': size_class.sets * size_class.ways, 'used': used})
+        totals['classes'] = classes
+        return totals
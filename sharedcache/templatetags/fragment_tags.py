@@ -0,0 +1,54 @@
+from django import template
+from django.template.base import token_kwargs
+from django.utils.safestring import mark_safe
+
+from sharedcache.fragments import render_fragment
+
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, vary_on, options):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+        self.options = options
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        options = {key: value.resolve(context) for key, value in self.options.items()}
+        tags = options.get('tags') or ()
+        if isinstance(tags, str):
+            tags = tags.split()
+        return mark_safe(render_fragment(
+            name, lambda: self.nodelist.render(context), vary_on,
+            tags=tags, timeout=options.get('timeout'),
+        ))
+
+
+@register.tag
+def fragment(parser, token):
+    """
+    {% fragment "product-card" product tags="products" timeout=3600 %}...{% endfragment %}
+
+    Кешира съдържанието в споделения кеш за всеки език и стойности след
+    името. Моделите сред тях добавят своя таг (product:<id>), а tags=
+    допълнителни - при промяна на някой от тях фрагментът се рендира отново.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name.")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+
+    name = parser.compile_filter(bits[1])
+    vary_on, rest = [], bits[2:]
+    while rest and '=' not in rest[0]:
+        vary_on.append(parser.compile_filter(rest.pop(0)))
+    options = token_kwargs(rest, parser)
+    if rest or set(options) - {'tags', 'timeout'}:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' accepts only tags= and timeout= options.")
+    return FragmentNode(nodelist, name, vary_on, options)
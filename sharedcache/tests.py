@@ -0,0 +1,308 @@
+import multiprocessing
+import os
+import pickle
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import flight
+from .backend import MmapCache
+from .bus import VERSION_PREFIX, bus, cached, local_cache, publish, tag_versions
+from .flight import get_or_compute
+from .local import LocalCache
+from .models import TagVersion
+from .store import CELL_SIZES, HEADER_SIZE, MmapStore, SizeClass, key_tag
+
+
+# тестовете с базата не пипат кеша на работещия сървър
+TEST_CACHES = {'default': {
+    'BACKEND': 'sharedcache.backend.MmapCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), f'aurin-cache-test-{os.getpid()}'),
+    'OPTIONS': {'SIZE': 4 * 1024 * 1024},
+}}
+
+
+def tearDownModule():
+    try:
+        os.remove(TEST_CACHES['default']['LOCATION'])
+    except FileNotFoundError:
+        pass
+
+
+def one_set_size(ways):
+    """Размер на файл, в който всеки клас има точно едно множество."""
+    return HEADER_SIZE + len(CELL_SIZES) * SizeClass(0, 0, CELL_SIZES[0], 1, ways).set_size
+
+
+def child_set(path, size, ways, key, value):
+    MmapStore(path, size=size, ways=ways).set(key, value)
+
+
+def child_incr(path, size, ways, times):
+    cache = MmapCache(path, {'OPTIONS': {'SIZE': size, 'WAYS': ways}})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class MmapStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache')
+
+    def store(self, size=1024 * 1024, ways=4):
+        return MmapStore(self.path, size=size, ways=ways)
+
+    def test_set_get_delete(self):
+        store = self.store()
+        self.assertTrue(store.set(b'a', b'1'))
+        self.assertTrue(store.set(b'b', b'2'))
+        self.assertEqual(store.get(b'a'), b'1')
+        self.assertEqual(store.get(b'b'), b'2')
+        self.assertIsNone(store.get(b'c'))
+        self.assertTrue(store.delete(b'a'))
+        self.assertFalse(store.delete(b'a'))
+        self.assertIsNone(store.get(b'a'))
+
+    def test_expiry(self):
+        store = self.store()
+        store.set(b'a', b'1', expires=1000.0, now=900.0)
+        self.assertEqual(store.get(b'a', now=999.0), b'1')
+        self.assertIsNone(store.get(b'a', now=1000.0))
+        # изтеклата клетка се използва отново
+        self.assertTrue(store.set(b'a', b'2', only_if_missing=True, now=1001.0))
+        self.assertEqual(store.get(b'a', now=1002.0), b'2')
+
+    def test_evicts_least_recently_used_in_set(self):
+        store = self.store(size=one_set_size(2), ways=2)
+        store.set(b'a', b'1', now=1.0)
+        store.set(b'b', b'2', now=2.0)
+        store.get(b'a', now=3.0)
+        store.set(b'c', b'3', now=4.0)
+        self.assertEqual(store.get(b'a', now=5.0), b'1')
+        self.assertIsNone(store.get(b'b', now=5.0))
+        self.assertEqual(store.get(b'c', now=5.0), b'3')
+        self.assertEqual(store.stats()['evictions'], 1)
+
+    def test_value_moves_between_size_classes(self):
+        store = self.store()
+        large = b'x' * (CELL_SIZES[0] + 1)
+        store.set(b'a', b'small')
+        store.set(b'a', large)
+        self.assertEqual(store.get(b'a'), large)
+        small_class = store.classes[0]
+        tags = small_class.meta.unpack_from(store.mm, small_class.set_offset(key_tag(b'a')))[:small_class.ways]
+        self.assertNotIn(key_tag(b'a'), tags)
+        store.set(b'a', b'small again')
+        self.assertEqual(store.get(b'a'), b'small again')
+
+    def test_too_large_value_is_rejected(self):
+        store = self.store()
+        store.set(b'a', b'old')
+        self.assertFalse(store.set(b'a', b'x' * CELL_SIZES[-1]))
+        self.assertIsNone(store.get(b'a'))
+
+    def test_add_only_if_missing(self):
+        store = self.store()
+        self.assertTrue(store.set(b'a', b'1', only_if_missing=True))
+        self.assertFalse(store.set(b'a', b'2', only_if_missing=True))
+        self.assertEqual(store.get(b'a'), b'1')
+
+    def test_update_keeps_expiry(self):
+        store = self.store()
+        store.set(b'a', b'1', expires=1000.0, now=1.0)
+        self.assertEqual(store.update(b'a', lambda value, expires: (value + b'2', expires), now=2.0), b'12')
+        self.assertEqual(store.get(b'a', now=999.0), b'12')
+        self.assertIsNone(store.get(b'a', now=1000.0))
+        self.assertIsNone(store.update(b'missing', lambda value, expires: (value, expires)))
+
+    def test_changed_layout_resets_file(self):
+        self.store(ways=4).set(b'a', b'1')
+        self.assertIsNone(self.store(ways=2).get(b'a'))
+
+    def test_shared_between_processes(self):
+        context = multiprocessing.get_context('fork')
+        store = self.store()
+        process = context.Process(target=child_set, args=(self.path, 1024 * 1024, 4, b'a', b'from child'))
+        process.start()
+        process.join()
+        self.assertEqual(process.exitcode, 0)
+        self.assertEqual(store.get(b'a'), b'from child')
+
+
+class MmapCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache')
+        self.cache = MmapCache(self.path, {'OPTIONS': {'SIZE': 1024 * 1024, 'WAYS': 4}})
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('a', 1))
+        self.assertFalse(self.cache.add('a', 2))
+        self.assertEqual(self.cache.get('a'), 1)
+
+    def test_incr(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.incr('a'), 2)
+        self.assertEqual(self.cache.incr('a', 5), 7)
+        self.assertEqual(self.cache.get('a'), 7)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_set_returns_false_for_large_value(self):
+        self.cache.set('a', 'old')
+        self.assertFalse(self.cache.set('a', b'x' * CELL_SIZES[-1]))
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_unreadable_entry_is_a_miss(self):
+        key = self.cache.make_and_validate_key('a').encode()
+        self.cache._store.set(key, b'not a pickle')
+        with self.assertLogs('sharedcache.backend', 'WARNING'):
+            self.assertEqual(self.cache.get('a', 'default'), 'default')
+        self.assertIsNone(self.cache._store.get(key))
+
+    def test_incr_from_two_processes(self):
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=child_incr, args=(self.path, 1024 * 1024, 4, 200)) for _ in range(2)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+        self.assertEqual(self.cache.get('counter'), 400)
+
+    def test_pickles_values(self):
+        value = {'list': [1, 2], 'text': 'текст'}
+        self.cache.set('a', value)
+        self.assertEqual(self.cache.get('a'), value)
+        key = self.cache.make_and_validate_key('a').encode()
+        self.assertEqual(pickle.loads(self.cache._store.get(key)), value)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class FlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        bus.ensure()
+        # без периодично сверяване по време на теста - нишките не ползват базата
+        self.addCleanup(setattr, bus, 'next_sync', bus.next_sync)
+        bus.next_sync = float('inf')
+
+    def publish(self, tags):
+        with self.captureOnCommitCallbacks(execute=True):
+            publish(tags)
+
+    def test_computes_once_until_tag_changes(self):
+        calls = []
+
+        def func():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(get_or_compute('k', func, tags=['a']), 1)
+        self.assertEqual(get_or_compute('k', func, tags=['a']), 1)
+        self.publish(['b'])
+        self.assertEqual(get_or_compute('k', func, tags=['a']), 1)
+        self.publish(['a'])
+        self.assertEqual(get_or_compute('k', func, tags=['a']), 2)
+
+    def test_change_during_compute_is_not_stored_as_current(self):
+        def func():
+            self.publish(['a'])
+            return 'stale'
+
+        get_or_compute('k', func, tags=lambda: ['a'])
+        self.assertIsNone(flight._valid('k'))
+
+    def test_evicted_version_is_read_from_database(self):
+        self.publish(['a'])
+        self.publish(['a'])
+        get_or_compute('k', lambda: 1, tags=['a'])
+        cache.delete(VERSION_PREFIX + 'a')
+        self.assertEqual(tag_versions(['a', 'never-changed']), (2, 0))
+        self.assertIsNotNone(flight._valid('k'))
+
+    def test_new_process_resyncs_changes_made_while_down(self):
+        self.publish(['a'])
+        get_or_compute('k', lambda: 1, tags=['a'])
+        TagVersion.objects.filter(tag='a').update(version=F('version') + 1, updated_at=timezone.now())
+        bus.pid = None
+        self.assertIsNone(flight._valid('k'))
+
+    def test_stale_value_is_refreshed_once_in_background(self):
+        get_or_compute('k', lambda: 'old', soft_ttl=0)
+        with mock.patch.object(flight, '_refresher') as refresher:
+            self.assertEqual(get_or_compute('k', lambda: 'new', soft_ttl=0), 'old')
+            self.assertEqual(get_or_compute('k', lambda: 'new', soft_ttl=0), 'old')
+        self.assertEqual(refresher.submit.call_count, 1)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        started = threading.Event()
+
+        def func():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_or_compute('k', func))) for _ in range(4)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_waiter_stops_when_leader_gives_up(self):
+        cache.add(flight.LOCK_PREFIX + 'k', 1, 10)
+        threading.Timer(0.1, cache.delete, [flight.LOCK_PREFIX + 'k']).start()
+        started = time.monotonic()
+        self.assertEqual(get_or_compute('k', lambda: 'value'), 'value')
+        self.assertLess(time.monotonic() - started, flight.WAIT)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LocalCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        bus.ensure()
+        local_cache.clear()
+
+    def test_cached_until_published(self):
+        calls = []
+        func = lambda: calls.append(1) or len(calls)  # noqa: E731
+        self.assertEqual(cached('k', func, tags=['a']), 1)
+        self.assertEqual(cached('k', func, tags=['a']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            publish(['a'])
+        self.assertEqual(cached('k', func, tags=['a']), 2)
+
+    def test_value_computed_before_invalidation_is_not_stored(self):
+        generation = local_cache.generation
+        local_cache.evict_tags(['a'])
+        self.assertFalse(local_cache.set('k', 1, ['a'], generation=generation))
+        self.assertIsNone(local_cache.get('k'))
+
+    def test_evicts_least_recently_used(self):
+        small = LocalCache(max_entries=2)
+        small.set('a', 1)
+        small.set('b', 2)
+        small.get('a')
+        small.set('c', 3)
+        self.assertEqual((small.get('a'), small.get('b'), small.get('c')), (1, None, 3))
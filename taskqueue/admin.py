@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'attempts',
+                    'run_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'last_error')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by', 'locked_at')
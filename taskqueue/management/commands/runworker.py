@@ -0,0 +1,70 @@
+import signal
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from taskqueue.worker import Worker, queue_stats, requeue_stale, purge_done
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the database queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Number of worker threads.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--batch', type=int, default=1,
+                            help='Tasks claimed per round trip.')
+        parser.add_argument('--stats-interval', type=int, default=60,
+                            help='Seconds between queue depth reports.')
+        parser.add_argument('--keep-done-hours', type=int, default=24,
+                            help='Delete finished tasks older than this.')
+        parser.add_argument('--once', action='store_true',
+                            help='Run until the queue is empty, then exit.')
+        parser.add_argument('--stats', action='store_true',
+                            help='Print queue statistics and exit.')
+
+    def report(self):
+        stats = queue_stats()
+        self.stdout.write(
+            'queued={queued} running={running} failed={failed} '
+            'oldest_wait={oldest_wait:.1f}s'.format(**stats)
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.report()
+            return
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            poll_interval=options['poll_interval'],
+            batch=options['batch'],
+        )
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale task(s).'))
+
+        if options['once']:
+            done = worker.drain()
+            self.stdout.write(self.style.SUCCESS(f'Processed {done} task(s).'))
+            return
+
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        signal.signal(signal.SIGINT, lambda *_: worker.stop())
+
+        threads = worker.start()
+        self.stdout.write(self.style.SUCCESS(
+            f'Worker {worker.worker_id} started with {worker.concurrency} thread(s).'
+        ))
+
+        keep_done = timedelta(hours=options['keep_done_hours'])
+        while not worker.stop_event.wait(options['stats_interval']):
+            self.report()
+            requeue_stale()
+            purge_done(keep_done)
+
+        for thread in threads:
+            thread.join()
+        self.stdout.write('Worker stopped.')
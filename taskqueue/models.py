@@ -0,0 +1,54 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Task(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0, help_text='Higher runs first.')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+    class Meta:
+        indexes = [
+            # worker-ите търсят само чакащи задачи
+            models.Index(fields=['-priority', 'run_at'], name='task_queued_idx',
+                         condition=Q(status='queued')),
+            models.Index(fields=['status', 'finished_at'], name='task_status_finished_idx'),
+        ]
+
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+    @property
+    def wait_time(self):
+        if self.started_at:
+            return (self.started_at - self.run_at).total_seconds()
+        return None
+
+
+    @property
+    def run_time(self):
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
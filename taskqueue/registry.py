@@ -0,0 +1,53 @@
+from django.utils import timezone
+
+from .models import Task
+
+
+registry = {}
+
+
+class TaskFunction:
+    """Обвивка около функция, която може да се пусне във фонов режим."""
+
+    def __init__(self, func, name, priority=0, max_attempts=5):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return self.enqueue(args=args, kwargs=kwargs)
+
+    def enqueue(self, args=(), kwargs=None, priority=None, run_at=None):
+        # записът е в същата транзакция като заявката, която го създава
+        return Task.objects.create(
+            name=self.name,
+            args=list(args),
+            kwargs=kwargs or {},
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+            run_at=run_at or timezone.now(),
+        )
+
+
+def task(func=None, *, name=None, priority=0, max_attempts=5):
+    """
+    Регистрира функция като задача:
+
+        @task(priority=10)
+        def send_receipt(order_id): ...
+
+        send_receipt.delay(order.id)
+    """
+    def decorator(func):
+        task_name = name or f"{func.__module__}.{func.__qualname__}"
+        wrapper = TaskFunction(func, task_name, priority=priority, max_attempts=max_attempts)
+        registry[task_name] = wrapper
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
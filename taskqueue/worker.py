@@ -0,0 +1,225 @@
+import logging
+import random
+import socket
+import os
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Task
+from .registry import registry
+
+
+logger = logging.getLogger(__name__)
+
+# worker-ът обновява locked_at на изпълняваните задачи през HEARTBEAT секунди;
+# задача без обновяване от STALE_AFTER е на спрял worker
+HEARTBEAT = 60
+STALE_AFTER = timedelta(minutes=5)
+
+
+def retry_delay(attempts, base=10, cap=3600):
+    # експоненциално отлагане с малко случаен шум
+    delay = min(base * 2 ** max(attempts - 1, 0), cap)
+    return timedelta(seconds=delay + random.uniform(0, base))
+
+
+def claim(worker_id, batch=1):
+    """
+    Заема до `batch` чакащи задачи. SKIP LOCKED позволява на няколко
+    worker-а да четат опашката едновременно без да се блокират.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='queued', run_at__lte=now)
+            .order_by('-priority', 'run_at')[:batch]
+        )
+        if not tasks:
+            return []
+        Task.objects.filter(id__in=[t.id for t in tasks]).update(
+            status='running', locked_by=worker_id, locked_at=now,
+            started_at=now,
+        )
+    for t in tasks:
+        t.status, t.locked_by, t.locked_at, t.started_at = 'running', worker_id, now, now
+    return tasks
+
+
+def execute(task):
+    func = registry.get(task.name)
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {task.name!r}")
+        func(*task.args, **task.kwargs)
+    except Exception:
+        task.attempts += 1
+        task.last_error = traceback.format_exc()
+        task.locked_by = ''
+        task.locked_at = None
+        if task.attempts >= task.max_attempts:
+            task.status = 'failed'
+            task.finished_at = timezone.now()
+            logger.error("Task %s #%s failed permanently", task.name, task.id)
+        else:
+            task.status = 'queued'
+            task.run_at = timezone.now() + retry_delay(task.attempts)
+            logger.warning("Task %s #%s failed, retry %s/%s at %s",
+                           task.name, task.id, task.attempts, task.max_attempts, task.run_at)
+        task.save(update_fields=['status', 'attempts', 'last_error', 'locked_by',
+                                 'locked_at', 'run_at', 'finished_at'])
+        return False
+
+    task.attempts += 1
+    task.status = 'done'
+    task.finished_at = timezone.now()
+    task.save(update_fields=['status', 'attempts', 'finished_at'])
+    logger.info("Task %s #%s done in %.3fs (waited %.3fs)",
+                task.name, task.id, task.run_time, task.wait_time)
+    return True
+
+
+def requeue_stale(timeout=STALE_AFTER):
+    """
+    Връща в опашката задачите на worker, който е спрял по средата на
+    изпълнението (без heartbeat от `timeout`). Това се брои за опит - задача,
+    която всеки път сваля worker-а си, спира след max_attempts.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(status='running', locked_at__lt=now - timeout)
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=F('max_attempts') - 1).update(
+            status='failed', attempts=F('attempts') + 1, locked_by='', locked_at=None,
+            finished_at=now, last_error='Worker stopped while running the task.',
+        )
+        requeued = stale.update(
+            status='queued', attempts=F('attempts') + 1, locked_by='', locked_at=None,
+            run_at=now,
+        )
+    if failed:
+        logger.error("%s stale task(s) failed permanently", failed)
+    return requeued
+
+
+def heartbeat(task_ids, worker_id):
+    # само собствените задачи - ако вече са върнати в опашката, не се пипат
+    return Task.objects.filter(
+        id__in=task_ids, status='running', locked_by__startswith=f"{worker_id}:"
+    ).update(locked_at=timezone.now())
+
+
+def purge_done(older_than=timedelta(days=1)):
+    deleted, _ = Task.objects.filter(
+        status='done', finished_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
+
+
+def queue_stats():
+    """Дълбочина на опашката по статус и най-дългото чакане в секунди."""
+    now = timezone.now()
+    counts = dict(
+        Task.objects.exclude(status='done')
+        .values_list('status')
+        .annotate(n=Count('id'))
+        .values_list('status', 'n')
+    )
+    oldest = (
+        Task.objects.filter(status='queued', run_at__lte=now)
+        .aggregate(oldest=Min('run_at'))['oldest']
+    )
+    return {
+        'queued': counts.get('queued', 0),
+        'running': counts.get('running', 0),
+        'failed': counts.get('failed', 0),
+        'oldest_wait': (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+class Worker:
+    def __init__(self, concurrency=1, poll_interval=1.0, batch=1):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.batch = batch
+        self.stop_event = threading.Event()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.running = set()
+        self.running_lock = threading.Lock()
+        self.heartbeat_thread = None
+
+    def run_once(self, thread_name='main'):
+        """Изпълнява една порция задачи. Връща броя на изпълнените."""
+        tasks = claim(f"{self.worker_id}:{thread_name}", batch=self.batch)
+        with self.running_lock:
+            self.running.update(t.id for t in tasks)
+        try:
+            for task in tasks:
+                execute(task)
+                with self.running_lock:
+                    self.running.discard(task.id)
+        finally:
+            with self.running_lock:
+                self.running.difference_update(t.id for t in tasks)
+        return len(tasks)
+
+    def drain(self):
+        self.start_heartbeat()
+        done = 0
+        while True:
+            count = self.run_once()
+            if not count:
+                return done
+            done += count
+
+    def _heartbeat(self):
+        try:
+            while not self.stop_event.wait(HEARTBEAT):
+                with self.running_lock:
+                    task_ids = list(self.running)
+                if not task_ids:
+                    continue
+                close_old_connections()
+                try:
+                    heartbeat(task_ids, self.worker_id)
+                except Exception:
+                    logger.exception("Heartbeat for tasks %s failed", task_ids)
+        finally:
+            close_old_connections()
+
+    def start_heartbeat(self):
+        if self.heartbeat_thread is None:
+            self.heartbeat_thread = threading.Thread(target=self._heartbeat, name='heartbeat', daemon=True)
+            self.heartbeat_thread.start()
+
+    def _loop(self, thread_name):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    count = self.run_once(thread_name)
+                except Exception:
+                    logger.exception("Worker thread %s crashed while claiming", thread_name)
+                    count = 0
+                if not count:
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            close_old_connections()
+
+    def start(self):
+        self.start_heartbeat()
+        threads = [
+            threading.Thread(target=self._loop, args=(f"t{i}",), daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from taskqueue.registry import task
+from .models import CustomUser
+
+
+@task(priority=10)
+def send_password_reset_email(user_id, domain):
+    user = CustomUser.objects.get(id=user_id)
+    subject = f"{settings.EMAIL_SUBJECT_PREFIX}Password Reset Requested"
+    context = {
+        "user": user,
+        "domain": domain,
+        "uid": urlsafe_base64_encode(force_bytes(user.pk)),
+        "token": default_token_generator.make_token(user),
+    }
+    message = render_to_string("users/password_reset_email.html", context)
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
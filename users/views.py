@@ -2,25 +2,24 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
 from django.template.response import TemplateResponse
 from .forms import CustomUserCreationForm, CustomUserLoginForm, \
     CustomUserUpdateForm
 from .models import CustomUser
 from django.contrib import messages
-from main.models import Product, ProductReview, Category
+from main.models import Product, ProductReview
+from main.context_processors import root_categories
 from orders.models import Order
+from orders.history import decode_cursor, load_order_detail, order_page
+from orders.stats import stats_for
 from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode
-from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.conf import settings
 from .forms import PasswordResetRequestForm
 from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
 from .forms import SetNewPasswordForm
+from .tasks import send_password_reset_email
 
 
 
@@ -63,15 +62,7 @@ def password_reset_request(request):
             email = form.cleaned_data["email"]
             try:
                 user = CustomUser.objects.get(email=email)
-                subject = f"{settings.EMAIL_SUBJECT_PREFIX}Password Reset Requested"
-                context = {
-                    "user": user,
-                    "domain": request.get_host(),
-                    "uid": urlsafe_base64_encode(force_bytes(user.pk)),
-                    "token": default_token_generator.make_token(user),
-                }
-                message = render_to_string("users/password_reset_email.html", context)
-                send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [user.email])
+                send_password_reset_email.delay(user.id, request.get_host())
                 messages.success(request, "Email sent with password reset instructions.")
                 return redirect("users:password_reset_request")
             except CustomUser.DoesNotExist:
@@ -122,8 +113,7 @@ def profile_view(request):
     latest_order = (
         Order.objects
         .filter(user=request.user)
-        .order_by('-created_at')
-        .prefetch_related('items__product', 'items__size')
+        .order_by('-created_at', '-id')
         .first()
     )
 
@@ -132,8 +122,9 @@ def profile_view(request):
         'user': request.user,
         'recommended_products': recommended_products,
         'latest_order': latest_order,
+        'customer_stats': stats_for(request.user),
         # нужно е за хедъра в base.html
-        'categories': Category.objects.filter(parent__isnull=True).prefetch_related('subcategories'),
+        'categories': root_categories(),
     }
 
     # HTMX → само съдържанието
@@ -148,7 +139,8 @@ def profile_view(request):
 
 @login_required(login_url='/users/login')
 def account_details(request):
-    user = CustomUser.objects.get(id=request.user.id)
+    # request.user вече е зареден от AuthenticationMiddleware
+    user = request.user
     return TemplateResponse(request, 'users/partials/account_details.html', {'user': user})
 
 
@@ -167,7 +159,7 @@ def update_account_details(request):
             user = form.save(commit=False)
             user.clean()
             user.save()
-            updated_user = CustomUser.objects.get(id=user.id)
+            updated_user = user
             request.user = updated_user
             if request.headers.get('HX-Request'):
                 return TemplateResponse(request, 'users/partials/account_details.html', {'user': updated_user})
@@ -187,10 +179,19 @@ def logout_view(request):
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    ctx = {"orders": orders}
+    cursor = request.GET.get("before")
+    if cursor and decode_cursor(cursor) is None:
+        if request.headers.get("HX-Request") == "true":
+            # бутонът се заменя с нищо - иначе "Покажи още" добавя първата страница отново
+            return render(request, "users/partials/order_history_rows.html", {"orders": [], "next_cursor": None})
+        return HttpResponseBadRequest("Invalid cursor")
+    orders, next_cursor = order_page(request.user, cursor)
+    ctx = {"orders": orders, "next_cursor": next_cursor}
 
     if request.headers.get("HX-Request") == "true":
+        if cursor:
+            # "Покажи още" - само следващите редове
+            return render(request, "users/partials/order_history_rows.html", ctx)
         return render(request, "users/partials/order_history.html", ctx)
 
     return render(request, "users/order_history.html", ctx)
@@ -199,8 +200,8 @@ def order_history(request):
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order.objects.prefetch_related('items__product'), id=order_id, user=request.user)
-    user_reviews_by_product = {r.product_id: r for r in ProductReview.objects.filter(user=request.user, product__in=[i.product for i in order.items.all()])}
+    order = load_order_detail(request.user, order_id)
+    user_reviews_by_product = {r.product_id: r for r in ProductReview.objects.filter(user=request.user, product_id__in=[i.product_id for i in order.items.all()])}
     reviewed_product_ids = list(user_reviews_by_product.keys())
 
     ctx = {
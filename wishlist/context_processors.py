@@ -1,7 +1,12 @@
 # wishlist/context_processors.py
-from .models import WishlistItem
+from main import request_cache
+from main.context_processors import wants_global_context
+from .utils import cached_count
 
 def wishlist_count(request):
+    if not wants_global_context(request, 'wishlist'):
+        return {}
     if request.user.is_authenticated:
-        return {"wishlist_count": WishlistItem.objects.filter(user=request.user).count()}
+        # броят се пази в сесията - обикновено без заявка към базата
+        return {"wishlist_count": request_cache.lazy('wishlist_count', lambda: cached_count(request))}
     return {"wishlist_count": 0}
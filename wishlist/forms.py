@@ -7,17 +7,20 @@ from .models import WishlistItem
 class AddToWishlistForm(forms.Form):
     size_id = forms.IntegerField(required=True)
 
-    def __init__(self, *args, product=None, user=None, **kwargs):
+    def __init__(self, *args, product=None, user=None, sizes=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.product = product
         self.user = user
 
         if product:
-            sizes = product.product_sizes.filter(stock__gt=0)
+            # sizes - наличните размери, ако вече са заредени (main.product_detail)
+            if sizes is None:
+                sizes = product.product_sizes.filter(stock__gt=0).select_related('size')
+            sizes = list(sizes)
             self.fields['size_id'] = forms.ChoiceField(
                 choices=[(ps.id, ps.size.name) for ps in sizes],
                 required=True,
-                initial=sizes.first().id
+                initial=sizes[0].id if sizes else None
             )
 
     def save(self):
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.newsletter import smtp_connection
+from wishlist.notifier import WishlistNotifier
+
+
+class Command(BaseCommand):
+    help = ('Email users about wishlist items that are back in stock or cheaper. '
+            'Only products changed since the previous run are read - run it from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--rate', type=float, default=settings.NEWSLETTER_SEND_RATE,
+                            help='Maximum messages per second (0 = unlimited).')
+        parser.add_argument('--smtp-host', help='Send through this SMTP server instead of EMAIL_BACKEND.')
+        parser.add_argument('--smtp-port', type=int, default=1025)
+
+    def handle(self, *args, **options):
+        connection = None
+        if options['smtp_host']:
+            connection = smtp_connection(options['smtp_host'], options['smtp_port'])
+
+        counts = WishlistNotifier(
+            connection=connection,
+            chunk_size=options['chunk_size'],
+            rate=options['rate'],
+        ).run()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wishlist notifications: sent={counts['sent']} failed={counts['failed']} "
+            f"items updated={counts['items']}"
+        ))
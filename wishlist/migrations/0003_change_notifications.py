@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-19 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist', '0002_wishlistitem_added_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotifierCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='wishlistitem',
+            name='seen_in_stock',
+            field=models.BooleanField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='wishlistitem',
+            name='seen_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+    ]
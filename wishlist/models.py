@@ -21,6 +21,10 @@ class WishlistItem(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     added_at = models.DateTimeField(auto_now_add=True)
+    # цената и наличността, за които потребителят вече знае - wishlist.notifier
+    # пише само при поевтиняване или връщане в наличност спрямо тях
+    seen_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    seen_in_stock = models.BooleanField(null=True, editable=False)
 
     class Meta:
         unique_together = ('user', 'product', 'product_size')
@@ -28,3 +32,12 @@ class WishlistItem(models.Model):
 
     def __str__(self):
         return f'{self.user} → {self.product.name} ({self.product_size.size.name})'
+
+
+class NotifierCursor(models.Model):
+    """Докъде (по updated_at) са обработени промените за известяване."""
+    name = models.CharField(max_length=50, unique=True)
+    position = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name} @ {self.position}'
@@ -0,0 +1,147 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from main.models import Product, ProductSize
+from main.newsletter import Throttle
+from users.models import CustomUser
+from .models import NotifierCursor, WishlistItem
+
+
+logger = logging.getLogger(__name__)
+
+CURSOR = 'wishlist'
+LOCK_KEY = 'wishlist-notifier'
+# транзакция може да запише updated_at по-рано, отколкото става видима -
+# прозорецът се чете отново, а seen_* пазят от повторно известяване
+OVERLAP = timedelta(minutes=5)
+
+
+def changed_ids(model, since, until, chunk_size):
+    """id-тата на променените редове на порции - по индекса на updated_at."""
+    ids = (model.objects
+           .filter(updated_at__gte=since, updated_at__lt=until)
+           .values_list('id', flat=True)
+           .iterator(chunk_size=chunk_size))
+    chunk = []
+    for pk in ids:
+        chunk.append(pk)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class WishlistNotifier:
+    """
+    Известява за върнати в наличност и поевтинели артикули от любими.
+    Чете само ProductSize и Product, променени след курсора, свързва ги с
+    любимите по индексите на FK и изпраща по едно писмо на потребител.
+    """
+
+    def __init__(self, connection=None, chunk_size=500, rate=None):
+        self.connection = connection
+        self.chunk_size = chunk_size
+        self.rate = rate
+        self.counts = Counter()
+        # user_id -> {'restocked': [...], 'price_drops': [...]}
+        self.changes = defaultdict(lambda: {'restocked': [], 'price_drops': []})
+        # WishlistItem.id -> обект с новите seen_* - тези с известие се записват
+        # веднага след изпращането му, останалите - преди изпращането
+        self.pending = {}
+
+    def run(self):
+        if not cache.add(LOCK_KEY, 1, 60 * 60):
+            logger.info("Wishlist notifier is already running")
+            return self.counts
+        try:
+            cursor, created = NotifierCursor.objects.get_or_create(name=CURSOR, defaults={'position': timezone.now()})
+            until = timezone.now()
+            since = cursor.position - OVERLAP
+            for model, field in ((ProductSize, 'product_size_id'), (Product, 'product_id')):
+                for ids in changed_ids(model, since, until, self.chunk_size):
+                    self.collect(WishlistItem.objects.filter(**{f'{field}__in': ids}))
+            notified = {item.id for changes in self.changes.values() for item in self.notified_items(changes)}
+            self.save([item for pk, item in self.pending.items() if pk not in notified])
+            # при прекъснато изпращане курсорът остава - следващото пускане
+            # чете прозореца отново, а вече известените имат записани seen_*
+            if self.send():
+                cursor.position = until
+                cursor.save(update_fields=['position'])
+        finally:
+            cache.delete(LOCK_KEY)
+        return self.counts
+
+    def collect(self, items):
+        for item in items.select_related('product', 'product_size', 'product_size__size'):
+            if item.id in self.pending:
+                continue
+            price, in_stock = item.product.price, item.product_size.stock > 0
+            if item.seen_price is None or item.seen_in_stock is None:
+                # артикул отпреди известяванията - само се запомня
+                pass
+            elif in_stock and not item.seen_in_stock:
+                self.changes[item.user_id]['restocked'].append(item)
+            elif in_stock and price < item.seen_price:
+                self.changes[item.user_id]['price_drops'].append(
+                    {'item': item, 'old_price': item.seen_price}
+                )
+            if (price, in_stock) != (item.seen_price, item.seen_in_stock):
+                item.seen_price, item.seen_in_stock = price, in_stock
+                self.pending[item.id] = item
+
+    @staticmethod
+    def notified_items(changes):
+        return changes['restocked'] + [drop['item'] for drop in changes['price_drops']]
+
+    def send(self):
+        """Изпраща писмата. Връща False, ако връзката към пощата е прекъснала."""
+        if not self.changes:
+            return True
+        throttle = Throttle(self.rate)
+        connection = self.connection or get_connection()
+        users = CustomUser.objects.in_bulk(self.changes)
+        with connection:
+            for user_id, changes in self.changes.items():
+                user = users.get(user_id)
+                if user is None or not user.email:
+                    continue
+                throttle.wait()
+                try:
+                    connection.send_messages([self.message(user, changes, connection)])
+                except Exception as e:
+                    logger.warning(f"Wishlist notification to {user.email} failed: {e}")
+                    self.counts['failed'] += 1
+                    # seen_* остават старите - известието се опитва при следваща промяна
+                    try:
+                        connection.close()
+                        connection.open()
+                    except Exception as e:
+                        logger.error(f"Could not reconnect to the mail server, stopping: {e}")
+                        return False
+                else:
+                    self.counts['sent'] += 1
+                    self.save(self.notified_items(changes))
+        return True
+
+    def message(self, user, changes, connection):
+        context = {'user': user, **changes}
+        subject = f"{settings.EMAIL_SUBJECT_PREFIX}{_('News about your wishlist')}"
+        text = render_to_string('wishlist/emails/wishlist_changes.txt', context)
+        html = render_to_string('wishlist/emails/wishlist_changes.html', context)
+        message = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [user.email],
+                                         connection=connection)
+        message.attach_alternative(html, 'text/html')
+        return message
+
+    def save(self, items):
+        WishlistItem.objects.bulk_update(items, ['seen_price', 'seen_in_stock'], batch_size=self.chunk_size)
+        self.counts['items'] += len(items)
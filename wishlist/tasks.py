@@ -0,0 +1,8 @@
+from django.conf import settings
+from taskqueue.registry import task
+from .notifier import WishlistNotifier
+
+
+@task(priority=0, max_attempts=1)
+def notify_wishlist_changes():
+    WishlistNotifier(rate=settings.NEWSLETTER_SEND_RATE).run()
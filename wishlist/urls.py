@@ -8,6 +8,8 @@ urlpatterns = [
     path('add/<int:product_id>/', views.add_to_wishlist, name='add_to_wishlist'),
     path("remove/<int:item_id>/", views.remove_from_wishlist, name="remove"),
     path("modal/", views.wishlist_modal, name="modal"),
+    path("page/", views.wishlist_page, name="page"),
+    path("move-to-cart/", views.move_wishlist_to_cart, name="move_to_cart"),
     path("count/", views.wishlist_count, name="count"),
     path("clear/", views.clear_wishlist, name="clear"),
     path("notification/<int:product_id>/", views.wishlist_notification, name="notification"),
@@ -1,4 +1,92 @@
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from cart.models import CartItem
 from .models import WishlistItem
 
+SESSION_KEY = 'wishlist_count'
+
+
 def all_items(user):
     return WishlistItem.objects.filter(user=user)
+
+
+def cached_count(request):
+    """
+    Броят от сесията. COUNT(*) се прави само ако го няма или е по-стар от
+    WISHLIST_COUNT_RECONCILE - така се поправят промени от друго устройство.
+    """
+    entry = request.session.get(SESSION_KEY)
+    if (entry is None or entry[1] != request.user.pk
+            or time.time() - entry[2] > settings.WISHLIST_COUNT_RECONCILE):
+        return store_count(request, all_items(request.user).count())
+    return entry[0]
+
+
+def store_count(request, count):
+    """Записва точния брой (след COUNT или след като списъкът е зареден)."""
+    request.session[SESSION_KEY] = [count, request.user.pk, time.time()]
+    return count
+
+
+def adjust_count(request, delta):
+    """Write-through след добавяне/премахване - без заявка към базата."""
+    entry = request.session.get(SESSION_KEY)
+    if entry is None or entry[1] != request.user.pk:
+        return cached_count(request)
+    # времето на последната проверка се запазва
+    request.session[SESSION_KEY] = [max(entry[0] + delta, 0), entry[1], entry[2]]
+    return request.session[SESSION_KEY][0]
+
+
+def page_items(user, page, size=None):
+    """
+    Една страница от любимите и номерът на следващата (или None). Взима се
+    един ред повече, за да се разбере дали има още - без COUNT(*).
+    """
+    size = size or settings.WISHLIST_PAGE_SIZE
+    offset = (page - 1) * size
+    items = list(
+        all_items(user)
+        .select_related('product', 'product_size', 'product_size__size')
+        .order_by('-created_at', '-id')[offset:offset + size + 1]
+    )
+    return items[:size], page + 1 if len(items) > size else None
+
+
+@transaction.atomic
+def move_to_cart(user, cart, item_ids=None):
+    """
+    Премества избраните (или всички) артикули от любими в количката:
+    наличността и количеството в количката се четат с една заявка, редовете
+    в количката се записват с един upsert, а преместените се изтриват в
+    същата транзакция. Изчерпаните остават в любими.
+    Връща (преместени, пропуснати).
+    """
+    items = all_items(user)
+    if item_ids is not None:
+        items = items.filter(id__in=item_ids)
+    rows = list(items.annotate(
+        stock=F('product_size__stock'),
+        in_cart=Coalesce(Subquery(
+            CartItem.objects.filter(cart=cart, product_size=OuterRef('product_size')).values('quantity')[:1]
+        ), 0),
+    ).values_list('id', 'product_id', 'product_size_id', 'stock', 'in_cart'))
+
+    movable = [row for row in rows if row[3] > row[4]]
+    if not movable:
+        return 0, len(rows)
+
+    CartItem.objects.bulk_create(
+        [CartItem(cart=cart, product_id=product_id, product_size_id=size_id, quantity=in_cart + 1)
+         for _, product_id, size_id, _, in_cart in movable],
+        update_conflicts=True,
+        unique_fields=['cart', 'product', 'product_size'],
+        update_fields=['quantity'],
+    )
+    WishlistItem.objects.filter(id__in=[row[0] for row in movable]).delete()
+    return len(movable), len(rows) - len(movable)
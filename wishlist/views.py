@@ -5,16 +5,25 @@ from django.views.decorators.http import require_POST, require_GET
 from django.http import JsonResponse, HttpResponse
 from main.models import ProductSize, Product
 from .models import WishlistItem
+from .utils import adjust_count, cached_count, store_count, page_items, move_to_cart
+from main.context_processors import uses_global_context
+from cart.utils import cart_totals, current_cart
+from main import request_cache
 from django.middleware.csrf import get_token
 from django.template.loader import render_to_string
+from django.utils.translation import gettext as _
+import json
 
-def _items(user):
-    return (WishlistItem.objects
-            .filter(user=user)
-            .select_related("product", "product_size", "product_size__size"))
-
-def _count(user):
-    return WishlistItem.objects.filter(user=user).count()
+def _render_modal(request):
+    # модалът показва само първата страница - останалите се зареждат при скрол
+    items, next_page = page_items(request.user, 1)
+    count = store_count(request, len(items)) if next_page is None else cached_count(request)
+    return render(request, "wishlist/wishlist_modal.html", {
+        "items": items,
+        "next_page": next_page,
+        "wishlist_count": count,
+        "csrf_token": get_token(request),  # <-- това е ключово
+    })
 
 
 @login_required
@@ -32,7 +41,8 @@ def add_to_wishlist(request, product_id):
     item, created = WishlistItem.objects.get_or_create(
         user=request.user,
         product=ps.product,
-        product_size=ps
+        product_size=ps,
+        defaults={"seen_price": ps.product.price, "seen_in_stock": ps.stock > 0},
     )
 
     message = (
@@ -44,46 +54,93 @@ def add_to_wishlist(request, product_id):
     return JsonResponse({
         "success": True,
         "created": created,
-        "count": _count(request.user),
+        "count": adjust_count(request, 1) if created else cached_count(request),
         "message": message
     })
 
 
 @login_required
 @require_POST
+@uses_global_context()
 def remove_from_wishlist(request, item_id):
     item = get_object_or_404(WishlistItem, id=item_id, user=request.user)
     item.delete()
 
     if request.headers.get("HX-Request"):
-        items = _items(request.user)
-        return render(request, "wishlist/wishlist_modal.html", {
-            "items": items,
-            "wishlist_count": items.count()
-        })
+        adjust_count(request, -1)
+        return _render_modal(request)
 
-    return JsonResponse({"success": True, "count": _count(request.user)})
+    return JsonResponse({"success": True, "count": adjust_count(request, -1)})
 
 
 @login_required
 @require_GET
+@uses_global_context()
 def wishlist_modal(request):
-    items = _items(request.user)
-    return render(request, "wishlist/wishlist_modal.html", {
-        "items": items,
-        "wishlist_count": items.count(),
-        "csrf_token": get_token(request),  # <-- това е ключово
-    })
+    return _render_modal(request)
+
+
+@login_required
+@require_GET
+@uses_global_context()
+def wishlist_page(request):
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        page = 1
+    items, next_page = page_items(request.user, page)
+    return render(request, "wishlist/wishlist_page.html", {"items": items, "next_page": next_page})
+
+
+@login_required
+@require_POST
+@uses_global_context()
+def move_wishlist_to_cart(request):
+    if request.POST.get("all"):
+        item_ids = None
+    else:
+        item_ids = [int(i) for i in request.POST.getlist("item_ids") if i.isdigit()]
+        if not item_ids:
+            if request.headers.get("HX-Request"):
+                # HTMX не разменя 400 - модалът остава, а съобщението идва през HX-Trigger
+                response = _render_modal(request)
+                response["HX-Trigger"] = json.dumps({"wishlistMovedToCart": {
+                    "moved": 0,
+                    "skipped": 0,
+                    "cart_count": cart_totals(request)["items"],
+                    "message": _("Select the items you want to move to the cart."),
+                }})
+                return response
+            return JsonResponse({"success": False, "error": "No items selected"}, status=400)
+
+    moved, skipped = move_to_cart(request.user, current_cart(request), item_ids)
+    adjust_count(request, -moved)
+    # upsert-ът не праща post_save - сумите на количката се четат наново
+    request_cache.forget("cart_totals")
+    result = {
+        "moved": moved,
+        "skipped": skipped,
+        "cart_count": cart_totals(request)["items"],
+        "message": render_to_string("wishlist/move_message.html", {"moved": moved, "skipped": skipped}).strip(),
+    }
+
+    if request.headers.get("HX-Request"):
+        response = _render_modal(request)
+        response["HX-Trigger"] = json.dumps({"wishlistMovedToCart": result})
+        return response
+    return JsonResponse({"success": True, **result})
 
 @login_required
 @require_GET
 def wishlist_count(request):
-    return JsonResponse({"count": _count(request.user)})
+    return JsonResponse({"count": cached_count(request)})
 
 @login_required
 @require_POST
+@uses_global_context()
 def clear_wishlist(request):
     WishlistItem.objects.filter(user=request.user).delete()
+    store_count(request, 0)
 
     return render(request, "wishlist/wishlist_modal.html", {
         "items": [],
@@ -92,6 +149,7 @@ def clear_wishlist(request):
 
 @login_required
 @require_GET
+@uses_global_context()
 def wishlist_notification(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     return render(request, "wishlist/wishlist_notification.html", {"product": product})